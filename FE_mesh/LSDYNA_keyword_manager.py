@@ -1,6 +1,7 @@
 import numpy as np
 import os
 from FE_mesh.utilities import merge_txt_files
+import FE_mesh.instrumentation as instrumentation
 from sieve_analysis_tools import velocity_stochasticity as vs
 
 def section(PID, MID = 1000000, ELFORM = 1):
@@ -26,6 +27,35 @@ def section(PID, MID = 1000000, ELFORM = 1):
         outfile2.close()
 
 
+def initial_velocity_card(PID, velocity, angle):
+    """This function creates the text of an initial velocity
+    card, which is assigned to a part (PID).
+
+    Args:
+        PID (int) : Described before.
+        velocity (float): Initial velocity of spheres.
+        angle (float): Impact angle.
+
+    Returns:
+        str: The *INITIAL_VELOCITY_GENERATION card.
+    """
+    velocity = float(velocity)
+
+    impact_angle = float(angle)
+
+    impact_angle_rads = impact_angle*np.pi/180
+
+    vx = velocity*np.sin(np.pi/2 - impact_angle_rads)
+    vy = velocity*np.cos(np.pi/2 - impact_angle_rads)
+
+    card = "*INITIAL_VELOCITY_GENERATION" + "\n"
+    card += ("%i,    " %PID + "2,    " + "0,    " + "%0.3f,    "%-vx
+    + "%0.1f,    " %-vy + "0,    " + "0,    " + "0,    " + "\n")
+    card += "0,    " + "0,    " + "0,     " + "0,    " + "0,    " + "0,    " + "0,    " + "0,    " + "\n"
+
+    return card
+
+
 def initial_velocity(PID, velocity, angle):
     """This function creates initial velocity entity
     and assigns it to elements, nodes etc.
@@ -41,19 +71,7 @@ def initial_velocity(PID, velocity, angle):
     """
     with open('initial_velocity.txt', 'w') as outfile:
         if velocity and angle:
-            velocity = float(velocity)
-
-            impact_angle = float(angle)
-
-            impact_angle_rads = impact_angle*np.pi/180
-
-            vx = velocity*np.sin(np.pi/2 - impact_angle_rads)
-            vy = velocity*np.cos(np.pi/2 - impact_angle_rads)
-
-            outfile.write("*INITIAL_VELOCITY_GENERATION" + "\n")
-            outfile.write("%i,    " %PID + "2,    " + "0,    " + "%0.3f,    "%-vx
-            + "%0.1f,    " %-vy + "0,    " + "0,    " + "0,    " + "\n")
-            outfile.write("0,    " + "0,    " + "0,     " + "0,    " + "0,    " + "0,    " + "0,    " + "0,    " + "\n")
+            outfile.write(initial_velocity_card(PID, velocity, angle))
             outfile.write("*END")
 
             variable = True
@@ -65,6 +83,85 @@ def initial_velocity(PID, velocity, angle):
     return variable
 
 
+def parts_with_shared_section(PIDs, MID = 1000000, ELFORM = 1):
+    """This function defines multiple parts, which share
+    the same section and material (LS - DYNA keyword file format).
+
+    Args:
+        PIDs (list): Parts' identification numbers.
+        MID (int, optional): Material's and section's identification number (default is 1000000).
+        ELFORM (int, optional): Element's integration scheme (reduced[default] or full).
+    """
+    with open('section.txt', 'w') as outfile1, open('material.txt', 'w') as outfile2:
+        for PID in PIDs:
+            outfile1.write("*PART" +  '\n' + 'SECTION_SOLID' + '\n')
+            outfile1.write('  %d' %PID + ',    '+ '%d' %MID + ',    ' + '%d' %MID + ',    ' + '0,    0,    0,    0,    0,    0,    %d'%ELFORM + '\n')
+
+        outfile1.write("*SECTION_SOLID_TITLE" +  '\n' + 'SECTION_SOLID' + '\n')
+        outfile1.write('  %d' %MID + ',    '+ '%d' %ELFORM + '\n')
+
+        outfile2.write("*MAT_ELASTIC_TITLE" +  '\n' + 'Default MAT1 MAT_ELASTIC' + '\n')
+        outfile2.write('  %d'% MID + ',    '+ '7.85E-6,    '+ '210.,    ' + '0.3,    ' + '0.,    0.,    0.' '\n')
+
+        outfile1.close()
+        outfile2.close()
+
+
+def sample_shot_velocities(velocity_stochasticity_option, number_of_shots, *velocity_args, rng = None):
+    """Samples one initial velocity per shot.
+
+    Args:
+        velocity_stochasticity_option (str): The type of stochasticity. Valid options are "Normal distribution", "Mixed random", "Constant".
+        number_of_shots (int): Number of shots (velocities) to sample.
+        velocity_args (tuple): The arguments to be passed to the stochasticity function (same as in apply_initial_velocity).
+        rng (numpy.random.Generator, int or None, optional): Random generator (or seed) used for sampling.
+
+    Returns:
+        ndarray: The velocity of each shot.
+    """
+    if velocity_stochasticity_option == "Normal distribution":
+        return vs.normally_distributed_velocities(*velocity_args, size = number_of_shots, rng = rng)
+
+    elif velocity_stochasticity_option == "Mixed random":
+        return vs.mixed_random_velocities_array(*velocity_args, size = number_of_shots, rng = rng)
+
+    elif velocity_stochasticity_option == "Constant":
+        return np.full(number_of_shots, float(velocity_args[0]))
+
+    else:
+        raise ValueError("Please choose a valid velocity stochasticity option: Normal distribution, Mixed random or Constant.")
+
+
+def velocity_bins(velocities, number_of_bins, first_pid = 1000000):
+    """Groups the shots' velocities into equal width velocity bins.
+    Every non empty bin becomes a part, which moves with the average
+    velocity of its shots.
+
+    Args:
+        velocities (array): Velocity of each shot.
+        number_of_bins (int): Maximum number of velocity bins (parts).
+        first_pid (int, optional): PID of the first part. The following parts are numbered consecutively.
+
+    Returns:
+        ndarray: The PID of each shot.
+        dict: The velocity of each part, keyed by its PID.
+    """
+    velocities = np.asarray(velocities, dtype=float)
+
+    bin_edges = np.linspace(np.min(velocities), np.max(velocities), int(number_of_bins) + 1)
+    bin_index = np.clip(np.searchsorted(bin_edges, velocities, side='right') - 1, 0, int(number_of_bins) - 1)
+
+    # drop the empty bins and number the parts consecutively
+    occupied_bins, shot_part_index = np.unique(bin_index, return_inverse=True)
+    part_velocities_sum = np.bincount(shot_part_index, weights=velocities)
+    part_shots = np.bincount(shot_part_index)
+
+    shot_pids = first_pid + shot_part_index
+    part_velocities = {first_pid + i: part_velocities_sum[i]/part_shots[i] for i in range(len(occupied_bins))}
+
+    return shot_pids, part_velocities
+
+
 def output_keyword_file(nodes_s, elements_s, pid, filename, velocity = [], angle = []):
     """Function which outputs the final keyword file
     including sphere entity.
@@ -102,6 +199,92 @@ def output_keyword_file(nodes_s, elements_s, pid, filename, velocity = [], angle
         if os.path.exists(fname):
             os.remove(fname)
 
+def output_keyword_file_velocity_bins(nodes_s, elements_s, part_velocities, filename, angle, MID = 1000000):
+    """Same function as output_keyword_file, but for shots which are 
+    grouped into velocity bins. Each bin is a separate part with its own
+    initial velocity, while all parts share the same section and material.
+
+    Args:
+        nodes_s (array): Nodes matrix.
+        elements_s (array): Elements matrix, with the PID of each shot's velocity bin.
+        part_velocities (dict): The initial velocity of each part, keyed by its PID (see velocity_bins).
+        filename (string): Final output name.
+        angle (float): Impact angle.
+        MID (int, optional): Material's and section's identification number (default is 1000000).
+    """
+    np.savetxt('nodes.txt', nodes_s, header="*KEYWORD\n*NODES", fmt="%i,%f,%f,%f", comments="")
+    np.savetxt('elements.txt', elements_s, header="*ELEMENT_SOLID", fmt="%8i%8i%8i%8i%8i%8i%8i%8i%8i%8i", comments="")
+
+    parts_with_shared_section(list(part_velocities.keys()), MID)
+
+    with open('initial_velocity.txt', 'w') as outfile:
+        for pid, velocity in part_velocities.items():
+            outfile.write(initial_velocity_card(pid, velocity, angle))
+        outfile.write("*END")
+        outfile.close()
+
+    filenames = ['nodes.txt', 'elements.txt', 'section.txt', 'material.txt', 'initial_velocity.txt']
+    merge_txt_files(filenames, '%s.k' %filename)
+
+    for fname in filenames:
+        if os.path.exists(fname):
+            os.remove(fname)
+
+def output_geometry_include_file(nodes_s, elements_s, pids, filename, MID = 1000000):
+    """Same function as output_keyword_file, but without any initial
+    velocity. The file contains the whole geometry (nodes, elements,
+    parts, section and material), so that it can be written once and 
+    referenced through *INCLUDE by multiple master decks (see output_master_deck).
+
+    Args:
+        nodes_s (array): Nodes matrix.
+        elements_s (array): Elements matrix.
+        pids (int or list): PID, or list of PIDs (e.g. the velocity bins parts) of the elements.
+        filename (string): Final output name.
+        MID (int, optional): Material's and section's identification number (default is 1000000).
+    """
+    if not isinstance(pids, (list, tuple, np.ndarray)):
+        pids = [pids]
+
+    np.savetxt('nodes.txt', nodes_s, header="*KEYWORD\n*NODES", fmt="%i,%f,%f,%f", comments="")
+    np.savetxt('elements.txt', elements_s, header="*ELEMENT_SOLID", fmt="%8i%8i%8i%8i%8i%8i%8i%8i%8i%8i", comments="")
+
+    parts_with_shared_section(pids, MID)
+
+    filenames = ['nodes.txt', 'elements.txt', 'section.txt', 'material.txt']
+    merge_txt_files(filenames, '%s.k' %filename)
+
+    for fname in filenames:
+        if os.path.exists(fname):
+            os.remove(fname)
+
+
+def output_master_deck(filename, include_filenames, part_velocities, angle):
+    """Outputs a master keyword file, which references the geometry
+    through *INCLUDE and contains only the initial velocity cards.
+    Every velocity (or angle) realization of the same shots is a 
+    separate master deck of a few lines, while the mesh is written once.
+
+    Args:
+        filename (string): Final output name of the master deck.
+        include_filenames (str or list): The included geometry file(s), relative to the master deck's directory.
+        part_velocities (dict): The initial velocity of each part, keyed by its PID.
+        angle (float): Impact angle.
+    """
+    if isinstance(include_filenames, str):
+        include_filenames = [include_filenames]
+
+    with open('%s.k' %filename, 'w') as outfile:
+        outfile.write("*KEYWORD" + "\n")
+        for include_filename in include_filenames:
+            outfile.write("*INCLUDE" + "\n" + "%s" %include_filename + "\n")
+        for pid, velocity in part_velocities.items():
+            outfile.write(initial_velocity_card(pid, velocity, angle))
+        outfile.write("*END")
+        outfile.close()
+    instrumentation.count("bytes written", os.path.getsize('%s.k' %filename))
+
+
 def output_include_file(nodes_s, elements_s, pid, filename, velocity = [], angle = []):
     """Same function as output_keyword_file, 
     but with the absence of property and material.
@@ -162,8 +345,40 @@ def output_general_file(nodes_s, elements_s, filename, ending = ".txt"):
     #changing path in order to produce multiple batches
     os.chdir(change_path)
 
+
+def stream_velocity(velocity_stochasticity_option, *velocity_args, rng = None):
+    """Samples a single initial velocity for the whole shot stream.
+
+    Args:
+        velocity_stochasticity_option (str): The type of stochasticity to apply to the initial velocity. Valid options are "Normal distribution", "Mixed random", "Constant"
+        velocity_args (tuple): The arguments to be passed to the stochasticity function.
+        rng (numpy.random.Generator, int or None, optional): Random generator (or seed) used for sampling.
+
+    Returns:
+        float: The sampled velocity (None if the option is not valid).
+    """
+    user_initial_velocity = None
+
+    if velocity_stochasticity_option == "Normal distribution":
+        user_initial_velocity = float(vs.normally_distributed_velocities(*velocity_args, rng = rng)[0])
+    
+    elif velocity_stochasticity_option == "Mixed random":
+        user_initial_velocity = float(vs.mixed_random_velocities_array(*velocity_args, rng = rng)[0])
+    
+    elif velocity_stochasticity_option == "Constant":
+        user_initial_velocity = velocity_args[0]
+    
+    else:
+        pass
+        #print("Arguments for initial velocity stochasticity not found, constant velocity applied: ", user_initial_velocity)
+
+    if user_initial_velocity is not None:
+        instrumentation.observe("applied velocity", user_initial_velocity)
+
+    return user_initial_velocity
+
     
-def apply_initial_velocity(filename, velocity_stochasticity_option, *velocity_args, angle, dyna_id = 1):
+def apply_initial_velocity(filename, velocity_stochasticity_option, *velocity_args, angle, dyna_id = 1, rng = None):
     """Applies (or not) initial velocity to sphere entities in an LS-DYNA file.
 
     Args:
@@ -172,6 +387,7 @@ def apply_initial_velocity(filename, velocity_stochasticity_option, *velocity_ar
         stochasticity_args (tuple): The arguments to be passed to the stochasticity function.
         angle (float): The impact angle to apply.
         pid (int): The process ID for the LS-DYNA file.
+        rng (numpy.random.Generator, int or None, optional): Random generator (or seed) used for sampling the velocity.
 
     Raises:
         TypeError: If user_initial_velocity is not False, float, or int.
@@ -191,21 +407,7 @@ def apply_initial_velocity(filename, velocity_stochasticity_option, *velocity_ar
     #if isinstance(user_initial_velocity, (float, int)) and not user_initial_velocity == True or not user_initial_velocity:
         
     #feature for application of stochastic velocity to the stream added
-    if velocity_stochasticity_option == "Normal distribution":
-        user_initial_velocity = vs.normally_distributed_velocity(*velocity_args)
-        print("applied velocity: ", user_initial_velocity)
-    
-    elif velocity_stochasticity_option == "Mixed random":
-        user_initial_velocity = vs.mixed_random_velocities(*velocity_args)
-        print("applied velocity: ", user_initial_velocity)
-    
-    elif velocity_stochasticity_option == "Constant":
-        user_initial_velocity = velocity_args[0]
-        print("applied velocity: ", user_initial_velocity)
-    
-    else:
-        pass
-        #print("Arguments for initial velocity stochasticity not found, constant velocity applied: ", user_initial_velocity)
+    user_initial_velocity = stream_velocity(velocity_stochasticity_option, *velocity_args, rng = rng)
 
 
     if os.path.exists(f"{filename}.k"):
@@ -216,6 +418,7 @@ def apply_initial_velocity(filename, velocity_stochasticity_option, *velocity_ar
         with open(f"{filename}.k", "a+") as fout:
             fout.write(text)
         fout.close()
+        instrumentation.count("bytes written", len(text))
         """with open(f"{filename}.k", "r+") as fout:
             text = fout.read()
             if "*END" in text:
@@ -233,3 +436,34 @@ def apply_initial_velocity(filename, velocity_stochasticity_option, *velocity_ar
     #else:
     #    raise TypeError("initial_velocity should be set as False or int/float!")
 
+
+def apply_initial_velocity_include(filename, geometry_filename, velocity_stochasticity_option, *velocity_args, angle, dyna_id = 1, rng = None):
+    """Same function as apply_initial_velocity, but instead of appending
+    the initial velocity to the whole keyword file, it writes a master deck
+    which includes the geometry file (see output_geometry_include_file). 
+    Thus, every velocity realization costs only a few lines of output.
+
+    Args:
+        filename (str): Name of the output master deck.
+        geometry_filename (str): Name of the geometry include file (without the .k extension).
+        velocity_stochasticity_option (str): The type of stochasticity to apply to the initial velocity. Valid options are "Normal distribution", "Mixed random", "Constant"
+        velocity_args (tuple): The arguments to be passed to the stochasticity function.
+        angle (float): The impact angle to apply.
+        dyna_id (int): The PID of the shots in the geometry file.
+        rng (numpy.random.Generator, int or None, optional): Random generator (or seed) used for sampling the velocity.
+
+    Returns:
+        float: The applied velocity.
+    """
+    user_initial_velocity = stream_velocity(velocity_stochasticity_option, *velocity_args, rng = rng)
+
+    if not (user_initial_velocity and angle):
+        print("Please choose a valid velocity stochasticity option (Normal distribution, Mixed random or Constant) and impact angle, no initial velocity applied.")
+    elif os.path.exists(f"{geometry_filename}.k"):
+        # the include path is relative to the master deck's directory
+        include_filename = os.path.relpath(os.path.abspath(f"{geometry_filename}.k"), os.path.dirname(os.path.abspath(filename)))
+        output_master_deck(filename, include_filename, {dyna_id: user_initial_velocity}, angle)
+    else:
+        print("Geometry file %s.k not found, export it first with the LSDYNA-geometry output option." %geometry_filename)
+
+    return user_initial_velocity
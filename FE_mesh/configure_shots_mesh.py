@@ -1,18 +1,27 @@
 import numpy as np
+import os
 import sys 
 import sphere_generator
 from FE_mesh.configure_sphere_entity import sphere_entity
-from FE_mesh.LSDYNA_keyword_manager import output_keyword_file, output_general_file, output_include_file
+from FE_mesh.LSDYNA_keyword_manager import output_keyword_file, output_general_file, output_include_file, output_keyword_file_velocity_bins, output_geometry_include_file
 from FE_mesh.utilities import working_directory
+from FE_mesh.space_filling_curves import space_filling_order
+import FE_mesh.instrumentation as instrumentation
 
 #call this if you want the mesh to be exported to a file
-def export_mesh_geometry(nodes, elements, filename, output_option, pid):
+@instrumentation.staged("export")
+def export_mesh_geometry(nodes, elements, filename, output_option, pid, part_velocities = None, angle = None, progress = None):
     """Export mesh geometry to a file.
 
     Args:
         nodes (numpy.ndarray): Nodes array.
         elements (numpy.ndarray): Elements array.
         filename (str): Output filename.
+        output_option (str): general, LSDYNA, LSDYNA-entities, LSDYNA-velocity-bins or LSDYNA-geometry.
+        pid (int or list): PID, or the list of PIDs of the elements (only for LSDYNA-geometry).
+        part_velocities (dict, optional): Initial velocity of each velocity bin part, keyed by PID (only for LSDYNA-velocity-bins).
+        angle (float, optional): Impact angle (only for LSDYNA-velocity-bins).
+        progress (ProgressReporter, optional): Reports the bytes written.
     """
     if output_option == "general":
         output_general_file(nodes, elements, filename)
@@ -20,10 +29,19 @@ def export_mesh_geometry(nodes, elements, filename, output_option, pid):
         output_keyword_file(nodes, elements, pid, filename)
     elif output_option == "LSDYNA-entities":
         output_include_file(nodes, elements, pid, filename)
+    elif output_option == "LSDYNA-velocity-bins":
+        output_keyword_file_velocity_bins(nodes, elements, part_velocities, filename, angle)
+    elif output_option == "LSDYNA-geometry":
+        output_geometry_include_file(nodes, elements, pid, filename)
     else:
-        print("Please choose a valid output option: general, LSDYNA or LSDYNA-entities.")
+        print("Please choose a valid output option: general, LSDYNA, LSDYNA-entities, LSDYNA-velocity-bins or LSDYNA-geometry.")
+        return
 
-def create_mesh_geometry(mesh_method, spacing_method, spheres, element_length, output_path, pid = 1, renumbering_point = 0):
+    if progress is not None:
+        output_filename = filename + (".txt" if output_option == "general" else ".k")
+        progress.update("export", force=True, filename=output_filename, bytes_written=os.path.getsize(output_filename))
+
+def create_mesh_geometry(mesh_method, spacing_method, spheres, element_length, output_path, pid = 1, renumbering_point = 0, progress = None, ordering = None):
     """Generates a batch with multiple spheres, based on given positions,
     radiuses and other characteristics included in the analysis.
 
@@ -31,12 +49,19 @@ def create_mesh_geometry(mesh_method, spacing_method, spheres, element_length, o
         mesh_method (string): Method (spherified or normalized) for FE mesh.
         spacing_method (string): Spacing method (linear or nonlinear) for FE mesh.
         spheres (list): List of initialized spheres.
-        element_length (float): FE mesh element length.
+        element_length (float or list): FE mesh element length, or a list with the element length of each sphere
+            (e.g. from mesh_planning.element_lengths).
         filename (str): Name of the batch file.
         output_path (str) : The name of the output path
-        pid (int): PID.
+        pid (int or list): PID, or a list with the PID of each sphere (e.g. from velocity_bins).
         renumbering_point (int): Renumbering point of the .k file entities.
         initial_velocity (boolean or int/float): Initial velocity of generated spheres.
+        progress (ProgressReporter, optional): Reports the meshed shots and elements. If the run is cancelled,
+            the meshing stops after the current sphere and the mesh of the complete spheres is returned.
+        ordering (string, optional): Space filling curve (morton or hilbert) which orders the spheres by their
+            centers before the assembly, so the node and element IDs of neighbouring spheres are close. The nodes
+            and elements of each sphere are always numbered consecutively. If None, the spheres are meshed in
+            their given order.
 
     Returns:
         list: Nodes and elements of sphere mesh.
@@ -49,10 +74,27 @@ def create_mesh_geometry(mesh_method, spacing_method, spheres, element_length, o
     if any(isinstance(s, sphere_generator.sphere.sphere_2D) for s in spheres):
         print('Mesh generation is not available for 2D spheres')
 
+    if isinstance(pid, (list, tuple, np.ndarray)):
+        pids = pid
+    else:
+        pids = [pid]*len(spheres)
+
+    if isinstance(element_length, (list, tuple, np.ndarray)):
+        element_lengths = element_length
+    else:
+        element_lengths = [element_length]*len(spheres)
+
+    if ordering is not None:
+        order = space_filling_order([(s.x, s.y, s.z) for s in spheres], ordering)
+        spheres = [spheres[i] for i in order]
+        pids = [pids[i] for i in order]
+        element_lengths = [element_lengths[i] for i in order]
+
     nodes_all = np.reshape(np.zeros((1, 4)), (1, 4))
     elements_all = np.reshape(np.zeros((1, 10)), (1, 10))
-    for s in spheres:
-        [nodes_s_tmp, elements_s_tmp] = sphere_entity(mesh_method, spacing_method, s.r, element_length, s.x, s.y, s.z, pid)
+    meshed_shots = 0
+    for meshed_shots, (s, s_pid, s_element_length) in enumerate(zip(spheres, pids, element_lengths), start=1):
+        [nodes_s_tmp, elements_s_tmp] = sphere_entity(mesh_method, spacing_method, s.r, s_element_length, s.x, s.y, s.z, s_pid)
         if len(spheres) > 1:
             # renumber indexes of elements and nodes ids
             nodes_s_tmp[:, 0] += np.shape(nodes_all)[0] - 1 # here we dont need + 1 
@@ -64,8 +106,17 @@ def create_mesh_geometry(mesh_method, spacing_method, spheres, element_length, o
             pass
 
         # appending nodes and elements matrices
-        nodes_all = np.vstack((nodes_all, nodes_s_tmp))
-        elements_all = np.vstack((elements_all, elements_s_tmp))
+        with instrumentation.stage("assemble"):
+            nodes_all = np.vstack((nodes_all, nodes_s_tmp))
+            elements_all = np.vstack((elements_all, elements_s_tmp))
+        instrumentation.count("elements meshed", np.shape(elements_s_tmp)[0])
+
+        if progress is not None and progress.update("mesh", meshed_shots=meshed_shots, shots=len(spheres),
+                                                    elements_meshed=np.shape(elements_all)[0] - 1):
+            break
+
+    if progress is not None:
+        progress.update("mesh", force=True, meshed_shots=meshed_shots, shots=len(spheres), elements_meshed=np.shape(elements_all)[0] - 1)
 
     # deleting useless first row of matrices
     nodes_all = np.delete(nodes_all, 0, 0)
@@ -1,10 +1,16 @@
-import time
 import numpy as np
 import sys 
 sys.path.append('../sFEre')
 
 from FE_mesh.sphere_mesh import element_length_translator, create_elements, spacing, renumbering_element_pairs
-from FE_mesh.LSDYNA_keyword_manager import output_keyword_file
+import FE_mesh.instrumentation as instrumentation
+
+# unit radius sphere meshes, keyed by (mesh method, spacing method, inner elements, layer elements)
+_template_cache = {}
+# the alternative methods project the inner cube with the half length as scale factor, so their mesh is not proportional to the radius
+SCALABLE_MESH_METHODS = ("spherified_cube", "normalized_cube")
+# correction factors of element_length_translator, for each mesh method
+CORRECTION_FACTOR = {"spherified_cube": 0.707543222, "normalized_cube": 1, "spherified_cube_alt": 0.707543222, "normalized_cube_alt": 1}
 
 
 def mesh_configuration(mesh_method, spacing_method, radius, element_length):
@@ -19,8 +25,7 @@ def mesh_configuration(mesh_method, spacing_method, radius, element_length):
     Returns:
         list: List with mesh configurations.
     """
-    correction_factor = {"spherified_cube": 0.707543222, "normalized_cube": 1, "spherified_cube_alt": 0.707543222, "normalized_cube_alt": 1}
-    correction_factor = correction_factor[mesh_method]
+    correction_factor = CORRECTION_FACTOR[mesh_method]
 
     configs = list(element_length_translator(spacing_method, correction_factor, radius, element_length))
     configs.append(mesh_method)
@@ -102,6 +107,41 @@ def sphere_matrices(method, half_length, no_of_elements, scale_factor, transvers
     return nodes_s, elements_s
 
 
+def sphere_template(mesh_method, spacing_method, inner_elements, layer_elements, scale_factor, spacing_factor):
+    """Returns the mesh of a sphere with unit radius, centered at (0, 0, 0).
+    For the spherified and normalized cube methods, the mesh of a sphere only depends on its
+    radius through the number of inner and layer elements (the spacing factor is independent
+    of the radius), so the meshes of the spheres with the same numbers of elements are scaled
+    copies of the same template, which is created only once and kept in memory.
+
+    Args:
+        mesh_method (string): Mesh method (spherified or normalized).
+        spacing_method (string): Spacing method (linear or nonlinear).
+        inner_elements (float): Cube's elements.
+        layer_elements (int): Elements in between cube and sphere's surface.
+        scale_factor (float): Scale factor to project cube to sphere's surface.
+        spacing_factor (float): Spacing factor for layer elements lengths.
+
+    Returns:
+        ndarray: Nodes matrix of the unit sphere (LS - DYNA form).
+        ndarray: Elements matrix of the unit sphere (LS - DYNA form), with zero pid.
+    """
+    key = (mesh_method, spacing_method, inner_elements, layer_elements)
+    if key in _template_cache:
+        instrumentation.count("template cache hits")
+    else:
+        _template_cache[key] = sphere_matrices(mesh_method, 1/scale_factor, inner_elements, scale_factor, layer_elements, spacing_method, spacing_factor, 0, 0, 0, 0)
+
+    return _template_cache[key]
+
+
+def clear_template_cache():
+    """Removes the sphere templates from memory.
+    """
+    _template_cache.clear()
+
+
+@instrumentation.staged("mesh")
 def sphere_entity(mesh_method, spacing_method, radius, element_length, position_x, position_y, position_z, pid):
     """Function which creates a sphere entiity, containing 
     nodes and elements matrices.
@@ -131,9 +171,21 @@ def sphere_entity(mesh_method, spacing_method, radius, element_length, position_
     mesh_method = configs[6]
     spacing_method = configs[7]
 
-    sphere_entity = sphere_matrices(mesh_method, half_length, inner_elements, scale_factor, layer_elements, spacing_method, spacing_factor, position_x, position_y, position_z, pid)
-
-    print('\x1b[1;37;45m' + "Element length: %f mm." %real_element_length + '\x1b[0m')
+    if mesh_method in SCALABLE_MESH_METHODS:
+        template_nodes, template_elements = sphere_template(mesh_method, spacing_method, inner_elements, layer_elements, scale_factor, spacing_factor)
+
+        # scale and translate the unit sphere template
+        nodes_s = template_nodes.copy()
+        nodes_s[:, 1:] *= half_length*scale_factor
+        nodes_s[:, 1:] += (position_x, position_y, position_z)
+        elements_s = template_elements.copy()
+        elements_s[:, 1] = pid
+        sphere_entity = [nodes_s, elements_s]
+    else:
+        sphere_entity = sphere_matrices(mesh_method, half_length, inner_elements, scale_factor, layer_elements, spacing_method, spacing_factor, position_x, position_y, position_z, pid)
+
+    instrumentation.observe("element length", real_element_length)
+    instrumentation.count("shots meshed")
 
     return sphere_entity
 
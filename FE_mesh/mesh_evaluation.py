@@ -1,6 +1,4 @@
 import numpy as np
-import matplotlib.pyplot as plt
-import sympy as sym
 import sys 
 sys.path.append('../sFEre')
 
@@ -157,6 +155,7 @@ class mesh_accuracy(distance):
 
 
     def jacobian(self):
+            import sympy as sym
             x = self.points[:, 0]
             y = self.points[:, 1]
             z = self.points[:, 2]
@@ -218,6 +217,7 @@ class mesh_accuracy(distance):
 
             
 def plot_3d(nodes):
+    import matplotlib.pyplot as plt
     ax = plt.axes(projection="3d")
     ax.plot3D(nodes[:, 0], nodes[:, 1], nodes[:, 2], "b.", markersize=0.5)
     plt.show()
@@ -0,0 +1,177 @@
+import numpy as np
+
+from FE_mesh.configure_sphere_entity import mesh_configuration, CORRECTION_FACTOR
+
+# approximate size of a node line ("%i,%f,%f,%f", without the ID) and of an element line ("%8i" x 10) in the keyword file, in bytes
+NODE_LINE_BYTES = 30
+ELEMENT_LINE_BYTES = 81
+
+
+def layer_elements(spacing_method, inner_elements):
+    """Closed form number of layer elements (between cube and sphere's surface),
+    as in element_length_translator.
+
+    Args:
+        spacing_method (string): Spacing method (linear or nonlinear).
+        inner_elements (float): Cube's elements (half of the elements along the cube's edge).
+
+    Returns:
+        int: Layer elements.
+    """
+    if spacing_method == "linear":
+        return int(2*inner_elements)
+    return int(inner_elements + np.floor(inner_elements/2) + 1)
+
+
+def sphere_counts(inner_elements, layers):
+    """Closed form numbers of nodes and elements of a sphere mesh: a cube of (2d)^3 elements,
+    wrapped by L layers of 6 (2d)^2 elements.
+
+    Args:
+        inner_elements (float): Cube's elements (d).
+        layers (int): Layer elements (L).
+
+    Returns:
+        int: Nodes of the sphere.
+        int: Elements of the sphere.
+    """
+    edge = int(round(2*inner_elements))
+    nodes = (edge + 1)**3 + layers*(6*edge**2 + 2)
+    elements = 6*edge**2*layers + edge**3
+    return nodes, elements
+
+
+def predicted_counts(mesh_method, spacing_method, radius, element_length):
+    """Predicts the mesh of a sphere without meshing it.
+
+    Args:
+        mesh_method (string): Mesh method (spherified or normalized).
+        spacing_method (string): Spacing method (linear or nonlinear).
+        radius (float): Radius of the sphere.
+        element_length (float): Mesh element length.
+
+    Returns:
+        dict: Nodes, elements, elements through radius (cube's and layer elements) and real element length of the sphere.
+    """
+    configs = mesh_configuration(mesh_method, spacing_method, radius, element_length)
+    inner_elements, layers, real_element_length = configs[1], configs[3], configs[4]
+    nodes, elements = sphere_counts(inner_elements, layers)
+    return {"nodes": nodes, "elements": elements, "elements_through_radius": inner_elements + layers, "element_length": real_element_length}
+
+
+def inner_elements_for_radius_elements(spacing_method, elements_through_radius):
+    """Smallest number of cube's elements (in steps of 0.5, as in element_length_translator)
+    which gives at least the target elements through radius.
+
+    Args:
+        spacing_method (string): Spacing method (linear or nonlinear).
+        elements_through_radius (float): Target cube's and layer elements, from sphere's center to its surface.
+
+    Returns:
+        float: Cube's elements.
+    """
+    inner_elements = 1
+    while inner_elements + layer_elements(spacing_method, inner_elements) < elements_through_radius:
+        inner_elements += 0.5
+    return inner_elements
+
+
+def element_lengths(mesh_method, spacing_method, radii, total_elements = None, elements_through_radius = None):
+    """Chooses the element length of each shot, for a total element budget or a target number
+    of elements through radius, from the closed form counts (without meshing).
+    Every shot gets the same number of elements through radius, so small and large shots
+    are meshed with the same relative resolution. For a budget, it is the highest one
+    whose total elements do not exceed the budget.
+
+    Args:
+        mesh_method (string): Mesh method (spherified or normalized).
+        spacing_method (string): Spacing method (linear or nonlinear).
+        radii (list): Radii of the shots.
+        total_elements (int, optional): Total element budget of the shots.
+        elements_through_radius (float, optional): Target elements through radius of each shot.
+
+    Raises:
+        ValueError: If neither or both of total_elements and elements_through_radius are given.
+
+    Returns:
+        list: Element length of each shot.
+    """
+    if (total_elements is None) == (elements_through_radius is None):
+        raise ValueError("Please give either a total element budget or a target number of elements through radius.")
+
+    if elements_through_radius is not None:
+        inner_elements = inner_elements_for_radius_elements(spacing_method, elements_through_radius)
+    else:
+        inner_elements = 1
+        while len(radii)*sphere_counts(inner_elements + 0.5, layer_elements(spacing_method, inner_elements + 0.5))[1] <= total_elements:
+            inner_elements += 0.5
+        if len(radii)*sphere_counts(inner_elements, layer_elements(spacing_method, inner_elements))[1] > total_elements:
+            print("The element budget is too small, the shots are meshed with the coarsest mesh (%i elements each)."
+                  %sphere_counts(inner_elements, layer_elements(spacing_method, inner_elements))[1])
+
+    # element_length_translator maps this length back to the chosen cube's elements
+    return [CORRECTION_FACTOR[mesh_method]*radius/inner_elements for radius in radii]
+
+
+def _digits(first, last):
+    # total digits of the integers first ... last
+    digits = 0
+    length = len(str(first))
+    while first <= last:
+        end = min(last, 10**length - 1)
+        digits += (end - first + 1)*length
+        first = end + 1
+        length += 1
+    return digits
+
+
+def mesh_plan(mesh_method, spacing_method, spheres, element_length, renumbering_point = 0):
+    """Predicts the mesh of a batch of shots and the size of its output file, without meshing it.
+
+    Args:
+        mesh_method (string): Mesh method (spherified or normalized).
+        spacing_method (string): Spacing method (linear or nonlinear).
+        spheres (list): List of initialized spheres.
+        element_length (float or list): FE mesh element length, or the element length of each sphere.
+        renumbering_point (int): Renumbering point of the node and element IDs.
+
+    Returns:
+        dict: Counts of each shot ("shots") and the total nodes, elements and output file size in bytes.
+    """
+    if not isinstance(spheres, list):
+        spheres = [spheres]
+    if isinstance(element_length, (list, tuple, np.ndarray)):
+        lengths = element_length
+    else:
+        lengths = [element_length]*len(spheres)
+
+    shots = [predicted_counts(mesh_method, spacing_method, s.r, length) for s, length in zip(spheres, lengths)]
+    nodes = sum(shot["nodes"] for shot in shots)
+    elements = sum(shot["elements"] for shot in shots)
+
+    # node IDs are written without padding, so their digits are counted
+    file_size = nodes*NODE_LINE_BYTES + _digits(renumbering_point + 1, renumbering_point + nodes) + elements*ELEMENT_LINE_BYTES
+
+    return {"shots": shots, "nodes": nodes, "elements": elements, "file_size": file_size}
+
+
+def print_mesh_plan(plan, title = "Mesh plan"):
+    """Prints a dry-run mesh plan (see mesh_plan).
+
+    Args:
+        plan (dict): The mesh plan.
+        title (string): Title of the plan.
+    """
+    shots = plan["shots"]
+    print(title)
+    if shots:
+        lengths = [shot["element_length"] for shot in shots]
+        through_radius = [shot["elements_through_radius"] for shot in shots]
+        shot_elements = [shot["elements"] for shot in shots]
+        print("    shots: %i" %len(shots))
+        print("    element length: %.4f - %.4f" %(min(lengths), max(lengths)))
+        print("    elements through radius: %g - %g" %(min(through_radius), max(through_radius)))
+        print("    elements per shot: %i - %i" %(min(shot_elements), max(shot_elements)))
+    print("    nodes: %i" %plan["nodes"])
+    print("    elements: %i" %plan["elements"])
+    print("    output file size: %.1f MB" %(plan["file_size"]/1024**2))
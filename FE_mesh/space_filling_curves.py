@@ -0,0 +1,115 @@
+import numpy as np
+
+
+def quantize_points(points, bits = 10):
+    """Maps points to the integer cells of a 2^bits grid, over their bounding box.
+
+    Args:
+        points (ndarray): Points coordinates (N x dimensions).
+        bits (int): Bits per coordinate.
+
+    Returns:
+        ndarray: Integer cell coordinates of the points (N x dimensions).
+    """
+    points = np.asarray(points, dtype=float)
+    points = np.reshape(points, (np.shape(points)[0], -1))
+    lower = np.min(points, axis=0) if np.shape(points)[0] else 0
+    extent = np.max(points, axis=0) - lower if np.shape(points)[0] else 1
+    extent = np.where(extent > 0, extent, 1)
+    cells = (points - lower)/extent*((1 << bits) - 1)
+
+    return np.rint(cells).astype(np.uint64)
+
+
+def morton_keys(points, bits = 10):
+    """Morton (Z-order) keys of points, by interleaving the bits
+    of their quantized coordinates.
+
+    Args:
+        points (ndarray): Points coordinates (N x dimensions).
+        bits (int): Bits per coordinate (bits x dimensions must not exceed 64).
+
+    Returns:
+        ndarray: Morton key of each point.
+    """
+    cells = quantize_points(points, bits)
+    dimensions = np.shape(cells)[1]
+    keys = np.zeros(np.shape(cells)[0], dtype=np.uint64)
+    for bit in range(bits - 1, -1, -1):
+        for i in range(dimensions):
+            keys = (keys << np.uint64(1)) | ((cells[:, i] >> np.uint64(bit)) & np.uint64(1))
+
+    return keys
+
+
+def hilbert_keys(points, bits = 10):
+    """Hilbert keys of points, with Skilling's transpose algorithm
+    ("Programming the Hilbert curve", AIP Conf. Proc. 707, 2004).
+    Unlike the Morton curve, consecutive cells of the Hilbert curve
+    are always neighbours.
+
+    Args:
+        points (ndarray): Points coordinates (N x dimensions).
+        bits (int): Bits per coordinate (bits x dimensions must not exceed 64).
+
+    Returns:
+        ndarray: Hilbert key of each point.
+    """
+    x = quantize_points(points, bits)
+    dimensions = np.shape(x)[1]
+
+    # inverse undo
+    q = np.uint64(1 << (bits - 1))
+    while q > 1:
+        p = q - np.uint64(1)
+        for i in range(dimensions):
+            high = (x[:, i] & q) != 0
+            t = (x[:, 0] ^ x[:, i]) & p
+            x[:, 0] = np.where(high, x[:, 0] ^ p, x[:, 0] ^ t)
+            if i != 0:
+                x[:, i] = np.where(high, x[:, i], x[:, i] ^ t)
+        q >>= np.uint64(1)
+
+    # gray encode
+    for i in range(1, dimensions):
+        x[:, i] ^= x[:, i - 1]
+    t = np.zeros(np.shape(x)[0], dtype=np.uint64)
+    q = np.uint64(1 << (bits - 1))
+    while q > 1:
+        t = np.where((x[:, dimensions - 1] & q) != 0, t ^ (q - np.uint64(1)), t)
+        q >>= np.uint64(1)
+    x ^= t[:, None]
+
+    # the key interleaves the bits of the transposed coordinates
+    keys = np.zeros(np.shape(x)[0], dtype=np.uint64)
+    for bit in range(bits - 1, -1, -1):
+        for i in range(dimensions):
+            keys = (keys << np.uint64(1)) | ((x[:, i] >> np.uint64(bit)) & np.uint64(1))
+
+    return keys
+
+
+def space_filling_order(points, curve = "hilbert", bits = 10):
+    """Order of points along a space filling curve.
+
+    Args:
+        points (ndarray): Points coordinates (N x dimensions).
+        curve (string): Space filling curve (morton or hilbert).
+        bits (int): Bits per coordinate.
+
+    Raises:
+        ValueError: If the curve is not valid.
+
+    Returns:
+        ndarray: Indices which sort the points along the curve.
+    """
+    if len(points) == 0:
+        return np.zeros(0, dtype=int)
+    if curve == "morton":
+        keys = morton_keys(points, bits)
+    elif curve == "hilbert":
+        keys = hilbert_keys(points, bits)
+    else:
+        raise ValueError('Please choose a valid space filling curve: "morton" or "hilbert".')
+
+    return np.argsort(keys, kind="stable")
@@ -1,5 +1,5 @@
 import os
-import matplotlib.pyplot as plt
+import FE_mesh.instrumentation as instrumentation
 
 
 def working_directory(path):   
@@ -24,6 +24,7 @@ def merge_txt_files(filenames_list, final_output_filename, delete_temp = False):
                 for line in infile:
                     outfile.write(line)
         outfile.close()
+    instrumentation.count("bytes written", os.path.getsize(final_output_filename))
     if delete_temp:
         for f in filenames_list:
             if os.path.exists(f):
@@ -31,6 +32,7 @@ def merge_txt_files(filenames_list, final_output_filename, delete_temp = False):
 
 
 def plot_grid(grid):
+    import matplotlib.pyplot as plt
     ax = plt.axes(projection="3d")
     ax.plot3D(grid[:, 1], grid[:, 2], grid[:, 3], marker = ".", markersize = '1', c="k")
     plt.show()
\ No newline at end of file
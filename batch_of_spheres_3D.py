@@ -3,7 +3,10 @@ from FE_mesh.LSDYNA_keyword_manager import apply_initial_velocity
 from sphere_generator.shot_stream_generator import shot_stream
 from sphere_generator.utilities import *
 import os
+from run_tools.instrumentation import run_report
+from run_tools.progress import ProgressReporter, print_progress, batch_range, cancel_on_interrupt
 from sieve_analysis_tools import sieve_analysis_evaluation as s
+from matplotlib import pyplot as plt
 
 def main():
     #**************************************INPUT SECTION******************************************
@@ -45,35 +48,48 @@ def main():
     spheres_list = [] # initialize empty spheres list
     coverage_list = []
     velocities_list = []
-    for set_number in range(spheres_batches):
-
-        # Generate stream of random distributed shots in space
-        stream = shot_stream(spheres_number, 
-                            problem_dimensions, 
-                            box, 
-                            box_angle, 
-                            mean_radius_setter=mean_radius,
-                            radius_standard_deviation_setter=radius_std)
-        spheres = stream.generate() # Create the stream
-        spheres_list.extend(spheres)
+    # report the progress of the batches and stop cleanly (after the current step) on Ctrl+C
+    progress = ProgressReporter(print_progress, interval=1.0)
+    cancel_on_interrupt(progress)
+
+    for set_number in batch_range(spheres_batches, progress):
+
+        # a JSON run report (stage timings, peak memory, counters) is written for every batch
+        # (the peak memory of every stage is traced with tracemalloc, set trace_memory=False for faster runs)
+        report_filename = os.path.join(directory, f"{filename_to_export}{set_number + 1}_report.json")
+        with run_report(f"{filename_to_export}{set_number + 1}", trace_memory=True, filename=report_filename):
+
+            # Generate stream of random distributed shots in space
+            stream = shot_stream(spheres_number, 
+                                problem_dimensions, 
+                                box, 
+                                box_angle, 
+                                mean_radius_setter=mean_radius,
+                                radius_standard_deviation_setter=radius_std)
+            spheres = stream.generate(progress) # Create the stream
+            if progress.cancelled:
+                break # the cancelled batch is not meshed nor exported
+            spheres_list.extend(spheres)
         
-        # Change the filename according to current index of set number
-        filename = f"{filename_to_export}{set_number + 1}"
+            # Change the filename according to current index of set number
+            filename = f"{filename_to_export}{set_number + 1}"
         
-        # Define FE mesh and spacing method
-        # process and output of meshed generated spheres
-        (nodes, elements) = create_mesh_geometry("spherified_cube", "nonlinear", spheres, element_length, directory, pid = 1000000, renumbering_point=10000000)
-        export_mesh_geometry(nodes, elements, filename, "LSDYNA", pid = 1000000) #if you don't want to output geometry to a file, comment this
-
-        # Call this function if you want to apply initial velocity to the shot stream, in LSDYNA keyword format.
-        applied_velocity = apply_initial_velocity(filename, "Normal distribution", *(velocity, velocity_standard_deviation, minimum_velocity, maximum_velocity), angle = box_angle, dyna_id=1000000)
-        velocities_list.append(applied_velocity)
-
-        #Calculate percentage of coverage
-        shot_dents_radii = [impigment_diameter_calculation(sph.r,velocity)/2 for sph in spheres_list]
-        centers = [(sph.x , sph.z) for sph in spheres_list]
-        coverage = stream.calculate_coverage(centers,shot_dents_radii,0.01)
-        coverage_list.append(coverage)
+            # Define FE mesh and spacing method
+            # process and output of meshed generated spheres
+            (nodes, elements) = create_mesh_geometry("spherified_cube", "nonlinear", spheres, element_length, directory, pid = 1000000, renumbering_point=10000000, progress = progress)
+            if progress.cancelled:
+                break
+            export_mesh_geometry(nodes, elements, filename, "LSDYNA", pid = 1000000, progress = progress) #if you don't want to output geometry to a file, comment this
+
+            # Call this function if you want to apply initial velocity to the shot stream, in LSDYNA keyword format.
+            applied_velocity = apply_initial_velocity(filename, "Normal distribution", *(velocity, velocity_standard_deviation, minimum_velocity, maximum_velocity), angle = box_angle, dyna_id=1000000)
+            velocities_list.append(applied_velocity)
+
+            #Calculate percentage of coverage
+            shot_dents_radii = [impigment_diameter_calculation(sph.r,velocity)/2 for sph in spheres_list]
+            centers = [(sph.x , sph.z) for sph in spheres_list]
+            coverage = stream.calculate_coverage(centers,shot_dents_radii,0.01)
+            coverage_list.append(coverage)
     
 
     plt.figure()
@@ -81,7 +97,10 @@ def main():
     for i, item_group in enumerate(transposed_data):
         plt.plot(item_group, label='Item {}'.format(i + 1))
 
-    stream.plot_coverage(spheres_list,velocity)
+    # coverage map of all the batches, from the dent count grid of the last coverage calculation
+    # (add filename="coverage_map.png" or "coverage_map.npy" to save it)
+    stream.plot_coverage_map()
+    #stream.plot_coverage(spheres_list,velocity) # one patch per dent, slow for dense streams
 
     visualize_velocity_distribution(velocities_list)    
         
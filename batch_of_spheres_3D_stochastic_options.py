@@ -1,9 +1,10 @@
 from FE_mesh.configure_shots_mesh import *
-from FE_mesh.LSDYNA_keyword_manager import apply_initial_velocity
 from sphere_generator.shot_stream_generator import shot_stream
 from sphere_generator.utilities import *
 import os
-from sieve_analysis_tools import fitters
+from run_tools.instrumentation import run_report
+from run_tools.progress import ProgressReporter, print_progress, batch_range, cancel_on_interrupt
+from sieve_analysis_tools import fit_cache
 from sieve_analysis_tools import sieve_analysis_evaluation as s
 import numpy as np
 from matplotlib import pyplot as plt
@@ -39,23 +40,19 @@ def main():
     #retained_weight = [0.0, 5, 84, 11]
 
     sieve_analysis_data = [sieve_levels , retained_weight]
-    mix_distribution = fitters.fit_sieve_distribution(sieve_analysis_data,shots_material_density,'Mixed Gaussian')
+    # the fitted distribution is stored on disk, so repeated runs with the same sieve data skip the fitting
+    # call fit_cache.invalidate_fit (or fit_cache.clear_fit_cache) to fit again
+    mix_distribution = fit_cache.cached_fit_sieve_distribution(sieve_analysis_data,shots_material_density,'Mixed Gaussian')
+    # Alternatively, sample the diameters directly from the measured sieve histogram, without fitting
+    # (with "from sieve_analysis_tools import statistical_tools")
+    #mix_distribution = statistical_tools.empirical_sieve_distribution(sieve_analysis_data, shots_material_density)
     print(mix_distribution)
-    #mean_radius = mix_distribution.mean/2
-    #radius_std = mix_distribution.stdev/2
+    total_spheres = 10 # total number of sphere created
+    diameter_bounds = (0.1, 2.) # the sampled diameters are truncated inside the sieves range
+    # "random" samples the diameters independently, "stratified" (or "stratified-mass") allocates a fixed number of
+    # shots per sieve, so that even small batches reproduce the measured sieve curve
+    diameter_sampling = "random"
 
-    #mean_radius = 1.4/2
-    #radius_std = 0.135/2
-
-    
-    mean_radius = [mix_distribution.mean_1/2, mix_distribution.mean_2/2] # average radius of created sphere
-    radius_std = [mix_distribution.stdev_1/2, mix_distribution.stdev_2/2] # standard deviation of radius for the created sphere
-    total_spheres = 10
-    
-    proportion = mix_distribution.mix_proportion
-    
-    spheres_number = [int(total_spheres*proportion), int(total_spheres*(1-proportion))] # total number of sphere created
-    #spheres_number = total_spheres
     # Define FE length for spheres
     element_length = 0.04
 
@@ -85,40 +82,63 @@ def main():
     coverage_list = []
     spheres_list = [] # initialize empty spheres list
     velocities_list = [] # initialize empty applied velocities list
-    for set_number in range(spheres_batches):
-
-        # Generate stream of random distributed shots in space
-        stream = shot_stream(spheres_number, 
-                            problem_dimensions, 
-                            box, 
-                            box_angle, 
-                            mean_radius_setter=mean_radius,                             
-                            radius_standard_deviation_setter=radius_std)
-        spheres = stream.generate() # Create the stream
+    # report the progress of the batches and stop cleanly (after the current step) on Ctrl+C
+    progress = ProgressReporter(print_progress, interval=1.0)
+    cancel_on_interrupt(progress)
+
+    for set_number in batch_range(spheres_batches, progress):
+
+        # a JSON run report (stage timings, peak memory, counters) is written for every batch
+        # (the peak memory of every stage is traced with tracemalloc, set trace_memory=False for faster runs)
+        report_filename = os.path.join(directory, f"{filename_to_export}_{set_number + 1}_report.json")
+        with run_report(f"{filename_to_export}_{set_number + 1}", trace_memory=True, filename=report_filename):
+
+            # Generate stream of random distributed shots in space
+            stream = shot_stream(total_spheres, 
+                                problem_dimensions, 
+                                box, 
+                                box_angle, 
+                                diameter_distribution_setter=mix_distribution,
+                                diameter_bounds_setter=diameter_bounds,
+                                diameter_sampling_setter=diameter_sampling,
+                                diameter_classes_setter=sorted(sieve_levels))
+            spheres = stream.generate(progress) # Create the stream
+            if progress.cancelled:
+                break # the cancelled batch is not meshed nor exported
         
-        # Change the filename according to current index of set number
-        filename = f"{filename_to_export}_{set_number + 1}"
+            # Change the filename according to current index of set number
+            filename = f"{filename_to_export}_{set_number + 1}"
         
-        # Define FE mesh and spacing method
-        # process and output of meshed generated spheres
-        (nodes, elements) = create_mesh_geometry("spherified_cube", "nonlinear", spheres, element_length, directory, pid = 1000000, renumbering_point=1000000)
-        export_mesh_geometry(nodes, elements, filename, "LSDYNA", pid = 1000000) #if you don't want to output geometry to a file, comment this
-
-        # Call this function if you want to apply initial velocity to the shot stream, in LSDYNA keyword format.
-        # Currently, an absolute initial velocity of 70 m/s will be applied.
-
-        #applied_velocity = apply_initial_velocity(filename, nominal_velocity, velocity_stochasticity_approach, *velocity_params, angle = box_angle)
-        #velocity_params = (70, 70*0.05)
-        #applied_velocity = apply_initial_velocity(filename, 75, "Normal distribution", *velocity_params, angle = box_angle, pid=1000000)
+            # Define FE mesh and spacing method
+            # process and output of meshed generated spheres
+            (nodes, elements) = create_mesh_geometry("spherified_cube", "nonlinear", spheres, element_length, directory, pid = 1000000, renumbering_point=1000000, progress = progress)
+            if progress.cancelled:
+                break
+            export_mesh_geometry(nodes, elements, filename, "LSDYNA", pid = 1000000, progress = progress) #if you don't want to output geometry to a file, comment this
+
+            # Call this function if you want to apply initial velocity to the shot stream, in LSDYNA keyword format.
+            # Currently, an absolute initial velocity of 70 m/s will be applied.
+
+            #applied_velocity = apply_initial_velocity(filename, nominal_velocity, velocity_stochasticity_approach, *velocity_params, angle = box_angle)
+            #velocity_params = (70, 70*0.05)
+            #applied_velocity = apply_initial_velocity(filename, 75, "Normal distribution", *velocity_params, angle = box_angle, pid=1000000)
         
-        #velocities_list.append(applied_velocity)
-        spheres_list.extend(spheres)
+            #velocities_list.append(applied_velocity)
+
+            # Alternatively, sample one velocity per shot and group the shots into velocity bins (one part per bin),
+            # in order to represent the whole velocity distribution in a single keyword file
+            #shot_velocities = sample_shot_velocities("Mixed random", len(spheres), *velocity_params)
+            #shot_pids, part_velocities = velocity_bins(shot_velocities, 10, first_pid = 1000000)
+            #(nodes, elements) = create_mesh_geometry("spherified_cube", "nonlinear", spheres, element_length, directory, pid = list(shot_pids), renumbering_point=1000000)
+            #export_mesh_geometry(nodes, elements, filename, "LSDYNA-velocity-bins", pid = 1000000, part_velocities = part_velocities, angle = box_angle)
+            #velocities_list.extend(shot_velocities)
+            spheres_list.extend(spheres)
         
-        #Calculate percentage of coverage
-        shot_dents = [impigment_diameter_calculation(sph.r,70)/2 for sph in spheres_list]
-        centers = [(sph.x , sph.z) for sph in spheres_list]
-        coverage = stream.calculate_coverage(centers,shot_dents,0.01)
-        coverage_list.append(coverage)
+            #Calculate percentage of coverage
+            shot_dents = [impigment_diameter_calculation(sph.r,70)/2 for sph in spheres_list]
+            centers = [(sph.x , sph.z) for sph in spheres_list]
+            coverage = stream.calculate_coverage(centers,shot_dents,0.01)
+            coverage_list.append(coverage)
 
     #plt.figure()
 
@@ -127,7 +147,8 @@ def main():
         plt.plot(item_group, label='Item {}'.format(i + 1))
 
     #2D Plot of the covered area
-    stream.plot_coverage(spheres_list,70)
+    stream.plot_coverage_map()
+    #stream.plot_coverage(spheres_list,70) # one patch per dent, slow for dense streams
     
     #Plot distribution of velocities
     plt.hist(velocities_list)
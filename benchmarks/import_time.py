@@ -0,0 +1,61 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the packages imported by a headless worker, that only generates and meshes spheres
+HEADLESS_IMPORTS = "import sphere_generator, FE_mesh, sieve_analysis_tools"
+
+# the optional dependencies that must not be imported until plotting or fitting is used
+DEFERRED_MODULES = ("matplotlib", "open3d", "reliability", "sympy", "scipy.optimize", "scipy.stats")
+
+def measure_import_time(statement = HEADLESS_IMPORTS, repeats = 5):
+    """
+    Measures the time to execute an import statement, in fresh interpreters (so nothing is imported yet).
+
+    Args:
+    statement (str): The import statement.
+    repeats (int): The number of measurements.
+
+    Returns:
+    dict: The median and minimum import time in seconds, and the deferred modules that were imported.
+    """
+    code = ("import sys, time, json\n"
+            "start = time.perf_counter()\n"
+            "%s\n"
+            "elapsed = time.perf_counter() - start\n"
+            "print(json.dumps({'time': elapsed, 'modules': [m for m in %r if m in sys.modules]}))\n") %(statement, DEFERRED_MODULES)
+
+    times = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-c", code], cwd=REPOSITORY_DIRECTORY, capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        times.append(result["time"])
+
+    times.sort()
+    return {"statement": statement, "median": times[len(times)//2], "minimum": times[0], "imported_deferred_modules": result["modules"]}
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time regression benchmark of the headless packages.")
+    parser.add_argument("--threshold", type=float, default=1.0, help="maximum median import time in seconds")
+    parser.add_argument("--repeats", type=int, default=5, help="number of fresh interpreters")
+    arguments = parser.parse_args()
+
+    result = measure_import_time(repeats=arguments.repeats)
+    print(json.dumps(result, indent=2))
+
+    failed = False
+    if result["median"] > arguments.threshold:
+        print("Import time regression: %.3f s > %.3f s" %(result["median"], arguments.threshold))
+        failed = True
+    if result["imported_deferred_modules"]:
+        print("Deferred modules imported at startup: " + ", ".join(result["imported_deferred_modules"]))
+        failed = True
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
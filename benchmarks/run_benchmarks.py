@@ -0,0 +1,281 @@
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY_DIRECTORY)
+
+from sphere_generator.shot_stream_generator import shot_stream
+from sphere_generator.sphere import sphere_3D
+from sphere_generator.utilities import box_getter, covered_area
+from FE_mesh.configure_sphere_entity import sphere_entity
+from FE_mesh.configure_shots_mesh import create_mesh_geometry
+from FE_mesh.LSDYNA_keyword_manager import output_keyword_file, output_include_file, output_geometry_include_file
+from FE_mesh.mesh_evaluation import error_types, mesh_accuracy
+import sieve_analysis_tools.distributions as dist
+import sieve_analysis_tools.statistical_tools as st
+from sieve_analysis_tools import fitters
+
+# the sieve analysis data of the examples
+SIEVE_ANALYSIS_DATA = [[2., 1.6, 1.4, 1.25, 1.12, 1., 0.9, 0.8, 0.71, 0.6, 0.5, 0.4, 0.3, 0.2, 0.1, 0.],
+                       [0.0, 0.1, 2.4, 46.3, 42.4, 24.8, 5.6, 5.3, 5.3, 8.8, 9.7, 7.1, 1.7, 0.2, 0.1, 0.0]]
+SHOTS_MATERIAL_DENSITY = 0.00785
+
+def time_call(function, repeats = 3, minimum_time = 0.02):
+    """
+    Times a function. Fast functions are called several times per measurement, so that every
+    measurement lasts at least minimum_time. The output of the function is suppressed.
+
+    Args:
+    function (callable): The function to time, without arguments.
+    repeats (int): The number of measurements.
+    minimum_time (float): The minimum duration of a measurement in seconds.
+
+    Returns:
+    dict: The median and minimum time per call in seconds, the calls per measurement and the measurements.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        function() # warm up and calibration
+        elapsed = time.perf_counter() - start
+        number = max(1, int(math.ceil(minimum_time / max(elapsed, 1e-9)))) if elapsed < minimum_time else 1
+
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for _ in range(number):
+                function()
+            times.append((time.perf_counter() - start) / number)
+
+    times.sort()
+    return {"median": times[len(times)//2], "minimum": times[0], "number": number, "repeats": repeats}
+
+@contextlib.contextmanager
+def temporary_working_directory():
+    """
+    Runs the keyword writers (which write to the current directory) inside a temporary directory.
+    """
+    current_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            yield directory
+        finally:
+            os.chdir(current_directory)
+
+def seeded(function, seed = 0):
+    """
+    Wraps a function, so that the random states of the random and numpy modules are reset before every call.
+    """
+    def wrapper():
+        random.seed(seed)
+        np.random.seed(seed)
+        return function()
+    return wrapper
+
+def mesh_of_sphere(radius, element_length):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return sphere_entity("spherified_cube", "nonlinear", radius, element_length, 0, 0, 0, 1000000)
+
+def benchmark_generate(quick):
+    """shot_stream.generate, for a number of shots and a packing density (volume of the shots / volume of the box)."""
+    radius = 0.35
+    for number_of_shots in ([10, 50] if quick else [10, 50, 100]):
+        for packing_density in ([0.05, 0.15] if quick else [0.05, 0.15, 0.25]):
+            side = (number_of_shots * 4/3 * math.pi * radius**3 / packing_density) ** (1/3)
+            box = box_getter(3, side, side, side)
+            stream = shot_stream(number_of_shots, 3, box, 90, mean_radius_setter=radius, radius_standard_deviation_setter=0.03)
+            yield {"shots": number_of_shots, "packing_density": packing_density}, seeded(stream.generate)
+
+def benchmark_sphere_entity(quick):
+    """sphere_entity, for an element length (radius 0.5)."""
+    for element_length in ([0.08, 0.04] if quick else [0.08, 0.05, 0.03, 0.02]):
+        yield {"element_length": element_length}, lambda element_length=element_length: mesh_of_sphere(0.5, element_length)
+
+def benchmark_create_mesh_geometry(quick):
+    """create_mesh_geometry, for a number of shots (radius 0.35, element length 0.05)."""
+    for number_of_shots in ([1, 5] if quick else [1, 5, 20]):
+        spheres = [sphere_3D(2*i, 0, 0, 0.35) for i in range(number_of_shots)]
+        def create(spheres=spheres):
+            with temporary_working_directory() as directory:
+                create_mesh_geometry("spherified_cube", "nonlinear", spheres, 0.05, directory, pid=1000000, renumbering_point=1000000)
+        yield {"shots": number_of_shots}, create
+
+def benchmark_keyword_writers(quick):
+    """The LS-DYNA keyword writers, for the number of elements of a meshed sphere (radius 0.5)."""
+    for element_length in ([0.08, 0.04] if quick else [0.08, 0.04, 0.02]):
+        nodes, elements = mesh_of_sphere(0.5, element_length)
+        parameters = {"elements": int(np.shape(elements)[0])}
+
+        def keyword_file(nodes=nodes, elements=elements):
+            with temporary_working_directory():
+                output_keyword_file(nodes, elements, 1000000, "benchmark")
+
+        def include_file(nodes=nodes, elements=elements):
+            with temporary_working_directory():
+                output_include_file(nodes, elements, 1000000, "benchmark")
+
+        def geometry_include_file(nodes=nodes, elements=elements):
+            with temporary_working_directory():
+                output_geometry_include_file(nodes, elements, [1000000], "benchmark")
+
+        yield dict(parameters, writer="output_keyword_file"), keyword_file
+        yield dict(parameters, writer="output_include_file"), include_file
+        yield dict(parameters, writer="output_geometry_include_file"), geometry_include_file
+
+def benchmark_covered_area(quick):
+    """covered_area, for a number of dents and a grid resolution (3x3 surface)."""
+    rng = np.random.default_rng(0)
+    for number_of_dents in ([10, 100] if quick else [10, 100, 1000]):
+        centers = rng.uniform(-1.5, 1.5, (number_of_dents, 2))
+        radii = rng.uniform(0.1, 0.3, number_of_dents)
+        for resolution in ([0.02] if quick else [0.02, 0.01]):
+            yield ({"dents": number_of_dents, "resolution": resolution},
+                   lambda centers=centers, radii=radii, resolution=resolution: covered_area(centers, radii, 3, 3, resolution))
+
+def benchmark_samplers(quick):
+    """The vectorized samplers of the size distributions, for a number of samples."""
+    distributions = {"GaussianDistribution": dist.GaussianDistribution(0.9, 0.2),
+                     "Mixed_Gaussian": dist.Mixed_Gaussian(0.46, 0.17, 1.16, 0.12, 0.79),
+                     "MixedWeibull": dist.MixedWeibull(0.5, 3., 1.2, 10., 0.3),
+                     "EmpiricalSieveDistribution": st.empirical_sieve_distribution(SIEVE_ANALYSIS_DATA, SHOTS_MATERIAL_DENSITY)}
+    for size in ([10**3, 10**5] if quick else [10**3, 10**5, 10**6]):
+        for name, distribution in distributions.items():
+            yield ({"distribution": name, "method": "sample", "size": size},
+                   lambda distribution=distribution, size=size: distribution.sample(size, 0))
+            yield ({"distribution": name, "method": "sample_truncated", "size": size},
+                   lambda distribution=distribution, size=size: distribution.sample_truncated(size, 0.1, 2., 0))
+
+def benchmark_fitters(quick):
+    """fit_sieve_distribution, for a distribution and a fitting approach."""
+    cases = [("Gaussian", "binned"), ("Mixed Weibull", "binned"), ("Mixed Gaussian", "binned"), ("Gaussian", "samples")]
+    if not quick:
+        cases += [("Mixed Gaussian", "samples")]
+    for distribution, approach in cases:
+        yield ({"distribution": distribution, "approach": approach},
+               lambda distribution=distribution, approach=approach: fitters.fit_sieve_distribution(SIEVE_ANALYSIS_DATA, SHOTS_MATERIAL_DENSITY, distribution, approach))
+
+def benchmark_mesh_accuracy(quick):
+    """The mesh quality metrics (aspect ratio and surface error), for an element length (radius 0.5)."""
+    for element_length in ([0.08, 0.04] if quick else [0.08, 0.04, 0.02]):
+        nodes, elements = mesh_of_sphere(0.5, element_length)
+        parameters = {"element_length": element_length, "elements": int(np.shape(elements)[0])}
+        yield (dict(parameters, metric="aspect_ratio"),
+               lambda nodes=nodes, elements=elements, element_length=element_length: mesh_accuracy(0, 0, 0, 0.5, nodes, elements, element_length).aspect_ratio())
+        yield (dict(parameters, metric="maximum_error"),
+               lambda nodes=nodes, elements=elements, element_length=element_length: error_types(0, 0, 0, 0.5, nodes, elements, element_length).maximum_error())
+
+BENCHMARKS = {
+    "generate": benchmark_generate,
+    "sphere_entity": benchmark_sphere_entity,
+    "create_mesh_geometry": benchmark_create_mesh_geometry,
+    "keyword_writers": benchmark_keyword_writers,
+    "covered_area": benchmark_covered_area,
+    "samplers": benchmark_samplers,
+    "fitters": benchmark_fitters,
+    "mesh_accuracy": benchmark_mesh_accuracy,
+}
+
+def case_key(result):
+    return result["benchmark"] + json.dumps(result["parameters"], sort_keys=True)
+
+def run_benchmarks(names = None, quick = False, repeats = 3):
+    """
+    Runs the benchmarks and their scaling sweeps.
+
+    Args:
+    names (list, optional): The names of the benchmarks to run (see BENCHMARKS). Defaults to all of them.
+    quick (bool): If True, the sweeps are smaller.
+    repeats (int): The number of measurements of every case.
+
+    Returns:
+    dict: The environment ('metadata') and the timing of every case ('results').
+    """
+    results = []
+    for name in names or BENCHMARKS:
+        for parameters, function in BENCHMARKS[name](quick):
+            timing = time_call(function, repeats)
+            results.append(dict({"benchmark": name, "parameters": parameters}, **timing))
+            print("%-22s %-75s %10.4f s" %(name, json.dumps(parameters, sort_keys=True), timing["median"]), file=sys.stderr)
+
+    metadata = {"python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(),
+                "processor": platform.processor(), "cpu_count": os.cpu_count(), "quick": quick,
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    return {"metadata": metadata, "results": results}
+
+def compare_with_baseline(report, baseline, tolerance = 0.25):
+    """
+    Compares the results with a baseline. A case is a regression if its median time is larger than
+    the baseline median time by more than the tolerance.
+
+    Args:
+    report (dict): The results of run_benchmarks.
+    baseline (dict): The stored results of a previous run.
+    tolerance (float): The allowed relative slowdown.
+
+    Returns:
+    list: The comparison of every case that exists in both, with its time ratio and a regression flag.
+    """
+    baseline_results = {case_key(result): result for result in baseline["results"]}
+    comparison = []
+    for result in report["results"]:
+        reference = baseline_results.get(case_key(result))
+        if reference is None:
+            continue
+        ratio = result["median"] / reference["median"]
+        comparison.append({"benchmark": result["benchmark"], "parameters": result["parameters"], "median": result["median"],
+                           "baseline_median": reference["median"], "ratio": ratio, "regression": ratio > 1 + tolerance})
+    return comparison
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of the generation, meshing, export, coverage and fitting hot paths.")
+    parser.add_argument("benchmarks", nargs="*", help="the benchmarks to run: %s (default: all)" %", ".join(BENCHMARKS))
+    parser.add_argument("--quick", action="store_true", help="run smaller scaling sweeps")
+    parser.add_argument("--repeats", type=int, default=3, help="number of measurements of every case")
+    parser.add_argument("--output", help="write the results to this JSON file (default: standard output)")
+    parser.add_argument("--baseline", help="compare the results with this JSON file")
+    parser.add_argument("--save-baseline", help="store the results as a baseline JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown against the baseline")
+    arguments = parser.parse_args()
+
+    unknown = [name for name in arguments.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error("unknown benchmarks: " + ", ".join(unknown))
+
+    report = run_benchmarks(arguments.benchmarks, arguments.quick, arguments.repeats)
+
+    failed = False
+    if arguments.baseline:
+        with open(arguments.baseline) as f:
+            baseline = json.load(f)
+        report["comparison"] = compare_with_baseline(report, baseline, arguments.tolerance)
+        for case in report["comparison"]:
+            if case["regression"]:
+                failed = True
+                print("Regression: %s %s %.4f s (baseline %.4f s, x%.2f)" %(case["benchmark"], json.dumps(case["parameters"], sort_keys=True),
+                      case["median"], case["baseline_median"], case["ratio"]), file=sys.stderr)
+
+    if arguments.save_baseline:
+        with open(arguments.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if arguments.output:
+        with open(arguments.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,2 @@
+from .instrumentation import *
+from .progress import *
@@ -0,0 +1,230 @@
+import contextlib
+import functools
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+def max_resident_memory():
+    """Returns the peak resident memory of the process in bytes (None if it is not available, e.g. on Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == "darwin" else max_rss * 1024 # kilobytes on Linux
+
+class RunReport:
+    """A structured report of a run (e.g. a batch of shots), with the duration and the peak memory
+    of every stage, counters and observed values.
+
+    Attributes:
+        name (str) : The name of the run
+        trace_memory (bool) : If True, the peak memory of every stage is traced with tracemalloc. Tracing slows down
+                              the allocation-heavy stages considerably (e.g. the keyword export by more than an order of magnitude)
+        stages (dict) : The calls and total time of every stage, and its peak memory (in bytes, above the memory
+                        at the start of the stage) if trace_memory is True
+        counters (dict) : The counters (e.g. candidate attempts, rejections, bytes written)
+        values (dict) : The count, minimum, maximum and mean of every observed value (e.g. element length)
+        records (dict) : Any other result of the run (e.g. the coverage percentages)
+    """
+    def __init__(self, name = "run", trace_memory = False):
+        self.name = name
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self.counters = {}
+        self.values = {}
+        self.records = {}
+        self.start_time = time.time()
+        self.end_time = None
+        self._memory_stack = [] # [memory at start, peak so far] of the open stages
+        self._started_tracing = False
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Times a stage of the run (and traces its peak memory). Nested stages are timed separately,
+           and their time is included in the time of the outer stage.
+
+        Args:
+            name (str): The name of the stage (e.g. generate, mesh, assemble, export, coverage, fitting)
+        """
+        tracing = self.trace_memory
+        if tracing:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            current, peak = tracemalloc.get_traced_memory()
+            if self._memory_stack:
+                self._memory_stack[-1][1] = max(self._memory_stack[-1][1], peak)
+            tracemalloc.reset_peak()
+            self._memory_stack.append([current, current])
+
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            elapsed = time.perf_counter() - start
+            stage = self.stages.setdefault(name, {"calls": 0, "time": 0.0})
+            stage["calls"] += 1
+            stage["time"] += elapsed
+
+            if tracing:
+                start_memory, peak = self._memory_stack.pop()
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                stage["peak_memory"] = max(stage.get("peak_memory", 0), peak - start_memory)
+                tracemalloc.reset_peak()
+                if self._memory_stack:
+                    self._memory_stack[-1][1] = max(self._memory_stack[-1][1], peak)
+
+    def count(self, name, value = 1):
+        """Increases a counter of the run.
+
+        Args:
+            name (str): The name of the counter
+            value (int): The increment
+        """
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, value):
+        """Adds an observation of a value, keeping only its count, minimum, maximum and sum.
+
+        Args:
+            name (str): The name of the value
+            value (float): The observed value
+        """
+        value = float(value)
+        summary = self.values.get(name)
+        if summary is None:
+            self.values[name] = {"count": 1, "minimum": value, "maximum": value, "sum": value}
+        else:
+            summary["count"] += 1
+            summary["minimum"] = min(summary["minimum"], value)
+            summary["maximum"] = max(summary["maximum"], value)
+            summary["sum"] += value
+
+    def record(self, name, value):
+        """Stores a result of the run in the report.
+
+        Args:
+            name (str): The name of the result
+            value: A JSON serializable value
+        """
+        self.records[name] = value
+
+    def close(self):
+        """Ends the run, and stops the memory tracing if it was started by the report.
+        """
+        if self.end_time is None:
+            self.end_time = time.time()
+        if self._started_tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def to_dict(self):
+        """Returns the report as a dictionary.
+
+        Returns:
+            dict: The report
+        """
+        values = {name: dict(summary, mean=summary["sum"]/summary["count"]) for name, summary in self.values.items()}
+        end_time = self.end_time if self.end_time is not None else time.time()
+        return {"name": self.name,
+                "start": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.start_time)),
+                "duration": end_time - self.start_time,
+                "max_resident_memory": max_resident_memory(),
+                "stages": self.stages,
+                "counters": self.counters,
+                "values": values,
+                "records": self.records}
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2, default=str)
+
+    def write(self, filename):
+        """Writes the report to a JSON file.
+
+        Args:
+            filename (str): The name of the JSON file
+        """
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(filename, "w") as f:
+            f.write(self.to_json())
+
+
+_current_report = None
+
+def current_report():
+    """Returns the active run report (None if no report is active).
+    """
+    return _current_report
+
+@contextlib.contextmanager
+def run_report(name = "run", trace_memory = False, filename = None):
+    """Activates a run report, so that the instrumented functions (generate, sphere_entity, create_mesh_geometry,
+       export_mesh_geometry, covered_area, fit_sieve_distribution etc.) report to it. Without an active report,
+       the instrumentation does nothing.
+
+    Args:
+        name (str): The name of the run
+        trace_memory (bool): If True, the peak memory of every stage is traced with tracemalloc (slower)
+        filename (str, optional): If it is given, the report is written to this JSON file at the end of the run
+
+    Yields:
+        RunReport: The active report
+    """
+    global _current_report
+    previous_report = _current_report
+    report = RunReport(name, trace_memory)
+    _current_report = report
+    try:
+        yield report
+    finally:
+        _current_report = previous_report
+        report.close()
+        if filename is not None:
+            report.write(filename)
+
+def stage(name):
+    """Times a stage in the active run report (see RunReport.stage). Does nothing without an active report.
+    """
+    if _current_report is None:
+        return contextlib.nullcontext()
+    return _current_report.stage(name)
+
+def count(name, value = 1):
+    """Increases a counter of the active run report. Does nothing without an active report.
+    """
+    if _current_report is not None:
+        _current_report.count(name, value)
+
+def observe(name, value):
+    """Adds an observation of a value to the active run report. Does nothing without an active report.
+    """
+    if _current_report is not None:
+        _current_report.observe(name, value)
+
+def record(name, value):
+    """Stores a result of the run in the active run report. Does nothing without an active report.
+    """
+    if _current_report is not None:
+        _current_report.record(name, value)
+
+def staged(name):
+    """Decorator, which times every call of a function as a stage of the active run report.
+
+    Args:
+        name (str): The name of the stage
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _current_report is None:
+                return function(*args, **kwargs)
+            with _current_report.stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,501 @@
+import argparse
+import copy
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+
+from sphere_generator.shot_stream_generator import shot_stream
+from sphere_generator.utilities import problem_dimensions_setter, box_getter, impigment_diameter_calculation
+from FE_mesh.configure_shots_mesh import create_mesh_geometry, export_mesh_geometry
+from FE_mesh.LSDYNA_keyword_manager import apply_initial_velocity, apply_initial_velocity_include
+from FE_mesh.mesh_planning import element_lengths, mesh_plan, print_mesh_plan
+from run_tools.instrumentation import run_report
+from run_tools.progress import ProgressReporter, print_progress, cancel_on_interrupt
+from run_tools.output_cache import OutputCache, output_cache_key, DEFAULT_MAX_SIZE
+
+# the default job, the batches of batch_of_spheres_3D.py
+DEFAULT_JOB_SPEC = {
+    "name": "shots",
+    "output_directory": "generated_spheres",
+    "dimensions": "3D",
+    "box": {"width": 3, "height": 20, "length": 3, "angle": 90},
+    "shots": {
+        "number": 2,
+        # "gaussian": mean_radius and radius_std, "sieve": sieve analysis data (see size_distribution),
+        # "structured": the positions and radii of the spheres
+        "size_model": {"type": "gaussian", "mean_radius": 0.7, "radius_std": 0.0675},
+    },
+    "mesh": {"method": "spherified_cube", "spacing": "nonlinear", "element_length": 0.04,
+             "pid": 1000000, "renumbering_point": 1000000, "output": "LSDYNA",
+             # null meshes the shots in generation order, "morton" or "hilbert" orders them along a space filling curve
+             "ordering": None,
+             # null uses the element length for every shot, {"total_elements": N} or {"elements_through_radius": n}
+             # chooses the element length of each shot (see mesh_planning.element_lengths)
+             "element_budget": None},
+    # null for no initial velocity, otherwise an option of stream_velocity with its arguments
+    "velocity": {"option": "Normal distribution", "args": [75, 5, 65, 75]},
+    # null for no coverage calculation
+    "coverage": {"velocity": 75, "resolution": 0.01},
+    "batches": 10,
+    # null for a random seed, which is stored in the checkpoint, so a resumed job continues with the same seed
+    "seed": None,
+}
+
+SIZE_MODELS = ("gaussian", "sieve", "structured")
+OUTPUT_OPTIONS = ("general", "LSDYNA", "LSDYNA-entities", "LSDYNA-geometry")
+
+def _merge(defaults, values):
+    merged = copy.deepcopy(defaults)
+    for key, value in values.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict) and key != "size_model":
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+def load_job_spec(filename):
+    """Loads a job spec from a JSON or TOML file. The missing entries are taken from DEFAULT_JOB_SPEC.
+
+    Args:
+        filename (str): The JSON (.json) or TOML (.toml) file of the job spec
+
+    Returns:
+        dict: The job spec
+    """
+    return job_spec(read_spec_file(filename))
+
+def job_spec(values):
+    """Creates a job spec from the given entries. The missing entries are taken from DEFAULT_JOB_SPEC.
+
+    Args:
+        values (dict): The entries of the job spec (nested like DEFAULT_JOB_SPEC)
+
+    Returns:
+        dict: The job spec
+    """
+    return validate_job_spec(_merge(DEFAULT_JOB_SPEC, values))
+
+def read_spec_file(filename):
+    """Reads a JSON (.json) or TOML (.toml) spec file.
+
+    Args:
+        filename (str): The spec file
+
+    Returns:
+        dict: The content of the file
+    """
+    if filename.endswith(".toml"):
+        try:
+            import tomllib
+        except ImportError: # python < 3.11
+            import tomli as tomllib
+        with open(filename, "rb") as f:
+            return tomllib.load(f)
+
+    with open(filename) as f:
+        return json.load(f)
+
+def validate_job_spec(spec):
+    """Checks the options of a job spec.
+
+    Args:
+        spec (dict): The job spec
+
+    Raises:
+        ValueError: If an option is not valid
+
+    Returns:
+        dict: The job spec
+    """
+    size_model = spec["shots"]["size_model"]
+    if size_model.get("type") not in SIZE_MODELS:
+        raise ValueError("Please choose a valid size model type: " + ", ".join(SIZE_MODELS) + ".")
+    if spec["mesh"]["output"] == "LSDYNA-velocity-bins":
+        # the velocity bins need one velocity per shot, while the job runner samples one velocity per batch
+        raise ValueError('The "LSDYNA-velocity-bins" output is not supported by the job runner, which applies one velocity per batch. '
+                         'Please choose one of: ' + ", ".join(OUTPUT_OPTIONS) + ".")
+    if spec["mesh"]["output"] not in OUTPUT_OPTIONS:
+        raise ValueError("Please choose a valid output option: " + ", ".join(OUTPUT_OPTIONS) + ".")
+    if spec["mesh"]["ordering"] not in (None, "morton", "hilbert"):
+        raise ValueError('Please choose a valid ordering: null, "morton" or "hilbert".')
+    budget = spec["mesh"]["element_budget"]
+    if budget is not None and (not isinstance(budget, dict) or len(budget) != 1 or not set(budget) <= {"total_elements", "elements_through_radius"}):
+        raise ValueError('The element budget must be null, {"total_elements": N} or {"elements_through_radius": n}.')
+    if spec["velocity"] is not None and spec["mesh"]["output"] not in ("LSDYNA", "LSDYNA-geometry"):
+        raise ValueError("Initial velocity can only be applied to the LSDYNA and LSDYNA-geometry output options.")
+    if spec["dimensions"] != "3D":
+        raise ValueError("Mesh generation is only available for 3D spheres.")
+    if int(spec["batches"]) < 1:
+        raise ValueError("The number of batches must be positive.")
+    return spec
+
+def job_spec_hash(spec):
+    """Calculates the hash of a job spec, to detect a changed job spec when a job is resumed.
+       The number of batches is not hashed, so a completed job can be extended with more batches.
+
+    Args:
+        spec (dict): The job spec
+
+    Returns:
+        str: The hexadecimal hash
+    """
+    hashed_spec = {key: value for key, value in spec.items() if key != "batches"}
+    return hashlib.sha256(json.dumps(hashed_spec, sort_keys=True).encode()).hexdigest()
+
+def batch_seed(entropy, batch_number):
+    """Returns the independent seed sequence of a batch. It only depends on the job seed and the batch number,
+       so every batch is reproducible, regardless of the order (or the run) in which the batches are created.
+
+    Args:
+        entropy (int): The seed of the job
+        batch_number (int): The batch number
+
+    Returns:
+        numpy.random.SeedSequence: The seed sequence of the batch
+    """
+    return np.random.SeedSequence(entropy, spawn_key=(batch_number,))
+
+def velocity_generator(seed_sequence):
+    """Creates the random generator of the initial velocity of a batch. It is a separate stream of the batch seed,
+       so the velocity does not depend on the random numbers drawn by the generation of the shots.
+
+    Args:
+        seed_sequence (numpy.random.SeedSequence): The seed sequence of the batch
+
+    Returns:
+        numpy.random.Generator: The random generator of the velocity
+    """
+    return np.random.default_rng(np.random.SeedSequence(seed_sequence.entropy, spawn_key=tuple(seed_sequence.spawn_key) + (1,)))
+
+def size_distribution(size_model):
+    """Creates the diameter distribution of a sieve size model. The model contains the sieve analysis data
+       ("sieve_levels", "retained_weight" and "density") and the "distribution": "Gaussian", "Mixed Weibull",
+       "Mixed Gaussian" (fitted and cached, see fit_cache.cached_fit_sieve_distribution, with an optional
+       "fitting_approach") or "Empirical" (see statistical_tools.empirical_sieve_distribution).
+
+    Args:
+        size_model (dict): The size model of the job spec
+
+    Returns:
+        distributions.Distribution: The diameter distribution
+    """
+    sieve_analysis_data = [size_model["sieve_levels"], size_model["retained_weight"]]
+    if size_model.get("distribution", "Mixed Gaussian") == "Empirical":
+        import sieve_analysis_tools.statistical_tools as st
+        return st.empirical_sieve_distribution(sieve_analysis_data, size_model["density"])
+
+    from sieve_analysis_tools import fit_cache
+    return fit_cache.cached_fit_sieve_distribution(sieve_analysis_data, size_model["density"], size_model.get("distribution", "Mixed Gaussian"),
+                                                   size_model.get("fitting_approach", "samples"))
+
+def create_stream(spec, seed_sequence, distribution = None):
+    """Creates the shot stream of a batch.
+
+    Args:
+        spec (dict): The job spec
+        seed_sequence (numpy.random.SeedSequence): The seed sequence of the batch
+        distribution (distributions.Distribution, optional): The diameter distribution of a sieve size model
+
+    Returns:
+        shot_stream: The shot stream
+    """
+    box_spec = spec["box"]
+    problem_dimensions = problem_dimensions_setter(spec["dimensions"])
+    box = box_getter(problem_dimensions, box_spec["width"], box_spec["height"], box_spec["length"])
+    size_model = spec["shots"]["size_model"]
+
+    if size_model["type"] == "sieve":
+        return shot_stream(spec["shots"]["number"], problem_dimensions, box, box_spec["angle"],
+                           diameter_distribution_setter=distribution,
+                           diameter_bounds_setter=tuple(size_model.get("bounds", (0.0, None))),
+                           random_generator_setter=np.random.default_rng(seed_sequence),
+                           diameter_sampling_setter=size_model.get("sampling", "random"),
+                           diameter_classes_setter=sorted(size_model["sieve_levels"]))
+
+    return shot_stream(spec["shots"]["number"], problem_dimensions, box, box_spec["angle"],
+                       mean_radius_setter=size_model.get("mean_radius", 0.0),
+                       radius_standard_deviation_setter=size_model.get("radius_std", 0.0),
+                       random_generator_setter=np.random.default_rng(seed_sequence))
+
+def batch_spheres(spec, seed_sequence, distribution = None, progress = None):
+    """Creates the spheres of a batch, and the element length of each sphere.
+
+    Args:
+        spec (dict): The job spec
+        seed_sequence (numpy.random.SeedSequence): The seed sequence of the batch
+        distribution (distributions.Distribution, optional): The diameter distribution of a sieve size model
+        progress (ProgressReporter, optional): The progress reporter of the job
+
+    Returns:
+        shot_stream: The shot stream (None for a structured size model)
+        list: The spheres
+        float or list: The element length, or the element length of each sphere for an element budget
+    """
+    size_model = spec["shots"]["size_model"]
+    if size_model["type"] == "structured":
+        stream = None
+        spheres = shot_stream.structured_spheres(size_model["positions"], size_model["radii"])
+    else:
+        stream = create_stream(spec, seed_sequence, distribution)
+        spheres = stream.generate(progress)
+
+    mesh = spec["mesh"]
+    element_length = mesh["element_length"]
+    if mesh["element_budget"] is not None:
+        element_length = element_lengths(mesh["method"], mesh["spacing"], [s.r for s in spheres], **mesh["element_budget"])
+    return stream, spheres, element_length
+
+def save_shots(filename, spheres):
+    np.savetxt(filename, np.array([[s.x, s.y, s.z, s.r] for s in spheres]).reshape(-1, 4), delimiter=",", header="x,y,z,r", comments="")
+
+def load_shots(filename):
+    return np.loadtxt(filename, delimiter=",", skiprows=1, ndmin=2)
+
+def batch_cache_key(spec, batch_number, seed_sequence):
+    """Calculates the output cache key of a batch, from the job spec (without the output directory and the number of batches),
+       the batch number and its seed.
+
+    Args:
+        spec (dict): The job spec
+        batch_number (int): The batch number
+        seed_sequence (numpy.random.SeedSequence): The seed sequence of the batch
+
+    Returns:
+        str: The hexadecimal key of the batch
+    """
+    parameters = {key: value for key, value in spec.items() if key not in ("output_directory", "batches", "seed")}
+    parameters["batch"] = batch_number
+    parameters["seed"] = {"entropy": seed_sequence.entropy, "spawn_key": list(seed_sequence.spawn_key)}
+    return output_cache_key(parameters)
+
+def remove_batch_outputs(output_directory, filename):
+    # the outputs are removed before they are written again, since they may be hardlinks to the output cache
+    for suffix in (".k", ".txt", "_geometry.k", "_shots.csv", "_report.json"):
+        if os.path.lexists(os.path.join(output_directory, filename + suffix)):
+            os.remove(os.path.join(output_directory, filename + suffix))
+
+def run_batch(spec, batch_number, seed_sequence, output_directory, distribution = None, previous_shots_files = (), progress = None, cache = None):
+    """Creates, meshes and exports a batch of shots, and writes its shots file and its run report.
+       With an output cache, a batch that was already created (same job spec, batch number and seed) is restored from the cache.
+
+    Args:
+        spec (dict): The job spec
+        batch_number (int): The batch number (starting from 1)
+        seed_sequence (numpy.random.SeedSequence): The seed sequence of the batch
+        output_directory (str): The absolute output directory
+        distribution (distributions.Distribution, optional): The diameter distribution of a sieve size model
+        previous_shots_files (list): The shots files of the previous batches, for the cumulative coverage
+        progress (ProgressReporter, optional): The progress reporter of the job
+        cache (OutputCache, optional): The output cache
+
+    Returns:
+        dict: The result of the batch (files, number of shots and elements, velocity and coverage),
+        or None if the job was cancelled before the batch was completed
+    """
+    mesh = spec["mesh"]
+    filename = "%s_%d" %(spec["name"], batch_number)
+    report_filename = os.path.join(output_directory, filename + "_report.json")
+    if cache is not None:
+        key = batch_cache_key(spec, batch_number, seed_sequence)
+        result = cache.get(key, output_directory)
+        if result is not None:
+            return result
+
+    remove_batch_outputs(output_directory, filename)
+
+    with run_report(filename, filename=report_filename) as report:
+        stream, spheres, element_length = batch_spheres(spec, seed_sequence, distribution, progress)
+        if progress is not None and progress.cancelled:
+            return None
+        if mesh["element_budget"] is not None: # the plan of the budget is printed before the batch is meshed
+            print_mesh_plan(mesh_plan(mesh["method"], mesh["spacing"], spheres, element_length, mesh["renumbering_point"]), "Batch %d" %batch_number)
+
+        (nodes, elements) = create_mesh_geometry(mesh["method"], mesh["spacing"], spheres, element_length, output_directory,
+                                                 pid=mesh["pid"], renumbering_point=mesh["renumbering_point"], progress=progress,
+                                                 ordering=mesh["ordering"])
+        if progress is not None and progress.cancelled:
+            return None
+
+        files = []
+        velocity = None
+        velocity_spec = spec["velocity"]
+        if mesh["output"] == "LSDYNA-geometry":
+            geometry_filename = filename + "_geometry"
+            export_mesh_geometry(nodes, elements, os.path.join(output_directory, geometry_filename), mesh["output"], pid=[mesh["pid"]], progress=progress)
+            files.append(geometry_filename + ".k")
+            if velocity_spec is not None:
+                velocity = apply_initial_velocity_include(os.path.join(output_directory, filename), os.path.join(output_directory, geometry_filename),
+                                                          velocity_spec["option"], *velocity_spec["args"], angle=spec["box"]["angle"], dyna_id=mesh["pid"],
+                                                          rng=velocity_generator(seed_sequence))
+                files.append(filename + ".k")
+        else:
+            export_mesh_geometry(nodes, elements, os.path.join(output_directory, filename), mesh["output"], pid=mesh["pid"], progress=progress)
+            files.append(filename + (".txt" if mesh["output"] == "general" else ".k"))
+            if velocity_spec is not None:
+                velocity = apply_initial_velocity(os.path.join(output_directory, filename), velocity_spec["option"], *velocity_spec["args"],
+                                                  angle=spec["box"]["angle"], dyna_id=mesh["pid"], rng=velocity_generator(seed_sequence))
+
+        shots_file = filename + "_shots.csv"
+        save_shots(os.path.join(output_directory, shots_file), spheres)
+
+        coverage = None
+        if spec["coverage"] is not None and stream is not None:
+            shots = np.vstack([load_shots(os.path.join(output_directory, f)) for f in previous_shots_files] + [load_shots(os.path.join(output_directory, shots_file))])
+            dents = [impigment_diameter_calculation(r, spec["coverage"]["velocity"])/2 for r in shots[:, 3]]
+            coverage = stream.calculate_coverage(shots[:, [0, 2]], dents, spec["coverage"]["resolution"])
+
+        report.record("batch", batch_number)
+
+    timings = report.to_dict()
+    result = {"files": files, "shots_file": shots_file, "report": os.path.basename(report_filename), "shots": len(spheres),
+            "elements": int(np.shape(elements)[0]), "velocity": velocity, "coverage": coverage,
+            "timings": {"duration": timings["duration"], **{name: stage["time"] for name, stage in timings["stages"].items()}},
+            "seed": {"entropy": seed_sequence.entropy, "spawn_key": list(seed_sequence.spawn_key)}}
+    if cache is not None:
+        cache.put(key, [os.path.join(output_directory, f) for f in files + [shots_file, result["report"]]],
+                  {"nodes": nodes, "elements": elements}, result)
+    return result
+
+def checkpoint_filename(spec, output_directory):
+    return os.path.join(output_directory, spec["name"] + "_checkpoint.json")
+
+def load_checkpoint(spec, output_directory, restart = False):
+    """Loads the checkpoint of a job, or creates a new one.
+
+    Args:
+        spec (dict): The job spec
+        output_directory (str): The absolute output directory
+        restart (bool): If True, the existing checkpoint is ignored and all the batches are created again
+
+    Raises:
+        ValueError: If the checkpoint belongs to a different job spec
+
+    Returns:
+        dict: The checkpoint (hash of the job spec, seed and completed batches)
+    """
+    filename = checkpoint_filename(spec, output_directory)
+    if not restart and os.path.exists(filename):
+        with open(filename) as f:
+            checkpoint = json.load(f)
+        if checkpoint["spec_hash"] != job_spec_hash(spec):
+            raise ValueError("The job spec has changed since the checkpoint %s was written. Run with restart to create all the batches again." %filename)
+        return checkpoint
+
+    entropy = spec["seed"] if spec["seed"] is not None else np.random.SeedSequence().entropy
+    return {"spec_hash": job_spec_hash(spec), "seed": entropy, "batches": {}}
+
+def save_checkpoint(checkpoint, spec, output_directory):
+    """Writes the checkpoint atomically, so an interruption never leaves a partial checkpoint.
+    """
+    filename = checkpoint_filename(spec, output_directory)
+    temporary_filename = "%s.%d.tmp" %(filename, os.getpid())
+    with open(temporary_filename, "w") as f:
+        json.dump(checkpoint, f, indent=2, default=float)
+    os.replace(temporary_filename, filename)
+
+def run_job(spec, restart = False, progress = None, cache = None):
+    """Runs a job: creates the missing batches of the job spec, and checkpoints every completed batch with its seed.
+       An interrupted (or cancelled) job is resumed by running it again; only the missing batches are created,
+       with the same seeds they would have had in an uninterrupted run.
+
+    Args:
+        spec (dict): The job spec (see load_job_spec)
+        restart (bool): If True, all the batches are created again
+        progress (ProgressReporter, optional): The progress reporter of the job
+        cache (OutputCache, optional): The output cache of the batches
+
+    Returns:
+        dict: The checkpoint, with the results of the completed batches
+    """
+    spec = validate_job_spec(spec)
+    output_directory = os.path.abspath(spec["output_directory"])
+    os.makedirs(output_directory, exist_ok=True)
+    checkpoint = load_checkpoint(spec, output_directory, restart)
+
+    size_model = spec["shots"]["size_model"]
+    distribution = size_distribution(size_model) if size_model["type"] == "sieve" else None
+
+    current_directory = os.getcwd() # create_mesh_geometry changes the working directory
+    try:
+        for batch_number in range(1, int(spec["batches"]) + 1):
+            if str(batch_number) in checkpoint["batches"]:
+                continue
+            if progress is not None and progress.cancelled:
+                break
+
+            previous_shots_files = [checkpoint["batches"][str(n)]["shots_file"] for n in range(1, batch_number) if str(n) in checkpoint["batches"]]
+            result = run_batch(spec, batch_number, batch_seed(checkpoint["seed"], batch_number), output_directory, distribution, previous_shots_files, progress, cache)
+            if result is None:
+                break
+
+            checkpoint["batches"][str(batch_number)] = result
+            save_checkpoint(checkpoint, spec, output_directory)
+            if progress is not None:
+                progress.update("batches", force=True, completed_batches=len(checkpoint["batches"]), batches=int(spec["batches"]))
+    finally:
+        os.chdir(current_directory)
+
+    return checkpoint
+
+def plan_job(spec, checkpoint = None):
+    """Prints the dry-run mesh plan (predicted nodes, elements and output file size) of the missing batches of a job,
+       without meshing or writing anything. Only the shots are generated, with the seeds of the batches, so the plan
+       is exact for a job with a seed (or a checkpoint); without a seed, the plan is for a random seed.
+
+    Args:
+        spec (dict): The job spec (see load_job_spec)
+        checkpoint (dict, optional): The checkpoint of the job (see load_checkpoint). By default, the existing checkpoint is loaded.
+
+    Returns:
+        dict: The mesh plan of every missing batch, keyed by the batch number
+    """
+    spec = validate_job_spec(spec)
+    mesh = spec["mesh"]
+    if checkpoint is None:
+        checkpoint = load_checkpoint(spec, os.path.abspath(spec["output_directory"]))
+    size_model = spec["shots"]["size_model"]
+    distribution = size_distribution(size_model) if size_model["type"] == "sieve" else None
+
+    plans = {}
+    for batch_number in range(1, int(spec["batches"]) + 1):
+        if str(batch_number) in checkpoint["batches"]:
+            continue
+        _, spheres, element_length = batch_spheres(spec, batch_seed(checkpoint["seed"], batch_number), distribution)
+        plans[batch_number] = mesh_plan(mesh["method"], mesh["spacing"], spheres, element_length, mesh["renumbering_point"])
+        print_mesh_plan(plans[batch_number], "Batch %d" %batch_number)
+
+    print("Total of %d batches: %d nodes, %d elements, %.1f MB" %(len(plans), sum(plan["nodes"] for plan in plans.values()),
+          sum(plan["elements"] for plan in plans.values()), sum(plan["file_size"] for plan in plans.values())/1024**2))
+    return plans
+
+def main():
+    parser = argparse.ArgumentParser(description="Creates the batches of a JSON or TOML job spec, resuming an interrupted job.")
+    parser.add_argument("spec", help="the job spec file (.json or .toml)")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and create all the batches again")
+    parser.add_argument("--quiet", action="store_true", help="do not report the progress")
+    parser.add_argument("--dry-run", action="store_true", help="only print the predicted nodes, elements and file size of the missing batches, and exit")
+    parser.add_argument("--cache", nargs="?", const="", default=None, metavar="DIRECTORY",
+                        help="restore the already created batches from the output cache (by default in the SFERE_OUTPUT_CACHE directory)")
+    parser.add_argument("--cache-size", type=float, default=DEFAULT_MAX_SIZE / 1024**3, help="the maximum size of the output cache in GB")
+    arguments = parser.parse_args()
+    cache = None if arguments.cache is None else OutputCache(arguments.cache or None, int(arguments.cache_size * 1024**3))
+
+    spec = load_job_spec(arguments.spec)
+    if arguments.dry_run:
+        spec = validate_job_spec(spec)
+        plan_job(spec, load_checkpoint(spec, os.path.abspath(spec["output_directory"]), arguments.restart))
+        return
+
+    progress = ProgressReporter(None if arguments.quiet else print_progress, interval=1.0)
+    cancel_on_interrupt(progress)
+
+    checkpoint = run_job(spec, arguments.restart, progress, cache)
+    completed = len(checkpoint["batches"])
+    print("%d of %d batches completed in %s" %(completed, int(spec["batches"]), os.path.abspath(spec["output_directory"])))
+    sys.exit(0 if completed == int(spec["batches"]) else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+import stat
+from importlib import metadata
+
+import numpy as np
+
+import run_tools.instrumentation as instrumentation
+
+# increase this number if the stored outputs are not compatible anymore
+OUTPUT_CACHE_VERSION = 1
+
+DEFAULT_CACHE_DIRECTORY = os.environ.get("SFERE_OUTPUT_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "sFEre", "outputs"))
+DEFAULT_MAX_SIZE = 2 * 1024**3 # in bytes
+
+PACKAGES = ("sphere_generator", "FE_mesh", "sieve_analysis_tools", "run_tools")
+
+def package_version():
+    """Returns the version of the code that the outputs depend on: the numpy version and the hash of the source code of the packages.
+
+    Returns:
+        dict: The numpy version and the hexadecimal hash of the sources
+    """
+    digest = hashlib.sha256()
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for package in PACKAGES:
+        for filename in sorted(glob.glob(os.path.join(root, package, "*.py"))):
+            with open(filename, "rb") as f:
+                digest.update(f.read())
+    return {"numpy": metadata.version("numpy"), "sources": digest.hexdigest()}
+
+def output_cache_key(parameters):
+    """Calculates the key of an output, as the canonical hash of all its generation, mesh and export parameters
+       (including the seed) and of the package version.
+
+    Args:
+        parameters (dict): The parameters of the output (JSON serializable)
+
+    Returns:
+        str: The hexadecimal key of the output
+    """
+    content = {"parameters": parameters, "version": package_version(), "cache_version": OUTPUT_CACHE_VERSION}
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+def _link_or_copy(source, destination):
+    if os.path.lexists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError: # e.g. a different file system
+        shutil.copy2(source, destination)
+
+def _directory_size(directory):
+    return sum(os.path.getsize(os.path.join(directory, filename)) for filename in os.listdir(directory))
+
+
+class OutputCache:
+    """A content-addressed cache of complete outputs (files, arrays and metadata), stored in one directory per key.
+       The cached files are read only, and they are restored by hardlink (or copy), so a cache hit costs no disk space.
+       When the cache exceeds its maximum size, the least recently used outputs are evicted.
+    """
+    def __init__(self, directory = None, max_size = DEFAULT_MAX_SIZE):
+        """
+        Args:
+            directory (str, optional): The cache directory. Defaults to DEFAULT_CACHE_DIRECTORY (set by the SFERE_OUTPUT_CACHE environment variable)
+            max_size (int): The maximum size of the cache in bytes
+        """
+        self.directory = os.path.abspath(directory or DEFAULT_CACHE_DIRECTORY)
+        self.max_size = max_size
+
+    def _entry(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key, destination_directory):
+        """Restores the files of a cached output into a directory.
+
+        Args:
+            key (str): The key of the output (see output_cache_key)
+            destination_directory (str): The directory of the restored files
+
+        Returns:
+            dict: The metadata of the output, or None if it is not cached
+        """
+        entry = self._entry(key)
+        metadata_filename = os.path.join(entry, "metadata.json")
+        try:
+            with open(metadata_filename) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            instrumentation.count("output cache misses")
+            return None
+
+        os.makedirs(destination_directory, exist_ok=True)
+        for filename in stored["files"]:
+            _link_or_copy(os.path.join(entry, filename), os.path.join(destination_directory, filename))
+        os.utime(metadata_filename) # the modification time of the metadata is the last use of the output
+        instrumentation.count("output cache hits")
+        return stored["metadata"]
+
+    def load_arrays(self, key):
+        """Loads the arrays of a cached output.
+
+        Args:
+            key (str): The key of the output
+
+        Returns:
+            dict: The arrays of the output, or None if it is not cached
+        """
+        try:
+            with np.load(os.path.join(self._entry(key), "arrays.npz")) as arrays:
+                return {name: arrays[name] for name in arrays.files}
+        except OSError:
+            return None
+
+    def put(self, key, files, arrays = None, metadata = None):
+        """Stores an output. The files are copied, so the cached output is not changed with the original files.
+
+        Args:
+            key (str): The key of the output (see output_cache_key)
+            files (list): The paths of the output files (stored with their basename)
+            arrays (dict, optional): The arrays of the output (e.g. nodes and elements)
+            metadata (dict, optional): The JSON serializable metadata of the output
+        """
+        entry = self._entry(key)
+        if os.path.exists(entry):
+            return
+
+        temporary_entry = "%s.%d.tmp" %(entry, os.getpid())
+        os.makedirs(temporary_entry, exist_ok=True)
+        for path in files:
+            shutil.copyfile(path, os.path.join(temporary_entry, os.path.basename(path)))
+        if arrays:
+            np.savez(os.path.join(temporary_entry, "arrays.npz"), **arrays)
+        with open(os.path.join(temporary_entry, "metadata.json"), "w") as f:
+            json.dump({"files": [os.path.basename(path) for path in files], "metadata": metadata}, f, default=float)
+        for filename in os.listdir(temporary_entry):
+            if filename != "metadata.json":
+                os.chmod(os.path.join(temporary_entry, filename), stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+
+        try:
+            os.rename(temporary_entry, entry) # atomic, so concurrent runs never read a partial output
+        except OSError: # stored by a concurrent run
+            shutil.rmtree(temporary_entry, ignore_errors=True)
+        self.evict()
+
+    def entries(self):
+        """Returns the cached outputs, from the least to the most recently used.
+
+        Returns:
+            list: The (key, last use time, size in bytes) of every output
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for key in os.listdir(self.directory):
+            entry = self._entry(key)
+            metadata_filename = os.path.join(entry, "metadata.json")
+            if key.endswith(".tmp") or not os.path.exists(metadata_filename):
+                continue
+            entries.append((key, os.path.getmtime(metadata_filename), _directory_size(entry)))
+        return sorted(entries, key=lambda entry: entry[1])
+
+    def evict(self):
+        """Removes the least recently used outputs, until the cache fits in its maximum size.
+
+        Returns:
+            int: The number of removed outputs
+        """
+        entries = self.entries()
+        size = sum(entry[2] for entry in entries)
+        removed = 0
+        for key, _, entry_size in entries:
+            if size <= self.max_size:
+                break
+            shutil.rmtree(self._entry(key), ignore_errors=True)
+            size -= entry_size
+            removed += 1
+        instrumentation.count("output cache evictions", removed)
+        return removed
+
+    def clear(self):
+        """Removes all the cached outputs.
+        """
+        for key, _, _ in self.entries():
+            shutil.rmtree(self._entry(key), ignore_errors=True)
@@ -0,0 +1,100 @@
+import signal
+import sys
+import threading
+import time
+
+class ProgressReporter:
+    """Reports the progress of a long run (e.g. generate, create_mesh_geometry or a batch loop) to a callback,
+    at a throttled interval, and carries a cooperative cancellation request. The instrumented loops check the
+    request between their steps, so a cancelled run stops at a consistent point (e.g. after the last complete
+    shot or batch) and returns its partial results.
+
+    Attributes:
+        callback (callable) : Called with a dictionary of the progress (stage, elapsed time and the values of the stage,
+                              e.g. accepted shots, acceptance rate, elements meshed, bytes written). If it returns True,
+                              the run is cancelled
+        interval (float) : The minimum time between two reports in seconds
+    """
+    def __init__(self, callback = None, interval = 0.5):
+        self.callback = callback
+        self.interval = interval
+        self.start_time = time.monotonic()
+        self._last_report = -float("inf")
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        """Requests the cancellation of the run. It is safe to call from another thread (or a signal handler).
+        """
+        self._cancel_event.set()
+
+    def update(self, stage, force = False, **values):
+        """Reports the progress of a stage, if the interval has passed since the last report.
+
+        Args:
+            stage (str): The name of the stage (e.g. generate, mesh, export, batches)
+            force (bool): If True, the progress is reported regardless of the interval (e.g. at the end of a stage)
+            values: The progress values of the stage
+
+        Returns:
+            bool: True if the run is cancelled
+        """
+        now = time.monotonic()
+        if force or now - self._last_report >= self.interval:
+            self._last_report = now
+            if self.callback is not None and self.callback(dict(stage=stage, elapsed=now - self.start_time, **values)):
+                self.cancel()
+        return self._cancel_event.is_set()
+
+
+def print_progress(progress):
+    """A progress callback, which prints the progress in a single line of the standard error.
+
+    Args:
+        progress (dict): The progress, as reported by ProgressReporter
+    """
+    values = ", ".join("%s: %s" %(key.replace("_", " "), "%.3g" %value if isinstance(value, float) else value)
+                       for key, value in progress.items() if key not in ("stage", "elapsed"))
+    print("[%8.1f s] %s - %s" %(progress["elapsed"], progress["stage"], values), file=sys.stderr)
+
+
+def batch_range(number_of_batches, progress = None, start = 0):
+    """Iterates over the batch numbers of a batch loop, reporting the completed batches. If the run is
+       cancelled, the iteration stops before the next batch, so every started batch is completed.
+
+    Args:
+        number_of_batches (int): The total number of batches
+        progress (ProgressReporter, optional): The progress reporter of the run
+        start (int): The first batch number (e.g. to resume a run)
+
+    Yields:
+        int: The batch number
+    """
+    for batch_number in range(start, number_of_batches):
+        if progress is not None and progress.cancelled:
+            return
+        yield batch_number
+        if progress is not None:
+            progress.update("batches", force=True, completed_batches=batch_number + 1, batches=number_of_batches)
+
+
+def cancel_on_interrupt(progress):
+    """Turns the first Ctrl+C (SIGINT) into a cooperative cancellation request of the run, so that the run stops at a
+       consistent point. A second Ctrl+C interrupts the run immediately. It can only be called from the main thread.
+
+    Args:
+        progress (ProgressReporter): The progress reporter of the run
+
+    Returns:
+        The previous SIGINT handler, which can be restored with signal.signal(signal.SIGINT, previous_handler)
+    """
+    def handler(signum, frame):
+        if progress.cancelled:
+            raise KeyboardInterrupt
+        print("Cancellation requested, the run stops after the current step (press Ctrl+C again to interrupt).", file=sys.stderr)
+        progress.cancel()
+
+    return signal.signal(signal.SIGINT, handler)
@@ -0,0 +1,296 @@
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from sphere_generator.shot_stream_generator import shot_stream
+from FE_mesh.configure_shots_mesh import create_mesh_geometry, export_mesh_geometry
+from FE_mesh import configure_sphere_entity
+from FE_mesh.mesh_planning import element_lengths
+from run_tools.job_runner import job_spec, batch_seed, create_stream, size_distribution, run_batch
+from run_tools.output_cache import OutputCache, DEFAULT_MAX_SIZE
+
+DEFAULT_ADDRESS = ("127.0.0.1", 8765)
+
+# the fitted distributions of the size models, kept in memory by the service (and by each of its worker processes)
+_distributions = {}
+
+def _distribution(size_model):
+    if size_model["type"] != "sieve":
+        return None
+    key = json.dumps(size_model, sort_keys=True)
+    if key not in _distributions:
+        _distributions[key] = size_distribution(size_model)
+    return _distributions[key]
+
+def _entropy(spec):
+    return spec["seed"] if spec["seed"] is not None else np.random.SeedSequence().entropy
+
+def generate_shots(values, batch_number = 1):
+    """Generates the shots of a batch.
+
+    Args:
+        values (dict): The entries of the job spec (see job_runner.job_spec)
+        batch_number (int): The batch number, which selects the seed of the batch
+
+    Returns:
+        dict: The shots (x, y, z, r of each shot) and the seed of the job
+    """
+    spec = job_spec(values)
+    entropy = _entropy(spec)
+    seed_sequence = batch_seed(entropy, batch_number)
+    size_model = spec["shots"]["size_model"]
+    if size_model["type"] == "structured":
+        spheres = shot_stream.structured_spheres(size_model["positions"], size_model["radii"])
+    else:
+        spheres = create_stream(spec, seed_sequence, _distribution(size_model)).generate()
+    return {"shots": [[s.x, s.y, s.z, s.r] for s in spheres], "seed": entropy}
+
+def export_shots(values, shots, filename):
+    """Meshes the given shots and exports them in the output directory of the job spec.
+
+    Args:
+        values (dict): The entries of the job spec (see job_runner.job_spec)
+        shots (list): The x, y, z, r of each shot
+        filename (str): The name of the output file (without extension)
+
+    Returns:
+        dict: The output file and the number of elements
+    """
+    spec = job_spec(values)
+    mesh = spec["mesh"]
+    output_directory = os.path.abspath(spec["output_directory"])
+    spheres = shot_stream.structured_spheres([shot[:3] for shot in shots], [shot[3] for shot in shots])
+    element_length = mesh["element_length"]
+    if mesh["element_budget"] is not None:
+        element_length = element_lengths(mesh["method"], mesh["spacing"], [s.r for s in spheres], **mesh["element_budget"])
+
+    current_directory = os.getcwd() # create_mesh_geometry changes the working directory
+    try:
+        (nodes, elements) = create_mesh_geometry(mesh["method"], mesh["spacing"], spheres, element_length, output_directory,
+                                                 pid=mesh["pid"], renumbering_point=mesh["renumbering_point"], ordering=mesh["ordering"])
+        export_mesh_geometry(nodes, elements, os.path.join(output_directory, filename), mesh["output"], pid=mesh["pid"])
+    finally:
+        os.chdir(current_directory)
+    return {"file": os.path.join(output_directory, filename + (".txt" if mesh["output"] == "general" else ".k")), "elements": int(np.shape(elements)[0])}
+
+def create_batch(values, batch_number = 1, previous_shots_files = (), cache = None):
+    """Creates a complete batch (generation, mesh, export, velocity and coverage), like job_runner.run_batch.
+
+    Args:
+        values (dict): The entries of the job spec (see job_runner.job_spec)
+        batch_number (int): The batch number, which selects the seed of the batch
+        previous_shots_files (list): The shots files of the previous batches, for the cumulative coverage
+        cache (OutputCache, optional): The output cache
+
+    Returns:
+        dict: The result of the batch
+    """
+    spec = job_spec(values)
+    output_directory = os.path.abspath(spec["output_directory"])
+    os.makedirs(output_directory, exist_ok=True)
+    seed_sequence = batch_seed(_entropy(spec), batch_number)
+
+    current_directory = os.getcwd()
+    try:
+        return run_batch(spec, batch_number, seed_sequence, output_directory, _distribution(spec["shots"]["size_model"]),
+                         previous_shots_files, cache=cache)
+    finally:
+        os.chdir(current_directory)
+
+def _warm_up(_):
+    return os.getpid()
+
+
+class GenerationService:
+    """The state of the generation service: the warm worker pool (or a lock, when the requests are served
+       in the service process), the output cache and the statistics of the served requests.
+    """
+    def __init__(self, workers = 0, cache = None):
+        """
+        Args:
+            workers (int): The number of worker processes. With 0, the requests are served one at a time in the service process.
+            cache (OutputCache, optional): The output cache of the batches
+        """
+        self.workers = workers
+        self.cache = cache
+        self.lock = threading.Lock() # the mesh functions change the working directory of the process
+        # the exports write fixed name temporary files (nodes.txt, elements.txt, ...) in their output directory,
+        # so the worker processes export in the same directory one at a time
+        self.directory_locks = {}
+        self.state_lock = threading.Lock()
+        self.executor = None
+        if workers > 0:
+            self.executor = ProcessPoolExecutor(max_workers=workers)
+            # start the workers, so the first requests do not pay the imports
+            list(self.executor.map(_warm_up, range(workers)))
+        self.start_time = time.monotonic()
+        self.requests = 0
+
+    def directory_lock(self, values):
+        directory = os.path.abspath(job_spec(values)["output_directory"])
+        with self.state_lock:
+            return self.directory_locks.setdefault(directory, threading.Lock())
+
+    def call(self, function, *args, directory_lock = None):
+        with self.state_lock:
+            self.requests += 1
+        if self.executor is not None:
+            if directory_lock is None:
+                return self.executor.submit(function, *args).result()
+            with directory_lock:
+                return self.executor.submit(function, *args).result()
+        with self.lock:
+            return function(*args)
+
+    def status(self):
+        with self.state_lock:
+            requests = self.requests
+        status = {"uptime": time.monotonic() - self.start_time, "requests": requests, "workers": self.workers}
+        if self.executor is None: # the worker processes keep their own distributions and templates
+            status.update(distributions=len(_distributions), templates=len(configure_sphere_entity._template_cache))
+        return status
+
+    def handle(self, endpoint, payload):
+        """Serves a request.
+
+        Args:
+            endpoint (str): /generate, /export, /batch or /status
+            payload (dict): The JSON body of the request
+
+        Raises:
+            ValueError: If the endpoint is not valid
+
+        Returns:
+            dict: The JSON response
+        """
+        if endpoint == "/generate":
+            return self.call(generate_shots, payload.get("job", {}), payload.get("batch", 1))
+        elif endpoint == "/export":
+            return self.call(export_shots, payload.get("job", {}), payload["shots"], payload["filename"],
+                             directory_lock=self.directory_lock(payload.get("job", {})))
+        elif endpoint == "/batch":
+            return self.call(create_batch, payload.get("job", {}), payload.get("batch", 1), payload.get("previous_shots_files", []), self.cache,
+                             directory_lock=self.directory_lock(payload.get("job", {})))
+        elif endpoint == "/status":
+            return self.status()
+        else:
+            raise ValueError("Please choose a valid endpoint: /generate, /export, /batch, /status or /shutdown.")
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+
+
+def _handler(service):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def _respond(self, status, response):
+            body = json.dumps(response, default=float).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _serve(self, payload):
+            if self.path == "/shutdown":
+                self._respond(200, {"shutdown": True})
+                threading.Thread(target=self.server.shutdown).start()
+                return
+            start = time.perf_counter()
+            try:
+                response = service.handle(self.path, payload)
+            except (ValueError, KeyError, TypeError) as error:
+                self._respond(400, {"error": "%s: %s" %(type(error).__name__, error)})
+                return
+            except Exception as error: # e.g. an OSError, or the error of a worker process
+                self._respond(500, {"error": "%s: %s" %(type(error).__name__, error)})
+                return
+            response["elapsed"] = time.perf_counter() - start
+            self._respond(200, response)
+
+        def do_GET(self):
+            self._serve({})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError as error:
+                self._respond(400, {"error": "Invalid JSON: %s" %error})
+                return
+            self._serve(payload)
+
+        def log_message(self, format, *args):
+            pass # the requests are not logged
+
+    return Handler
+
+def serve(address = DEFAULT_ADDRESS, workers = 0, cache = None):
+    """Runs the generation service on localhost, until a /shutdown request (or Ctrl+C).
+       The service keeps the packages imported, the fitted distributions and the mesh templates in memory,
+       and the worker processes (if any) running, so a request costs only the generation, mesh and export work.
+
+    Args:
+        address (tuple): The host and the port of the service
+        workers (int): The number of worker processes. With 0, the requests are served one at a time in the service process.
+        cache (OutputCache, optional): The output cache of the batches
+    """
+    service = GenerationService(workers, cache)
+    server = ThreadingHTTPServer(address, _handler(service))
+    print("Generation service listening on http://%s:%d" %server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+def request(endpoint, payload = None, address = DEFAULT_ADDRESS, timeout = None):
+    """Sends a request to the generation service.
+
+    Args:
+        endpoint (str): /generate, /export, /batch, /status or /shutdown
+        payload (dict, optional): The JSON body of the request, e.g. {"job": {...}, "batch": 1}
+        address (tuple): The host and the port of the service
+        timeout (float, optional): The timeout of the request in seconds
+
+    Raises:
+        ValueError: If the service rejects the request
+
+    Returns:
+        dict: The JSON response
+    """
+    data = json.dumps(payload or {}).encode()
+    http_request = urllib.request.Request("http://%s:%d%s" %(address[0], address[1], endpoint), data=data,
+                                          headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(http_request, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as error:
+        raise ValueError(json.loads(error.read()).get("error", str(error)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs a local service, which creates batches of shots without the startup cost of the driver scripts.")
+    parser.add_argument("--host", default=DEFAULT_ADDRESS[0], help="the host of the service (localhost by default)")
+    parser.add_argument("--port", type=int, default=DEFAULT_ADDRESS[1], help="the port of the service")
+    parser.add_argument("--workers", type=int, default=0, help="the number of worker processes (0 serves the requests in the service process)")
+    parser.add_argument("--cache", nargs="?", const="", default=None, metavar="DIRECTORY",
+                        help="restore the already created batches from the output cache (by default in the SFERE_OUTPUT_CACHE directory)")
+    parser.add_argument("--cache-size", type=float, default=DEFAULT_MAX_SIZE / 1024**3, help="the maximum size of the output cache in GB")
+    arguments = parser.parse_args()
+    cache = None if arguments.cache is None else OutputCache(arguments.cache or None, int(arguments.cache_size * 1024**3))
+
+    serve((arguments.host, arguments.port), arguments.workers, cache)
+
+if __name__ == "__main__":
+    main()
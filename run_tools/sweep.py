@@ -0,0 +1,263 @@
+import argparse
+import copy
+import hashlib
+import itertools
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from run_tools.job_runner import job_spec, read_spec_file, run_job
+from run_tools.output_cache import OutputCache, DEFAULT_MAX_SIZE
+
+# an example sweep: the velocity and the impact angle of the default job
+# the parameters are dotted paths in the job spec (integers index lists, e.g. "velocity.args.0")
+DEFAULT_SWEEP_SPEC = {
+    "name": "sweep",
+    "output_directory": "sweeps",
+    "job": {},
+    "parameters": {
+        "velocity.args": [[60, 5, 50, 60], [75, 5, 65, 75]],
+        "box.angle": [60, 90],
+    },
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    config_hash TEXT PRIMARY KEY,
+    sweep TEXT,
+    name TEXT,
+    parameters TEXT,
+    spec TEXT,
+    output_directory TEXT,
+    seed TEXT,
+    status TEXT,
+    batches INTEGER,
+    completed_batches INTEGER,
+    duration REAL,
+    finished TEXT,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS batches (
+    config_hash TEXT,
+    batch INTEGER,
+    files TEXT,
+    shots_file TEXT,
+    report TEXT,
+    seed TEXT,
+    shots INTEGER,
+    elements INTEGER,
+    velocity REAL,
+    coverage TEXT,
+    timings TEXT,
+    PRIMARY KEY (config_hash, batch)
+);
+"""
+
+def set_parameter(spec, path, value):
+    """Sets the value of a dotted path (e.g. "mesh.element_length" or "velocity.args.0") in a job spec.
+
+    Args:
+        spec (dict): The job spec
+        path (str): The dotted path of the parameter
+        value: The value of the parameter
+    """
+    keys = [int(key) if key.isdigit() else key for key in path.split(".")]
+    target = spec
+    for key in keys[:-1]:
+        target = target[key]
+    target[keys[-1]] = value
+
+def config_hash(spec):
+    """Calculates the hash of the exact configuration of a job. The output directory is not hashed,
+       since it is named after the hash.
+
+    Args:
+        spec (dict): The job spec
+
+    Returns:
+        str: The hexadecimal hash
+    """
+    configuration = {key: value for key, value in spec.items() if key != "output_directory"}
+    return hashlib.sha256(json.dumps(configuration, sort_keys=True).encode()).hexdigest()
+
+def expand_grid(sweep_spec):
+    """Expands the parameter grid of a sweep into job specs, one for every combination of the parameter values.
+       Every job is named after the sweep and written in its own directory, named after its configuration hash.
+
+    Args:
+        sweep_spec (dict): The sweep spec ("name", "output_directory", the base "job" spec and the "parameters" grid)
+
+    Returns:
+        list: The (parameters, job spec) of every job
+    """
+    parameters = sweep_spec["parameters"]
+    paths = list(parameters)
+    jobs = []
+    for values in itertools.product(*(parameters[path] for path in paths)):
+        spec = job_spec(copy.deepcopy(sweep_spec["job"]))
+        for path, value in zip(paths, values):
+            set_parameter(spec, path, value)
+        spec["name"] = sweep_spec["name"]
+        spec["output_directory"] = os.path.join(os.path.abspath(sweep_spec["output_directory"]), "%s_%s" %(sweep_spec["name"], config_hash(spec)[:12]))
+        jobs.append((dict(zip(paths, values)), job_spec(spec)))
+    return jobs
+
+def open_index(filename):
+    """Opens (or creates) the SQLite results index of the sweeps.
+
+    Args:
+        filename (str): The database file
+
+    Returns:
+        sqlite3.Connection: The connection to the index
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+    connection = sqlite3.connect(filename)
+    connection.row_factory = sqlite3.Row
+    connection.executescript(SCHEMA)
+    # the indexes written before the error column was added
+    if "error" not in {row["name"] for row in connection.execute("PRAGMA table_info(jobs)")}:
+        connection.execute("ALTER TABLE jobs ADD COLUMN error TEXT")
+    return connection
+
+def completed_jobs(connection):
+    return {row["config_hash"] for row in connection.execute("SELECT config_hash FROM jobs WHERE status = 'completed'")}
+
+def record_job(connection, sweep_name, parameters, spec, checkpoint, duration, error = None):
+    """Records a job and the outputs of its completed batches in the index.
+
+    Args:
+        connection (sqlite3.Connection): The index
+        sweep_name (str): The name of the sweep
+        parameters (dict): The swept parameters of the job
+        spec (dict): The job spec
+        checkpoint (dict): The checkpoint of the job (see job_runner.run_job), None if the job failed
+        duration (float): The wall time of the job in seconds
+        error (str, optional): The error of a failed job
+    """
+    digest = config_hash(spec)
+    if checkpoint is None:
+        checkpoint = {"seed": spec["seed"], "batches": {}}
+    completed = len(checkpoint["batches"])
+    if error is not None:
+        status = "failed"
+    else:
+        status = "completed" if completed == int(spec["batches"]) else "incomplete"
+    with connection:
+        connection.execute("INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                           (digest, sweep_name, spec["name"], json.dumps(parameters), json.dumps(spec), spec["output_directory"],
+                            str(checkpoint["seed"]), status, int(spec["batches"]), completed, duration, time.strftime("%Y-%m-%dT%H:%M:%S"), error))
+        for batch_number, batch in checkpoint["batches"].items():
+            connection.execute("INSERT OR REPLACE INTO batches VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                               (digest, int(batch_number), json.dumps(batch["files"]), batch["shots_file"], batch["report"],
+                                json.dumps(batch["seed"]), batch["shots"], batch["elements"], batch["velocity"],
+                                json.dumps(batch["coverage"]), json.dumps(batch.get("timings"))))
+
+def _run_sweep_job(spec, cache = None):
+    """Runs a job of a sweep, in a worker process of run_sweep.
+    """
+    start = time.perf_counter()
+    checkpoint = run_job(spec, cache=cache)
+    return checkpoint, time.perf_counter() - start
+
+def _record_result(connection, sweep_name, parameters, spec, run):
+    # a failed job is recorded with its error, and the rest of the sweep continues
+    start = time.perf_counter()
+    try:
+        checkpoint, duration = run()
+    except Exception as error:
+        print("Job %s failed: %s: %s" %(spec["output_directory"], type(error).__name__, error))
+        record_job(connection, sweep_name, parameters, spec, None, time.perf_counter() - start, "%s: %s" %(type(error).__name__, error))
+    else:
+        record_job(connection, sweep_name, parameters, spec, checkpoint, duration)
+
+def run_sweep(sweep_spec, index = None, max_workers = None, cache = None):
+    """Runs the jobs of a parameter sweep on a local process pool, and records their outputs in the SQLite index.
+       The jobs whose exact configuration is already completed in the index are skipped, and the incomplete (or failed)
+       ones are resumed from their checkpoint (see job_runner.run_job). A job which raises an error is recorded
+       with the status "failed" and its error, and the other jobs continue.
+
+    Args:
+        sweep_spec (dict): The sweep spec (see expand_grid)
+        index (str, optional): The database file of the index, by default sweeps.sqlite in the output directory
+        max_workers (int, optional): The number of worker processes. If it is 1, the jobs are run sequentially.
+        cache (OutputCache, optional): The output cache of the batches, shared by the jobs
+
+    Raises:
+        ValueError: If the sweep spec has no parameters
+
+    Returns:
+        list: The configuration hashes of the jobs of the sweep
+    """
+    if not sweep_spec.get("parameters"):
+        raise ValueError("The sweep spec has no parameters. Please give the grid of parameter values, e.g. %s." %json.dumps(DEFAULT_SWEEP_SPEC["parameters"]))
+    sweep_spec = {**DEFAULT_SWEEP_SPEC, **sweep_spec}
+    index = index or os.path.join(sweep_spec["output_directory"], "sweeps.sqlite")
+    connection = open_index(index)
+    jobs = expand_grid(sweep_spec)
+    completed = completed_jobs(connection)
+    pending = [(parameters, spec) for parameters, spec in jobs if config_hash(spec) not in completed]
+    print("%d jobs, %d already completed, %d to run" %(len(jobs), len(jobs) - len(pending), len(pending)))
+
+    try:
+        if max_workers == 1:
+            for parameters, spec in pending:
+                _record_result(connection, sweep_spec["name"], parameters, spec, lambda: _run_sweep_job(spec, cache))
+        elif pending:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = {executor.submit(_run_sweep_job, spec, cache): (parameters, spec) for parameters, spec in pending}
+                for future in as_completed(futures):
+                    parameters, spec = futures[future]
+                    # only the parent process writes to the index
+                    _record_result(connection, sweep_spec["name"], parameters, spec, future.result)
+    finally:
+        connection.close()
+
+    return [config_hash(spec) for _, spec in jobs]
+
+def query_results(index, sweep_name = None):
+    """Reads the batches of the index, joined with the swept parameters of their jobs.
+
+    Args:
+        index (str): The database file of the index
+        sweep_name (str, optional): Only the batches of this sweep are read
+
+    Returns:
+        list: A dict for every batch
+    """
+    connection = open_index(index)
+    query = ("SELECT jobs.sweep, jobs.parameters, jobs.output_directory, jobs.status, batches.* "
+             "FROM batches JOIN jobs ON jobs.config_hash = batches.config_hash")
+    try:
+        if sweep_name is None:
+            rows = connection.execute(query + " ORDER BY jobs.sweep, batches.config_hash, batches.batch").fetchall()
+        else:
+            rows = connection.execute(query + " WHERE jobs.sweep = ? ORDER BY batches.config_hash, batches.batch", (sweep_name,)).fetchall()
+    finally:
+        connection.close()
+
+    results = []
+    for row in rows:
+        result = dict(row)
+        for key in ("parameters", "files", "seed", "coverage", "timings"):
+            result[key] = json.loads(result[key])
+        results.append(result)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs a parameter sweep of batch jobs, and records the outputs in a SQLite index.")
+    parser.add_argument("spec", help="the sweep spec file (.json or .toml)")
+    parser.add_argument("--workers", type=int, default=None, help="the number of worker processes (1 runs the jobs sequentially)")
+    parser.add_argument("--index", default=None, help="the SQLite index, by default sweeps.sqlite in the output directory of the sweep")
+    parser.add_argument("--cache", nargs="?", const="", default=None, metavar="DIRECTORY",
+                        help="restore the already created batches from the output cache (by default in the SFERE_OUTPUT_CACHE directory)")
+    parser.add_argument("--cache-size", type=float, default=DEFAULT_MAX_SIZE / 1024**3, help="the maximum size of the output cache in GB")
+    arguments = parser.parse_args()
+    cache = None if arguments.cache is None else OutputCache(arguments.cache or None, int(arguments.cache_size * 1024**3))
+
+    run_sweep(read_spec_file(arguments.spec), arguments.index, arguments.workers, cache)
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,474 @@
+from abc import ABC, abstractmethod
+
 import numpy as np
-from scipy.stats import weibull_min
+from scipy.special import ndtr, ndtri
+
+def quota_allocation(probabilities, size, rng=None):
+    """
+    Allocates a number of samples to classes in proportion to their probabilities, with the largest
+    remainder method. The remaining samples are given to the classes with the largest fractional
+    quotas (ties are broken randomly).
+
+    Parameters:
+    ----------
+    probabilities : array-like
+        The probability of each class.
+    size : int
+        The total number of samples.
+    rng : numpy.random.Generator, int or None
+        The random generator (or the seed of a new one) used to break the ties.
+
+    Returns:
+    -------
+    ndarray
+        The number of samples of each class.
+    """
+    rng = np.random.default_rng(rng)
+    probabilities = np.asarray(probabilities, dtype=float)
+    quotas = int(size) * probabilities / np.sum(probabilities)
+    counts = np.floor(quotas).astype(int)
+    remainders = quotas - counts
+    order = np.lexsort((rng.random(len(remainders)), -remainders))
+    counts[order[:int(size) - np.sum(counts)]] += 1
+    return counts
+
+def mass_quota_allocation(probabilities, unit_masses, size):
+    """
+    Allocates a number of samples to classes, so that the mass fractions of the classes are as close as
+    possible to the target ones. The samples are added one by one to the class that minimizes the sum of
+    absolute differences between the allocated and the target mass fractions.
+
+    Parameters:
+    ----------
+    probabilities : array-like
+        The probability (number fraction) of each class.
+    unit_masses : array-like
+        The mass of a single sample of each class (e.g. the volume of a shot with the sieve's center diameter).
+    size : int
+        The total number of samples.
+
+    Returns:
+    -------
+    ndarray
+        The number of samples of each class.
+    """
+    probabilities = np.asarray(probabilities, dtype=float)
+    unit_masses = np.asarray(unit_masses, dtype=float)
+    target_fractions = probabilities * unit_masses / np.sum(probabilities * unit_masses)
+
+    counts = np.zeros(len(probabilities), dtype=int)
+    candidates = np.eye(len(probabilities)) * unit_masses # the added mass of each candidate class
+    for _ in range(int(size)):
+        masses = counts * unit_masses + candidates
+        errors = np.sum(np.abs(masses / np.sum(masses, axis=1, keepdims=True) - target_fractions), axis=1)
+        errors[probabilities <= 0] = np.inf
+        counts[np.argmin(errors)] += 1
+    return counts
+
+class Distribution(ABC):
+    """
+    Interface class for the size distributions. Any distribution that implements `sample`, `pdf`, `cdf` and `ppf`
+    can be used to generate the sizes of the shots.
+
+    Methods:
+    -------
+    sample(size, rng):
+        Generates random numbers from the distribution, in a single vectorized call.
+    pdf(x):
+        Probability density function.
+    cdf(x):
+        Cumulative distribution function.
+    ppf(q):
+        Percent point function (inverse of the cdf).
+    expected_value():
+        The mean value of the distribution.
+    parameters():
+        The parameters of the distribution.
+    sample_truncated(size, lower, upper, rng):
+        Generates random numbers from the distribution, truncated between the given bounds.
+    stratified_sample(size, bin_edges, rng, target):
+        Generates random numbers with a fixed number of them inside each bin (e.g. each sieve).
+    generate_random_numbers(size):
+        Generates random numbers from the distribution (same as `sample`, with numpy's global random state).
+    """
+
+    @abstractmethod
+    def sample(self, size, rng=None):
+        pass
+
+    @abstractmethod
+    def pdf(self, x):
+        pass
+
+    @abstractmethod
+    def cdf(self, x):
+        pass
+
+    @abstractmethod
+    def ppf(self, q):
+        pass
+
+    @abstractmethod
+    def expected_value(self):
+        pass
+
+    @abstractmethod
+    def parameters(self):
+        pass
+
+    def sample_truncated(self, size, lower=-np.inf, upper=np.inf, rng=None):
+        """
+        Generates random numbers from the distribution, truncated between the given bounds. If most of the
+        probability lies between the bounds, the samples outside them are rejected and drawn again in bulk.
+        Otherwise the samples are drawn by inverse-CDF sampling, so no sample is rejected.
+
+        Parameters:
+        ----------
+        size : int
+            The number of random numbers to generate.
+        lower : float
+            The lower bound of the random numbers.
+        upper : float
+            The upper bound of the random numbers.
+        rng : numpy.random.Generator, int or None
+            The random generator (or the seed of a new one) used for sampling.
+
+        Returns:
+        -------
+        ndarray
+            A numpy array of random numbers between the bounds.
+        """
+        rng = np.random.default_rng(rng)
+        size = int(size)
+        cdf_lower, cdf_upper = self.cdf([lower, upper])
+        acceptance = cdf_upper - cdf_lower
+        if acceptance <= 0:
+            raise ValueError("The distribution has no probability between the bounds %s and %s." %(lower, upper))
+
+        if acceptance < 0.5:
+            return self.ppf(rng.uniform(cdf_lower, cdf_upper, size))
+
+        samples = np.empty(0)
+        while len(samples) < size:
+            remaining = size - len(samples)
+            candidates = self.sample(int(np.ceil(1.1 * remaining / acceptance)) + 1, rng)
+            candidates = candidates[(candidates >= lower) & (candidates <= upper)]
+            samples = np.concatenate([samples, candidates[:remaining]])
+
+        return samples
+
+    def stratified_sample(self, size, bin_edges=None, rng=None, target="count"):
+        """
+        Generates random numbers with a fixed (quota) number of them inside each bin, instead of a random one,
+        so that even a few random numbers reproduce the distribution over the bins. The random numbers of each
+        bin are drawn by inverse-CDF sampling inside the bin, and they are returned in random order.
+
+        Parameters:
+        ----------
+        size : int
+            The number of random numbers to generate.
+        bin_edges : array-like
+            The ascending edges of the bins (e.g. the sieve levels). The random numbers lie between the first
+            and the last edge.
+        rng : numpy.random.Generator, int or None
+            The random generator (or the seed of a new one) used for sampling.
+        target : str
+            "count" to allocate the numbers in proportion to the probability of each bin, or "mass" to match
+            the mass fraction of each bin, assuming the random numbers are diameters (see mass_quota_allocation).
+
+        Returns:
+        -------
+        ndarray
+            A numpy array of random numbers.
+        """
+        if bin_edges is None:
+            raise ValueError("The bin edges of the stratified sampling are not defined.")
+        rng = np.random.default_rng(rng)
+        bin_edges = np.asarray(bin_edges, dtype=float)
+        cumulative = self.cdf(bin_edges)
+        probabilities = np.diff(cumulative)
+        if np.sum(probabilities) <= 0:
+            raise ValueError("The distribution has no probability between the bounds %s and %s." %(bin_edges[0], bin_edges[-1]))
+
+        if target == "count":
+            counts = quota_allocation(probabilities, size, rng)
+        elif target == "mass":
+            bin_centers = (bin_edges[:-1] + bin_edges[1:]) / 2
+            counts = mass_quota_allocation(probabilities, bin_centers ** 3, size)
+        else:
+            raise ValueError('Please choose a valid stratification target: "count" or "mass".')
+
+        bins = np.repeat(np.arange(len(counts)), counts)
+        samples = self.ppf(rng.uniform(cumulative[bins], cumulative[bins + 1]))
+        return rng.permutation(samples)
+
+    def generate_random_numbers(self, size):
+        """
+        Generates random numbers from the distribution.
+
+        Parameters:
+        ----------
+        size : int
+            The number of random numbers to generate.
 
-class GaussianDistribution:
+        Returns:
+        -------
+        ndarray
+            A numpy array of random numbers drawn from the distribution.
+        """
+        return self.sample(size, np.random.default_rng(np.random.randint(2**31)))
+
+class MixtureDistribution(Distribution):
+    """
+    Base class for mixtures of K components of the same family. The subclasses implement the vectorized
+    component functions (`_component_pdf`, `_component_cdf`, `_component_ppf`, `_component_sample`, `_component_mean`)
+    and provide the mixing `weights`, which sum to 1.
+
+    The component of every sample is selected with a single multinomial draw, so all the samples are generated
+    with one vectorized call per component.
+    """
+
+    @property
+    def number_of_components(self):
+        return len(self.weights)
+
+    def sample(self, size, rng=None):
+        """
+        Generates random numbers from the mixture.
+
+        Parameters:
+        ----------
+        size : int
+            The number of random numbers to generate.
+        rng : numpy.random.Generator, int or None
+            The random generator (or the seed of a new one) used for sampling.
+
+        Returns:
+        -------
+        ndarray
+            A numpy array of random numbers drawn from the mixture, in random order.
+        """
+        rng = np.random.default_rng(rng)
+
+        samples_per_component = rng.multinomial(int(size), self.weights)
+        samples = np.concatenate([self._component_sample(k, n, rng) for k, n in enumerate(samples_per_component)])
+        rng.shuffle(samples)
+
+        return samples
+
+    def pdf(self, x):
+        """
+        Probability density function of the mixture.
+
+        Parameters:
+        ----------
+        x : float or array-like
+            The values where the function is evaluated.
+
+        Returns:
+        -------
+        ndarray
+            The probability density values.
+        """
+        x = np.asarray(x, dtype=float)
+        return np.sum(np.asarray(self.weights) * self._component_pdf(x[..., np.newaxis]), axis=-1)
+
+    def cdf(self, x):
+        """
+        Cumulative distribution function of the mixture.
+
+        Parameters:
+        ----------
+        x : float or array-like
+            The values where the function is evaluated.
+
+        Returns:
+        -------
+        ndarray
+            The cumulative probability values.
+        """
+        x = np.asarray(x, dtype=float)
+        return np.sum(np.asarray(self.weights) * self._component_cdf(x[..., np.newaxis]), axis=-1)
+
+    def ppf(self, q, tolerance=1e-12, max_iterations=200):
+        """
+        Percent point function (inverse cdf) of the mixture. The quantile of a mixture always lies between
+        the quantiles of its components, so it is found by a vectorized bisection inside this bracket.
+
+        Parameters:
+        ----------
+        q : float or array-like
+            The probabilities.
+        tolerance : float
+            The absolute tolerance of the returned quantiles.
+        max_iterations : int
+            The maximum number of bisection iterations.
+
+        Returns:
+        -------
+        ndarray
+            The quantiles.
+        """
+        q = np.asarray(q, dtype=float)
+        component_quantiles = self._component_ppf(q[..., np.newaxis])
+        lower = np.min(component_quantiles, axis=-1)
+        upper = np.max(component_quantiles, axis=-1)
+        if self.number_of_components == 1:
+            return lower
+
+        for _ in range(max_iterations):
+            middle = (lower + upper) / 2
+            below = self.cdf(middle) < q
+            lower = np.where(below, middle, lower)
+            upper = np.where(below, upper, middle)
+            if np.all(upper - lower <= tolerance):
+                break
+
+        return (lower + upper) / 2
+
+    def expected_value(self):
+        """
+        The mean value of the mixture.
+
+        Returns:
+        -------
+        float
+            The weighted mean of the components' mean values.
+        """
+        return float(np.sum(self.weights * self._component_mean()))
+
+class GaussianMixture(MixtureDistribution):
+    """
+    A class representing a mixture of K Gaussian distributions.
+
+    Attributes:
+    ----------
+    means : array-like
+        The means of the Gaussian components.
+    stdevs : array-like
+        The standard deviations of the Gaussian components.
+    weights : array-like
+        The mixing proportions of the Gaussian components.
+    """
+
+    def __init__(self, means, stdevs, weights=None):
+        """
+        Initializes a new GaussianMixture object.
+
+        Parameters:
+        ----------
+        means : array-like
+            The means of the Gaussian components.
+        stdevs : array-like
+            The standard deviations of the Gaussian components.
+        weights : array-like
+            The mixing proportions of the Gaussian components, normalized to sum to 1. Equal proportions are used if they are not given.
+        """
+        self.means = np.atleast_1d(np.asarray(means, dtype=float))
+        self.stdevs = np.atleast_1d(np.asarray(stdevs, dtype=float))
+        if weights is None:
+            weights = np.ones(len(self.means))
+        weights = np.atleast_1d(np.asarray(weights, dtype=float))
+        self.weights = weights / np.sum(weights)
+
+    def _component_pdf(self, x):
+        means = np.asarray(self.means)
+        stdevs = np.asarray(self.stdevs)
+        return np.exp(-0.5 * ((x - means) / stdevs) ** 2) / (stdevs * np.sqrt(2 * np.pi))
+
+    def _component_cdf(self, x):
+        return ndtr((x - np.asarray(self.means)) / np.asarray(self.stdevs))
+
+    def _component_ppf(self, q):
+        return np.asarray(self.means) + np.asarray(self.stdevs) * ndtri(q)
+
+    def _component_sample(self, k, size, rng):
+        return rng.normal(self.means[k], self.stdevs[k], size)
+
+    def _component_mean(self):
+        return np.asarray(self.means, dtype=float)
+
+    def parameters(self):
+        """
+        The parameters of the mixture.
+
+        Returns:
+        -------
+        dict
+            The means, standard deviations and weights of the components.
+        """
+        return {'means': np.asarray(self.means, dtype=float), 'stdevs': np.asarray(self.stdevs, dtype=float),
+                'weights': np.asarray(self.weights, dtype=float)}
+
+class WeibullMixture(MixtureDistribution):
+    """
+    A class representing a mixture of K Weibull distributions.
+
+    Attributes:
+    ----------
+    alphas : array-like
+        The scale parameters of the Weibull components.
+    betas : array-like
+        The shape parameters of the Weibull components.
+    weights : array-like
+        The mixing proportions of the Weibull components.
+    """
+
+    def __init__(self, alphas, betas, weights=None):
+        """
+        Initializes a new WeibullMixture object.
+
+        Parameters:
+        ----------
+        alphas : array-like
+            The scale parameters of the Weibull components.
+        betas : array-like
+            The shape parameters of the Weibull components.
+        weights : array-like
+            The mixing proportions of the Weibull components, normalized to sum to 1. Equal proportions are used if they are not given.
+        """
+        self.alphas = np.atleast_1d(np.asarray(alphas, dtype=float))
+        self.betas = np.atleast_1d(np.asarray(betas, dtype=float))
+        if weights is None:
+            weights = np.ones(len(self.alphas))
+        weights = np.atleast_1d(np.asarray(weights, dtype=float))
+        self.weights = weights / np.sum(weights)
+
+    def _component_pdf(self, x):
+        alphas = np.asarray(self.alphas)
+        betas = np.asarray(self.betas)
+        z = np.clip(x, 0, None) / alphas
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pdf = (betas / alphas) * z ** (betas - 1) * np.exp(-z ** betas)
+        return np.where(x > 0, pdf, 0.0)
+
+    def _component_cdf(self, x):
+        z = np.clip(x, 0, None) / np.asarray(self.alphas)
+        return -np.expm1(-z ** np.asarray(self.betas))
+
+    def _component_ppf(self, q):
+        return np.asarray(self.alphas) * (-np.log1p(-q)) ** (1 / np.asarray(self.betas))
+
+    def _component_sample(self, k, size, rng):
+        return self.alphas[k] * rng.weibull(self.betas[k], size)
+
+    def _component_mean(self):
+        from scipy.special import gamma
+        return np.asarray(self.alphas, dtype=float) * gamma(1 + 1 / np.asarray(self.betas, dtype=float))
+
+    def parameters(self):
+        """
+        The parameters of the mixture.
+
+        Returns:
+        -------
+        dict
+            The scale parameters, shape parameters and weights of the components.
+        """
+        return {'alphas': np.asarray(self.alphas, dtype=float), 'betas': np.asarray(self.betas, dtype=float),
+                'weights': np.asarray(self.weights, dtype=float)}
+
+class GaussianDistribution(GaussianMixture):
     """
     A class representing a Gaussian distribution with mean and standard deviation attributes.
 
@@ -33,6 +500,21 @@ class GaussianDistribution:
         self.mean = mean
         self.stdev = stdev
 
+    @property
+    def means(self):
+        return np.array([self.mean], dtype=float)
+
+    @property
+    def stdevs(self):
+        return np.array([self.stdev], dtype=float)
+
+    @property
+    def weights(self):
+        return np.array([1.0])
+
+    def parameters(self):
+        return {'mean': self.mean, 'stdev': self.stdev}
+
     def generate_random_numbers(self, size):
         """
         Generates random numbers from the Gaussian distribution.
@@ -49,28 +531,27 @@ class GaussianDistribution:
         """
         return np.random.normal(self.mean, self.stdev, size)
 
-class MixedWeibull:
+class MixedWeibull(WeibullMixture):
     """
-    A class representing a Gaussian distribution with mean and standard deviation attributes.
+    A class representing a mixture of two Weibull distributions.
 
     Attributes:
     ----------
-    alpha_1 (float): 
-        The shape parameter of the first Weibull distribution.
-    beta_1 (float): 
+    alpha_1 (float):
         The scale parameter of the first Weibull distribution.
-    alpha_2 (float): 
-        The shape parameter of the second Weibull distribution.
-    beta_2 (float): 
-    
+    beta_1 (float):
+        The shape parameter of the first Weibull distribution.
+    alpha_2 (float):
         The scale parameter of the second Weibull distribution.
-    mix_proportion (float): 
+    beta_2 (float):
+        The shape parameter of the second Weibull distribution.
+    mix_proportion (float):
         The mixing proportion of the two Weibull distributions.
 
     Methods:
     -------
     generate_random_numbers(size):
-        Generates random numbers from the Gaussian distribution.
+        Generates random numbers from the mixed Weibull distribution.
 
     """
 
@@ -80,16 +561,15 @@ class MixedWeibull:
 
         Parameters:
         ----------
-        alpha_1 (float): 
-            The shape parameter of the first Weibull distribution.
-        beta_1 (float): 
+        alpha_1 (float):
             The scale parameter of the first Weibull distribution.
-        alpha_2 (float): 
-            The shape parameter of the second Weibull distribution.
-        beta_2 (float): 
-        
+        beta_1 (float):
+            The shape parameter of the first Weibull distribution.
+        alpha_2 (float):
             The scale parameter of the second Weibull distribution.
-        mix_proportion (float): 
+        beta_2 (float):
+            The shape parameter of the second Weibull distribution.
+        mix_proportion (float):
             The mixing proportion of the two Weibull distributions.
         """
         self.alpha_1 = alpha_1
@@ -98,40 +578,40 @@ class MixedWeibull:
         self.beta_2 = beta_2
         self.mix_proportion = mix_proportion
 
-    def generate_random_numbers(self, size):
-        """
-        Generates mixed Weibull data.
-        
-        Args:
-        alpha_1 (float): The shape parameter of the first Weibull distribution.
-        beta_1 (float): The scale parameter of the first Weibull distribution.
-        alpha_2 (float): The shape parameter of the second Weibull distribution.
-        beta_2 (float): The scale parameter of the second Weibull distribution.
-        mix_proportion (float): The mixing proportion of the two Weibull distributions.
-        size (int): The size of the generated data.
+    @property
+    def alphas(self):
+        return np.array([self.alpha_1, self.alpha_2], dtype=float)
 
-        Returns:
-        np.ndarray: An array with the generated data
-        """
-        weibull_1 = weibull_min(c=self.beta_1, scale=self.alpha_1)
-        weibull_2 = weibull_min(c=self.beta_2, scale=self.alpha_2)
+    @property
+    def betas(self):
+        return np.array([self.beta_1, self.beta_2], dtype=float)
 
-        size_1 = int(size * self.mix_proportion)
-        size_2 = size - size_1
+    @property
+    def weights(self):
+        return np.array([self.mix_proportion, 1 - self.mix_proportion], dtype=float)
 
-        if size_1 == 0:
-            random_numbers_1 = np.array([])
-        else:
-            random_numbers_1 = weibull_1.rvs(size=size_1)
+    def parameters(self):
+        return {'alpha_1': self.alpha_1, 'beta_1': self.beta_1, 'alpha_2': self.alpha_2, 'beta_2': self.beta_2,
+                'mix_proportion': self.mix_proportion}
 
-        if size_2 == 0:
-            random_numbers_2 = np.array([])
-        else:
-            random_numbers_2 = weibull_2.rvs(size=size_2)
+class Mixed_Gaussian(GaussianMixture):
+    """
+    A class representing a mixture of two Gaussian distributions.
+
+    Attributes:
+    ----------
+    mean_1 : float
+        The mean of the first Gaussian distribution.
+    stdev_1 : float
+        The standard deviation of the first Gaussian distribution.
+    mean_2 : float
+        The mean of the second Gaussian distribution.
+    stdev_2 : float
+        The standard deviation of the second Gaussian distribution.
+    mix_proportion : float
+        The proportion of the first Gaussian distribution in the mixture.
+    """
 
-        return np.concatenate([random_numbers_1, random_numbers_2])
-    
-class Mixed_Gaussian:
     def __init__(self, mean_1, stdev_1, mean_2, stdev_2, mix_proportion):
         """
         Initializes a new Mixed_Gaussian object.
@@ -155,35 +635,174 @@ class Mixed_Gaussian:
         self.stdev_2 = stdev_2
         self.mix_proportion = mix_proportion
 
-    def generate_random_numbers(self, size):
+    @property
+    def means(self):
+        return np.array([self.mean_1, self.mean_2], dtype=float)
+
+    @property
+    def stdevs(self):
+        return np.array([self.stdev_1, self.stdev_2], dtype=float)
+
+    @property
+    def weights(self):
+        return np.array([self.mix_proportion, 1 - self.mix_proportion], dtype=float)
+
+    def parameters(self):
+        return {'mean_1': self.mean_1, 'stdev_1': self.stdev_1, 'mean_2': self.mean_2, 'stdev_2': self.stdev_2,
+                'mix_proportion': self.mix_proportion}
+
+class EmpiricalSieveDistribution(Distribution):
+    """
+    A class representing the empirical (tabulated) distribution of binned data, e.g. the number of shots
+    per sieve. The random numbers are drawn through the tabulated inverse cdf, without fitting any
+    parametric distribution.
+
+    Attributes:
+    ----------
+    bin_edges : ndarray
+        The ascending edges of the bins.
+    probabilities : ndarray
+        The probability of each bin.
+    interpolate : bool
+        If True, the values are uniformly distributed inside each bin (piecewise linear cdf).
+        Otherwise, all the values of a bin are equal to its center.
+    """
+
+    def __init__(self, bin_edges, counts, interpolate=True):
+        """
+        Initializes a new EmpiricalSieveDistribution object.
+
+        Parameters:
+        ----------
+        bin_edges : array-like
+            The ascending edges of the bins.
+        counts : array-like
+            The number (or any other frequency) of data points in each bin.
+        interpolate : bool
+            If True, the values are uniformly distributed inside each bin. Otherwise, they are equal to the bin center.
+        """
+        self.bin_edges = np.asarray(bin_edges, dtype=float)
+        counts = np.asarray(counts, dtype=float)
+        self.probabilities = counts / np.sum(counts)
+        self.interpolate = interpolate
+
+    @property
+    def bin_centers(self):
+        return (self.bin_edges[:-1] + self.bin_edges[1:]) / 2
+
+    @property
+    def cumulative_probabilities(self):
+        cumulative = np.concatenate([[0.0], np.cumsum(self.probabilities)])
+        cumulative[-1] = 1.0
+        return cumulative
+
+    def sample(self, size, rng=None):
+        """
+        Generates random numbers from the empirical distribution, through its tabulated inverse cdf.
+
+        Parameters:
+        ----------
+        size : int
+            The number of random numbers to generate.
+        rng : numpy.random.Generator, int or None
+            The random generator (or the seed of a new one) used for sampling.
+
+        Returns:
+        -------
+        ndarray
+            A numpy array of random numbers drawn from the distribution.
+        """
+        rng = np.random.default_rng(rng)
+        return self.ppf(rng.random(size))
+
+    def pdf(self, x):
+        """
+        Probability density function (histogram density) of the empirical distribution.
+
+        Parameters:
+        ----------
+        x : float or array-like
+            The values where the function is evaluated.
+
+        Returns:
+        -------
+        ndarray
+            The probability density values.
         """
-        Generates random numbers based on a mixed Gaussian distribution.
+        x = np.asarray(x, dtype=float)
+        densities = np.concatenate([[0.0], self.probabilities / np.diff(self.bin_edges), [0.0]])
+        return densities[np.searchsorted(self.bin_edges, x, side='right')]
 
-        Args:
-            num_samples (int): Number of random numbers to generate. Defaults to 1.
+    def cdf(self, x):
+        """
+        Cumulative distribution function of the empirical distribution.
+
+        Parameters:
+        ----------
+        x : float or array-like
+            The values where the function is evaluated.
 
         Returns:
-            list: A list of randomly generated numbers based on the mixed Gaussian distribution.
+        -------
+        ndarray
+            The cumulative probability values.
         """
-        # Calculate the weights for the mixture
-        weight_1 = self.mix_proportion
-        weight_2 = 1 - self.mix_proportion
+        x = np.asarray(x, dtype=float)
+        if self.interpolate:
+            return np.interp(x, self.bin_edges, self.cumulative_probabilities)
+        return self.cumulative_probabilities[np.searchsorted(self.bin_centers, x, side='right')]
 
-        # Generate random numbers based on the mixed Gaussian distribution
-        samples = []
-        for _ in range(size):
-            # Randomly select a Gaussian distribution based on weights
-            gaussian_index = np.random.choices([0, 1], weights=[weight_1, weight_2], k=1)[0]
+    def ppf(self, q):
+        """
+        Percent point function (tabulated inverse cdf) of the empirical distribution.
 
-            # Generate a random number from the selected Gaussian distribution
-            if gaussian_index == 0:
-                mu = self.mean_1
-                sigma = self.stdev_1
-            else:
-                mu = self.mean_2
-                sigma = self.stdev_2
+        Parameters:
+        ----------
+        q : float or array-like
+            The probabilities.
 
-            sample = np.random.gauss(mu, sigma)
-            samples.append(sample)
+        Returns:
+        -------
+        ndarray
+            The quantiles.
+        """
+        q = np.asarray(q, dtype=float)
+        cumulative = self.cumulative_probabilities
+        bins = np.clip(np.searchsorted(cumulative, q, side='right') - 1, 0, len(self.probabilities) - 1)
+        if not self.interpolate:
+            return self.bin_centers[bins]
+
+        # linear interpolation inside the bin, the empty bins are never selected
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fraction = np.clip((q - cumulative[bins]) / self.probabilities[bins], 0, 1)
+        return self.bin_edges[bins] + np.nan_to_num(fraction) * np.diff(self.bin_edges)[bins]
+
+    def expected_value(self):
+        """
+        The mean value of the empirical distribution.
+
+        Returns:
+        -------
+        float
+            The mean of the bin centers, weighted by the bin probabilities.
+        """
+        return float(np.sum(self.probabilities * self.bin_centers))
 
-        return samples
\ No newline at end of file
+    def stratified_sample(self, size, bin_edges=None, rng=None, target="count"):
+        """
+        Same method as Distribution.stratified_sample, with the bins of the empirical distribution as default bins.
+        """
+        if bin_edges is None:
+            bin_edges = self.bin_edges
+        return super().stratified_sample(size, bin_edges, rng, target)
+
+    def parameters(self):
+        """
+        The parameters of the empirical distribution.
+
+        Returns:
+        -------
+        dict
+            The bin edges and the bin probabilities.
+        """
+        return {'bin_edges': self.bin_edges, 'probabilities': self.probabilities}
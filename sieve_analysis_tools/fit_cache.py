@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import pickle
+from importlib import metadata
+import sieve_analysis_tools.instrumentation as instrumentation
+
+# increase this number if the stored fit results are not compatible anymore
+FIT_CACHE_VERSION = 1
+
+DEFAULT_CACHE_DIRECTORY = os.environ.get("SFERE_FIT_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "sFEre", "fits"))
+
+def library_versions():
+    """
+    Returns the versions of the libraries and of the fitting code, that the fit results depend on.
+
+    Returns:
+    dict: The version of each library and the hash of the fitters module source code.
+    """
+    versions = {}
+    for library in ("numpy", "scipy", "reliability"):
+        try:
+            versions[library] = metadata.version(library)
+        except metadata.PackageNotFoundError:
+            versions[library] = "not installed"
+
+    with open(os.path.join(os.path.dirname(__file__), "fitters.py"), "rb") as f:
+        versions["fitters"] = hashlib.sha256(f.read()).hexdigest()
+
+    return versions
+
+def fit_cache_key(sieve_analysis_data, shot_material_density, fitting_distribution, fitting_approach="samples"):
+    """
+    Calculates the key of a fit, as the hash of its input data, its options and the library versions.
+
+    Args:
+    sieve_analysis_data (list): The sieve levels and the retained weight per sieve.
+    shot_material_density (float): The density of the shots' material.
+    fitting_distribution (str): "Gaussian", "Mixed Weibull" or "Mixed Gaussian".
+    fitting_approach (str): "samples" or "binned".
+
+    Returns:
+    str: The hexadecimal key of the fit.
+    """
+    content = {
+        "sieve_levels": [float(level) for level in sieve_analysis_data[0]],
+        "retained_weight": [float(weight) for weight in sieve_analysis_data[1]],
+        "density": float(shot_material_density),
+        "distribution": fitting_distribution,
+        "approach": fitting_approach,
+        "versions": library_versions(),
+        "cache_version": FIT_CACHE_VERSION,
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+def _cache_path(key, cache_directory):
+    return os.path.join(cache_directory or DEFAULT_CACHE_DIRECTORY, key + ".pkl")
+
+def cached_fit_sieve_distribution(sieve_analysis_data, shot_material_density, fitting_distribution, fitting_approach="samples",
+                                  cache_directory=None, refresh=False):
+    """
+    Same function as fitters.fit_sieve_distribution, but the fitted distribution is stored on disk, keyed by
+    the sieve data, the density, the distribution, the fitting approach and the library versions. Repeated calls
+    with the same input load the stored distribution, without fitting (or importing the fitting libraries).
+
+    Args:
+    sieve_analysis_data (list): The sieve levels and the retained weight per sieve.
+    shot_material_density (float): The density of the shots' material.
+    fitting_distribution (str): "Gaussian", "Mixed Weibull" or "Mixed Gaussian".
+    fitting_approach (str): "samples" or "binned".
+    cache_directory (str, optional): The directory of the stored fits. Defaults to DEFAULT_CACHE_DIRECTORY
+        (set by the SFERE_FIT_CACHE environment variable).
+    refresh (bool): If True, the distribution is fitted again and the stored fit is replaced.
+
+    Returns:
+    distributions.Distribution: The fitted distribution.
+    """
+    path = _cache_path(fit_cache_key(sieve_analysis_data, shot_material_density, fitting_distribution, fitting_approach), cache_directory)
+
+    if not refresh and os.path.exists(path):
+        try:
+            with open(path, "rb") as f:
+                fitted_distribution = pickle.load(f)
+            instrumentation.count("fit cache hits")
+            return fitted_distribution
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            pass # a corrupted or incompatible stored fit is fitted again
+
+    instrumentation.count("fit cache misses")
+    from sieve_analysis_tools import fitters
+    fitted_distribution = fitters.fit_sieve_distribution(sieve_analysis_data, shot_material_density, fitting_distribution, fitting_approach)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary_path = "%s.%d.tmp" %(path, os.getpid())
+    with open(temporary_path, "wb") as f:
+        pickle.dump(fitted_distribution, f)
+    os.replace(temporary_path, path) # atomic, so concurrent runs never read a partial file
+
+    return fitted_distribution
+
+def invalidate_fit(sieve_analysis_data, shot_material_density, fitting_distribution, fitting_approach="samples", cache_directory=None):
+    """
+    Deletes the stored fit of the given input, if it exists.
+
+    Args:
+    sieve_analysis_data (list): The sieve levels and the retained weight per sieve.
+    shot_material_density (float): The density of the shots' material.
+    fitting_distribution (str): "Gaussian", "Mixed Weibull" or "Mixed Gaussian".
+    fitting_approach (str): "samples" or "binned".
+    cache_directory (str, optional): The directory of the stored fits.
+
+    Returns:
+    bool: True if a stored fit was deleted.
+    """
+    path = _cache_path(fit_cache_key(sieve_analysis_data, shot_material_density, fitting_distribution, fitting_approach), cache_directory)
+    if os.path.exists(path):
+        os.remove(path)
+        return True
+    return False
+
+def clear_fit_cache(cache_directory=None):
+    """
+    Deletes all the stored fits.
+
+    Args:
+    cache_directory (str, optional): The directory of the stored fits.
+
+    Returns:
+    int: The number of deleted fits.
+    """
+    cache_directory = cache_directory or DEFAULT_CACHE_DIRECTORY
+    if not os.path.isdir(cache_directory):
+        return 0
+
+    deleted = 0
+    for filename in os.listdir(cache_directory):
+        if filename.endswith(".pkl"):
+            os.remove(os.path.join(cache_directory, filename))
+            deleted += 1
+    return deleted
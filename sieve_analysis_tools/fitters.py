@@ -1,12 +1,9 @@
-from reliability.Fitters import Fit_Weibull_Mixture, Fit_Everything, Fit_Normal_2P
-from reliability.Other_functions import histogram
 import numpy as np
-import matplotlib.pyplot as plt
-import math
+from concurrent.futures import ProcessPoolExecutor
 import sieve_analysis_tools.statistical_tools as st
 import sieve_analysis_tools.distributions as dist
-from scipy.optimize import curve_fit
-from scipy.signal import find_peaks
+import sieve_analysis_tools.instrumentation as instrumentation
+from scipy.special import ndtr
 
 def fit_weibull_mixture(failures):
     """
@@ -18,6 +15,7 @@ def fit_weibull_mixture(failures):
     Returns:
     Fit_Weibull_Mixture: The results of the Weibull mixture fit.
     """
+    from reliability.Fitters import Fit_Weibull_Mixture
     results = Fit_Weibull_Mixture(failures=failures,show_probability_plot=False,print_results=False)
     return results
 
@@ -31,6 +29,7 @@ def fit_Gaussian(failures):
     Returns:
     Fit_Normal_2P: The results of the Weibull mixture fit.
     """
+    from reliability.Fitters import Fit_Normal_2P
     results = Fit_Normal_2P(failures=failures,show_probability_plot=False,print_results=False)
     return results
 
@@ -57,6 +56,8 @@ def fit_mixed_Gaussian(failures,bin_edges):
         - 'mix proportion': The mixing proportion of the first Gaussian distribution.
 
     """
+    from scipy.signal import find_peaks
+    from scipy.optimize import curve_fit
     def bimodal(x,mu1,sigma1,p1, mu2,sigma2, p2):
         """
         Bimodal Gaussian function used for fitting the mixture model.
@@ -109,6 +110,382 @@ def fit_mixed_Gaussian(failures,bin_edges):
 
     return results
 
+def binned_log_likelihood(distribution, bin_edges, counts):
+    """
+    Calculates the log-likelihood of binned (interval-censored) data, e.g. the number of shots per sieve.
+    The probability of each bin is conditioned on the range of the bins, since no data exist outside it.
+
+    Args:
+    distribution (distributions.Distribution): The distribution.
+    bin_edges (np.ndarray): The ascending edges of the bins.
+    counts (np.ndarray): The number of data points in each bin.
+
+    Returns:
+    float: The log-likelihood.
+    """
+    cdf = distribution.cdf(np.asarray(bin_edges, dtype=float))
+    probabilities = np.diff(cdf) / (cdf[-1] - cdf[0])
+    counts = np.asarray(counts, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_probabilities = np.log(probabilities)
+
+    log_likelihood = np.sum(counts[counts > 0] * log_probabilities[counts > 0])
+    if not np.isfinite(log_likelihood):
+        return -np.inf
+    return log_likelihood
+
+def _weighted_moments(bin_edges, counts):
+    """
+    Calculates the mean and standard deviation of binned data, using the bin centers.
+
+    Args:
+    bin_edges (np.ndarray): The ascending edges of the bins.
+    counts (np.ndarray): The number of data points in each bin.
+
+    Returns:
+    tuple: The mean and the standard deviation.
+    """
+    bin_centers = st.calculate_bin_centers(np.asarray(bin_edges, dtype=float))
+    mean = np.average(bin_centers, weights=counts)
+    std = np.sqrt(np.average((bin_centers - mean)**2, weights=counts))
+    return mean, max(std, np.min(np.diff(bin_edges))/2)
+
+def _weighted_quantiles(bin_edges, counts, quantiles):
+    """
+    Calculates the quantiles of binned data, by linear interpolation of the cumulative counts.
+
+    Args:
+    bin_edges (np.ndarray): The ascending edges of the bins.
+    counts (np.ndarray): The number of data points in each bin.
+    quantiles (np.ndarray): The probabilities of the quantiles.
+
+    Returns:
+    np.ndarray: The quantiles.
+    """
+    cumulative = np.concatenate([[0], np.cumsum(counts)]) / np.sum(counts)
+    return np.interp(quantiles, cumulative, bin_edges)
+
+def _mixture_weights(logits):
+    """
+    Transforms K-1 unconstrained values to K mixing proportions (softmax with the first logit fixed to zero).
+    """
+    logits = np.concatenate([[0.0], logits])
+    weights = np.exp(logits - np.max(logits))
+    return weights / np.sum(weights)
+
+def _fit_binned(build_distribution, initial_parameters, bin_edges, counts):
+    """
+    Maximises the binned log-likelihood over the unconstrained parameters of a distribution.
+
+    Args:
+    build_distribution (callable): Builds the distribution from the unconstrained parameters.
+    initial_parameters (np.ndarray): The initial unconstrained parameters.
+    bin_edges (np.ndarray): The ascending edges of the bins.
+    counts (np.ndarray): The number of data points in each bin.
+
+    Returns:
+    tuple: The fitted distribution and its log-likelihood.
+    """
+    from scipy.optimize import minimize
+    def negative_log_likelihood(parameters):
+        log_likelihood = binned_log_likelihood(build_distribution(parameters), bin_edges, counts)
+        return -log_likelihood if np.isfinite(log_likelihood) else 1e300
+
+    # the tolerance of the log-likelihood is relative, since its scale depends on the number of data points
+    initial_value = negative_log_likelihood(initial_parameters)
+    function_tolerance = 1e-12 * max(1.0, abs(initial_value)) if initial_value < 1e300 else 1e-10
+    result = minimize(negative_log_likelihood, initial_parameters, method='Nelder-Mead',
+                      options={'maxiter': 4000*len(initial_parameters), 'xatol': 1e-8, 'fatol': function_tolerance})
+    distribution = build_distribution(result.x)
+    return distribution, -result.fun
+
+def fit_binned_Gaussian(bin_edges, counts):
+    """
+    Fits a Gaussian distribution to binned data, by maximising the binned likelihood.
+    The fitting time depends only on the number of bins and not on the number of data points.
+
+    Args:
+    bin_edges (np.ndarray): The ascending edges of the bins.
+    counts (np.ndarray): The number of data points in each bin.
+
+    Returns:
+    distributions.GaussianDistribution: The fitted distribution.
+    """
+    mean, std = _weighted_moments(bin_edges, counts)
+
+    def build_distribution(parameters):
+        return dist.GaussianDistribution(parameters[0], np.exp(parameters[1]))
+
+    fitted_distribution, _ = _fit_binned(build_distribution, np.array([mean, np.log(std)]), bin_edges, counts)
+    return fitted_distribution
+
+def fit_binned_weibull_mixture(bin_edges, counts, number_of_components = 2, initial_distribution = None):
+    """
+    Fits a mixture of Weibull distributions to binned data, by maximising the binned likelihood.
+
+    Args:
+    bin_edges (np.ndarray): The ascending edges of the bins.
+    counts (np.ndarray): The number of data points in each bin.
+    number_of_components (int): The number of Weibull components.
+    initial_distribution (distributions.WeibullMixture, optional): A previous fit, used as warm start. It is ignored
+        if its number of components is different. A warm start is refitted with L-BFGS-B and the analytic gradient
+        of the binned likelihood, instead of Nelder-Mead.
+
+    Returns:
+    distributions.MixedWeibull or distributions.WeibullMixture: The fitted distribution (MixedWeibull for two components),
+    with the components sorted by their scale parameter.
+    """
+    K = number_of_components
+    mean, std = _weighted_moments(bin_edges, counts)
+    initial_alphas = _weighted_quantiles(bin_edges, counts, (np.arange(K) + 0.5) / K)
+    initial_alphas = np.clip(initial_alphas, np.min(np.diff(bin_edges)), None)
+    # shape parameter of a Weibull distribution with the same coefficient of variation
+    initial_beta = np.clip(1.2 * mean / std, 1, 50)
+    initial_parameters = np.concatenate([np.log(initial_alphas), np.full(K, np.log(initial_beta)), np.zeros(K - 1)])
+    if initial_distribution is not None and len(initial_distribution.weights) == K:
+        weights = np.asarray(initial_distribution.weights, dtype=float)
+        initial_parameters = np.concatenate([np.log(initial_distribution.alphas), np.log(initial_distribution.betas),
+                                             np.log(weights[1:] / weights[0])])
+
+    def build_distribution(parameters):
+        return dist.WeibullMixture(np.exp(parameters[:K]), np.exp(parameters[K:2*K]), _mixture_weights(parameters[2*K:]))
+
+    if initial_distribution is not None and len(initial_distribution.weights) == K:
+        # the warm start is close to the maximum, which a quasi-Newton method with the analytic gradient reaches
+        # with far fewer likelihood evaluations than Nelder-Mead (e.g. in the bootstrap replicates)
+        from scipy.optimize import minimize
+        def negative_log_likelihood(parameters):
+            log_likelihood, gradient = _binned_weibull_mixture_log_likelihood(parameters, bin_edges, counts, K)
+            if not np.isfinite(log_likelihood):
+                return 1e300, np.zeros_like(parameters)
+            return -log_likelihood, -gradient
+
+        result = minimize(negative_log_likelihood, initial_parameters, jac=True, method='L-BFGS-B',
+                          options={'maxiter': 1000, 'ftol': 1e-12, 'gtol': 1e-6})
+        return sorted_mixture(build_distribution(result.x))
+
+    fitted_mixture, _ = _fit_binned(build_distribution, initial_parameters, bin_edges, counts)
+    return sorted_mixture(fitted_mixture)
+
+def _binned_weibull_mixture_log_likelihood(parameters, bin_edges, counts, number_of_components):
+    """
+    Calculates the binned log-likelihood of a mixture of Weibull distributions (see binned_log_likelihood) and its gradient,
+    with respect to the unconstrained parameters of fit_binned_weibull_mixture (the logarithms of the scale and shape
+    parameters and the logits of the mixing proportions).
+
+    Args:
+    parameters (np.ndarray): The unconstrained parameters.
+    bin_edges (np.ndarray): The ascending edges of the bins.
+    counts (np.ndarray): The number of data points in each bin.
+    number_of_components (int): The number of Weibull components.
+
+    Returns:
+    tuple: The log-likelihood and its gradient.
+    """
+    K = number_of_components
+    alphas = np.exp(parameters[:K])
+    betas = np.exp(parameters[K:2*K])
+    weights = _mixture_weights(parameters[2*K:])
+    counts = np.asarray(counts, dtype=float)
+
+    # cdf of each component at each bin edge, and its derivatives
+    x = np.clip(np.asarray(bin_edges, dtype=float), 0, None)[:, None] / alphas
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        z = x ** betas
+        component_survival = np.exp(-z)
+        component_cdf = -np.expm1(-z)
+        log_x = np.log(np.where(x > 0, x, 1))
+        density = betas * z * component_survival * weights
+    cdf = component_cdf @ weights
+    survival = component_survival @ weights
+    cdf_gradient = np.hstack([-density, density * log_x, weights[1:] * (component_cdf[:, 1:] - cdf[:, None])])
+
+    # the probability of each bin is conditioned on the range of the bins
+    # (in the upper tail, the difference of the survival functions does not round to zero)
+    positive = counts > 0
+    probabilities = np.where(cdf[1:] < 0.5, np.diff(cdf), -np.diff(survival))[positive]
+    total_probability = cdf[-1] - cdf[0] if cdf[-1] < 0.5 else survival[0] - survival[-1]
+    if np.any(probabilities <= 0) or total_probability <= 0 or not np.all(np.isfinite(cdf_gradient)):
+        return -np.inf, np.zeros_like(parameters)
+    positive_counts = counts[positive]
+    number_of_points = np.sum(positive_counts)
+    log_likelihood = positive_counts @ np.log(probabilities) - number_of_points * np.log(total_probability)
+    gradient = ((positive_counts / probabilities) @ np.diff(cdf_gradient, axis=0)[positive]
+                - number_of_points * (cdf_gradient[-1] - cdf_gradient[0]) / total_probability)
+    return log_likelihood, gradient
+
+def fit_binned_mixed_Gaussian_EM(bin_edges, counts, number_of_components = 2, initial_distribution = None,
+                                 max_iterations = 2000, tolerance = 1e-10):
+    """
+    Fits a mixture of Gaussian distributions to binned data, with the expectation-maximisation algorithm
+    for binned and truncated data. In each iteration, the data are assigned to the components according to
+    the probability of each bin, and the components are updated from the moments of the truncated normal 
+    distribution in each bin. The missing data outside the range of the bins are added as two extra bins,
+    so the fit maximises the same likelihood as binned_log_likelihood. All the operations are vectorized over
+    the bins and the components.
+
+    Args:
+    bin_edges (np.ndarray): The ascending edges of the bins.
+    counts (np.ndarray): The number of data points in each bin.
+    number_of_components (int): The number of Gaussian components.
+    initial_distribution (distributions.GaussianMixture, optional): A previous fit, used as warm start. It is ignored
+        if its number of components is different.
+    max_iterations (int): The maximum number of iterations.
+    tolerance (float): The relative change of the log-likelihood, under which the iterations stop.
+
+    Returns:
+    distributions.Distribution: The fitted distribution (GaussianDistribution for one component, Mixed_Gaussian for two),
+    with the components sorted by their mean.
+    """
+    K = number_of_components
+    bin_edges = np.asarray(bin_edges, dtype=float)
+    counts = np.asarray(counts, dtype=float)
+    total_counts = np.sum(counts)
+    minimum_stdev = 1e-3 * (bin_edges[-1] - bin_edges[0])
+
+    if initial_distribution is not None and len(initial_distribution.weights) == K:
+        means = np.array(initial_distribution.means, dtype=float)
+        stdevs = np.array(initial_distribution.stdevs, dtype=float)
+        weights = np.array(initial_distribution.weights, dtype=float)
+    else:
+        _, std = _weighted_moments(bin_edges, counts)
+        means = _weighted_quantiles(bin_edges, counts, (np.arange(K) + 0.5) / K)
+        stdevs = np.full(K, std / K)
+        weights = np.full(K, 1 / K)
+
+    # the two extra bins contain the (missing) data outside the range of the bins
+    augmented_edges = np.concatenate([[-np.inf], bin_edges, [np.inf]])[:, np.newaxis]
+
+    log_likelihood = -np.inf
+    for _ in range(max_iterations):
+        z = (augmented_edges - means) / stdevs
+        cdf = ndtr(z)
+        with np.errstate(invalid='ignore'):
+            z_pdf = np.where(np.isfinite(z), z * np.exp(-0.5 * z**2), 0.0) / np.sqrt(2 * np.pi)
+        pdf = np.exp(-0.5 * z**2) / np.sqrt(2 * np.pi)
+
+        component_probabilities = np.clip(np.diff(cdf, axis=0), 1e-300, None)
+        bin_probabilities = component_probabilities @ weights
+        probability_inside = np.sum(bin_probabilities[1:-1])
+
+        new_log_likelihood = np.sum(counts * np.log(bin_probabilities[1:-1] / probability_inside))
+        if abs(new_log_likelihood - log_likelihood) <= tolerance * abs(new_log_likelihood):
+            log_likelihood = new_log_likelihood
+            break
+        log_likelihood = new_log_likelihood
+
+        # E-step: expected number of data of each component in each bin
+        augmented_counts = np.concatenate([[total_counts * bin_probabilities[0] / probability_inside], counts,
+                                           [total_counts * bin_probabilities[-1] / probability_inside]])
+        component_counts = augmented_counts[:, np.newaxis] * weights * component_probabilities / bin_probabilities[:, np.newaxis]
+
+        # moments of each component, truncated in each bin
+        first_moment = -np.diff(pdf, axis=0) / component_probabilities
+        second_moment = 1 - np.diff(z_pdf, axis=0) / component_probabilities
+        bin_means = means + stdevs * first_moment
+
+        # M-step
+        component_totals = np.sum(component_counts, axis=0)
+        new_means = np.sum(component_counts * bin_means, axis=0) / component_totals
+        shift = means - new_means
+        bin_variances = stdevs**2 * second_moment + 2 * shift * stdevs * first_moment + shift**2
+        stdevs = np.maximum(np.sqrt(np.sum(component_counts * bin_variances, axis=0) / component_totals), minimum_stdev)
+        means = new_means
+        weights = component_totals / np.sum(component_totals)
+
+    if K == 1:
+        return dist.GaussianDistribution(means[0], stdevs[0])
+    return sorted_mixture(dist.GaussianMixture(means, stdevs, weights))
+
+def binned_BIC(distribution, bin_edges, counts, number_of_parameters):
+    """
+    Calculates the Bayesian information criterion of a distribution fitted to binned data.
+
+    Args:
+    distribution (distributions.Distribution): The fitted distribution.
+    bin_edges (np.ndarray): The ascending edges of the bins.
+    counts (np.ndarray): The number of data points in each bin.
+    number_of_parameters (int): The number of free parameters of the distribution.
+
+    Returns:
+    float: The BIC value (lower is better).
+    """
+    return -2 * binned_log_likelihood(distribution, bin_edges, counts) + number_of_parameters * np.log(np.sum(counts))
+
+def select_mixed_Gaussian_by_BIC(bin_edges, counts, max_components = 4, initial_distributions = None):
+    """
+    Fits Gaussian mixtures with 1 up to max_components components to binned data with the EM algorithm,
+    and selects the number of components with the lowest BIC.
+
+    Args:
+    bin_edges (np.ndarray): The ascending edges of the bins.
+    counts (np.ndarray): The number of data points in each bin.
+    max_components (int): The maximum number of components.
+    initial_distributions (dict, optional): Previous fits used as warm starts, keyed by their number of components
+        (e.g. the second value returned by a previous call).
+
+    Returns:
+    tuple: The selected distribution, a dictionary with the fitted distribution for each number of components,
+    and a dictionary with the BIC value for each number of components.
+    """
+    initial_distributions = initial_distributions or {}
+    fitted_distributions = {}
+    BIC_values = {}
+    for K in range(1, max_components + 1):
+        fitted_distributions[K] = fit_binned_mixed_Gaussian_EM(bin_edges, counts, K, initial_distributions.get(K))
+        BIC_values[K] = binned_BIC(fitted_distributions[K], bin_edges, counts, 3*K - 1)
+
+    best_number_of_components = min(BIC_values, key=BIC_values.get)
+    return fitted_distributions[best_number_of_components], fitted_distributions, BIC_values
+
+def sorted_mixture(mixture):
+    """
+    Sorts the components of a fitted mixture by their location (mean or scale parameter), so that 
+    fits of similar data always report the components in the same order. Two-component mixtures are 
+    returned as Mixed_Gaussian or MixedWeibull objects.
+
+    Args:
+    mixture (distributions.GaussianMixture or distributions.WeibullMixture): The fitted mixture.
+
+    Returns:
+    distributions.MixtureDistribution: The mixture with its components sorted.
+    """
+    if isinstance(mixture, dist.GaussianMixture):
+        order = np.argsort(mixture.means)
+        means, stdevs, weights = mixture.means[order], mixture.stdevs[order], mixture.weights[order]
+        if len(order) == 2:
+            return dist.Mixed_Gaussian(means[0], stdevs[0], means[1], stdevs[1], weights[0])
+        return dist.GaussianMixture(means, stdevs, weights)
+
+    order = np.argsort(mixture.alphas)
+    alphas, betas, weights = mixture.alphas[order], mixture.betas[order], mixture.weights[order]
+    if len(order) == 2:
+        return dist.MixedWeibull(alphas[0], betas[0], alphas[1], betas[1], weights[0])
+    return dist.WeibullMixture(alphas, betas, weights)
+
+def calculate_binned_size_distribution_params(bin_edges, counts, distribution):
+    """Fits a distribution directly to the counts of each bin, without expanding them to data points.
+
+    Args:
+        bin_edges (numpy.ndarray): An array of the ascending bin edges.
+        counts (numpy.ndarray): An array of the number of data points in each bin.
+        distribution(string): The distribution to be fitted. Options are "Gaussian", "Mixed Weibull" and "Mixed Gaussian"
+
+    Returns:
+        distributions.Distribution: The fitted distribution.
+    """
+    bin_edges = np.asarray(bin_edges, dtype=float)
+    counts = np.asarray(counts, dtype=float)
+
+    if distribution == "Gaussian":
+        return fit_binned_Gaussian(bin_edges, counts)
+    elif distribution == "Mixed Weibull":
+        return fit_binned_weibull_mixture(bin_edges, counts)
+    elif distribution == "Mixed Gaussian":
+        return fit_binned_mixed_Gaussian_EM(bin_edges, counts)
+    else:
+        raise ValueError('Please choose a valid distribution: "Gaussian", "Mixed Weibull" or "Mixed Gaussian".')
+
 def calculate_size_distribution_params(bin_edges,frequency,distribution):
     """Calculate Gaussian parameters for given bin values and frequency.
 
@@ -135,12 +512,18 @@ def calculate_size_distribution_params(bin_edges,frequency,distribution):
 
     return results, all_data
 
-def fit_sieve_distribution(sieve_analysis_data,shot_material_density,fitting_distribution):
+@instrumentation.staged("fitting")
+def fit_sieve_distribution(sieve_analysis_data,shot_material_density,fitting_distribution,fitting_approach="samples"):
     """
     Fits either a normal distribution or a Weibull distribution to the given sieve data.
     
     Args:
     sieve_data (np.ndarray): The data obtained from sieve analysis.
+    shot_material_density (float): The density of the shots' material.
+    fitting_distribution (str): "Gaussian", "Mixed Weibull" or "Mixed Gaussian".
+    fitting_approach (str): "samples" expands the number of shots per sieve into data points and fits them.
+        "binned" maximises the binned likelihood of the number of shots per sieve directly, so the fitting
+        time does not depend on the number of shots.
 
     Returns:
     tuple: A tuple containing the parameters of the fitted distribution. If a normal distribution is fitted, the tuple
@@ -154,8 +537,11 @@ def fit_sieve_distribution(sieve_analysis_data,shot_material_density,fitting_dis
 
     number_of_shots = st.calculate_number_of_shots(bin_centers, weight_per_sieve,shot_material_density)
 
+    if fitting_approach == "binned":
+        fitted_distribution = calculate_binned_size_distribution_params(bin_edges, number_of_shots, fitting_distribution)
+
     # Fit a Gaussian distribution
-    if fitting_distribution == "Gaussian":
+    elif fitting_distribution == "Gaussian":
         
         fitted_gaussian, data = calculate_size_distribution_params(bin_edges,number_of_shots,fitting_distribution)            
         fitted_distribution = dist.GaussianDistribution(fitted_gaussian.mu, fitted_gaussian.sigma)
@@ -172,4 +558,107 @@ def fit_sieve_distribution(sieve_analysis_data,shot_material_density,fitting_dis
 
     print("Size distribution for sieve analysis data: " + fitting_distribution, sep='\n')
     print(fitted_distribution.__dict__)
-    return fitted_distribution
\ No newline at end of file
+    return fitted_distribution
+
+def number_of_parameters(distribution):
+    """
+    Counts the free parameters of a distribution. The mixing proportions of a mixture sum to one,
+    so they have one free parameter less than the components.
+
+    Args:
+    distribution (distributions.Distribution): The distribution.
+
+    Returns:
+    int: The number of free parameters.
+    """
+    parameters = distribution.parameters()
+    total = sum(np.size(value) for value in parameters.values())
+    if 'weights' in parameters:
+        total -= 1
+    return int(total)
+
+def cumulative_mass_distance(distribution, bin_edges, weight_per_sieve):
+    """
+    Calculates the maximum distance between the cumulative retained mass predicted by a distribution
+    and the measured one. The predicted mass of each sieve is the predicted number of shots times the 
+    mass of a shot with the diameter of the bin center.
+
+    Args:
+    distribution (distributions.Distribution): The fitted distribution of the diameters.
+    bin_edges (np.ndarray): The ascending sieve levels.
+    weight_per_sieve (np.ndarray): The measured retained weight of each sieve, sorted as the sieve levels.
+
+    Returns:
+    float: The maximum distance of the normalized (%) cumulative retained masses.
+    """
+    bin_centers = st.calculate_bin_centers(bin_edges)
+    predicted_mass = np.diff(distribution.cdf(bin_edges)) * bin_centers**3
+    predicted_cumulative = st.calculate_cumulative_frequencies(st.normalize_frequency(predicted_mass))
+    measured_cumulative = st.calculate_cumulative_frequencies(st.normalize_frequency(weight_per_sieve[:-1]))
+    return float(np.max(np.abs(predicted_cumulative - measured_cumulative)))
+
+def _fit_family(arguments):
+    """
+    Fits a single distribution family, in a worker process of fit_best_sieve_distribution.
+    """
+    sieve_analysis_data, shot_material_density, fitting_distribution, fitting_approach = arguments
+    try:
+        return fit_sieve_distribution(sieve_analysis_data, shot_material_density, fitting_distribution, fitting_approach)
+    except Exception as error:
+        return error
+
+@instrumentation.staged("model selection") # the fit of every family is a nested "fitting" stage
+def fit_best_sieve_distribution(sieve_analysis_data, shot_material_density, fitting_distributions = ("Gaussian", "Mixed Weibull", "Mixed Gaussian"),
+                                fitting_approach = "binned", criterion = "BIC", max_workers = None):
+    """
+    Fits all the given distribution families to the sieve data concurrently, in a process pool, and 
+    ranks them by their information criteria and by the fit of the cumulative retained mass.
+
+    Args:
+    sieve_analysis_data (list): The sieve levels and the retained weight per sieve.
+    shot_material_density (float): The density of the shots' material.
+    fitting_distributions (tuple): The families to be fitted ("Gaussian", "Mixed Weibull", "Mixed Gaussian").
+    fitting_approach (str): "binned" or "samples" (see fit_sieve_distribution).
+    criterion (str): The ranking criterion, "BIC", "AIC" or "mass" (the cumulative retained mass distance).
+    max_workers (int, optional): The number of worker processes. If it is 1, the families are fitted sequentially.
+
+    Returns:
+    tuple: The best distribution, ready for sampling, and the ranking as a list of dictionaries, with the
+    family, the distribution, the log-likelihood, AIC, BIC and cumulative mass distance of each fit (best first).
+    """
+    sieve_levels = sieve_analysis_data[0]
+    retained_weight = sieve_analysis_data[1]
+
+    bin_edges, weight_per_sieve = st.sort_data(sieve_levels, retained_weight)
+    bin_centers = st.calculate_bin_centers(bin_edges)
+    number_of_shots = st.calculate_number_of_shots(bin_centers, weight_per_sieve, shot_material_density)
+
+    tasks = [(sieve_analysis_data, shot_material_density, family, fitting_approach) for family in fitting_distributions]
+    if max_workers == 1:
+        fitted_distributions = [_fit_family(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            fitted_distributions = list(executor.map(_fit_family, tasks))
+
+    ranking = []
+    for family, fitted_distribution in zip(fitting_distributions, fitted_distributions):
+        if isinstance(fitted_distribution, Exception):
+            print("Fitting of %s distribution failed: %s" %(family, fitted_distribution))
+            continue
+
+        log_likelihood = binned_log_likelihood(fitted_distribution, bin_edges, number_of_shots)
+        k = number_of_parameters(fitted_distribution)
+        ranking.append({'family': family,
+                        'distribution': fitted_distribution,
+                        'log-likelihood': log_likelihood,
+                        'AIC': 2*k - 2*log_likelihood,
+                        'BIC': k*np.log(np.sum(number_of_shots)) - 2*log_likelihood,
+                        'mass': cumulative_mass_distance(fitted_distribution, bin_edges, weight_per_sieve)})
+
+    if not ranking:
+        raise RuntimeError("None of the distributions could be fitted to the sieve data.")
+
+    ranking.sort(key=lambda fit: fit[criterion])
+    print("Best size distribution for sieve analysis data (%s): %s" %(criterion, ranking[0]['family']))
+
+    return ranking[0]['distribution'], ranking
@@ -0,0 +1,20 @@
+import contextlib
+
+# the run reports of run_tools are optional: without run_tools, the functions below do nothing
+try:
+    from run_tools.instrumentation import stage, count, observe, record, staged
+except ImportError:
+    def stage(name):
+        return contextlib.nullcontext()
+
+    def count(name, value = 1):
+        pass
+
+    def observe(name, value):
+        pass
+
+    def record(name, value):
+        pass
+
+    def staged(name):
+        return lambda function: function
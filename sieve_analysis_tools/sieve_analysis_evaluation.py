@@ -1,6 +1,4 @@
-from reliability.Other_functions import histogram
 import numpy as np
-import matplotlib.pyplot as plt
 import sieve_analysis_tools.statistical_tools as st
 #import statistical_tools as st
 
@@ -24,6 +22,7 @@ def sieve_analysis(generated_spheres, measured_weight, inverse_sieve_sizes, rho)
     -------
     Nothing
     """
+    import matplotlib.pyplot as plt
 
     # Reverse the inverse sieve sizes
     inverse_sieve_sizes = np.array(inverse_sieve_sizes)[::-1]
@@ -67,3 +66,71 @@ def sieve_analysis(generated_spheres, measured_weight, inverse_sieve_sizes, rho)
     plt.ylabel('Weight (%)')
     plt.grid()
     
+
+def evaluate_sieve_match(generated_diameters, measured_weight, sieve_levels):
+    """
+    Evaluates how well generated shots match measured sieve analysis data, without plotting. The generated
+    shots are retained on the largest sieve level that is smaller than their diameter, and their retained
+    mass is proportional to their volume. Many realizations (e.g. candidate batches of shots) are evaluated
+    together, in a single vectorized pass.
+
+    Parameters:
+    ----------
+    generated_diameters : array-like
+        The diameters of the generated shots in millimeters. A 2D array evaluates one realization per row;
+        rows with fewer shots are padded with NaN.
+    measured_weight : list
+        List of measured weights on each sieve.
+    sieve_levels : list
+        List of sieve sizes in millimeters, in the same order as measured_weight.
+
+    Returns:
+    -------
+    dict
+        'sieve_levels' : the ascending sieve levels,
+        'generated_fractions', 'measured_fractions' : the retained mass fractions of each sieve (summing to 1),
+        'generated_cumulative', 'measured_cumulative' : the cumulative mass fractions, from the smallest sieve,
+        'KS' : the maximum absolute difference of the cumulative mass fractions,
+        'L1' : the sum of absolute differences of the cumulative mass fractions.
+        For a 2D input, the generated values and the metrics have one row (value) per realization.
+    """
+    sieve_levels = np.asarray(sieve_levels, dtype=float)
+    order = np.argsort(sieve_levels)
+    sieve_levels = sieve_levels[order]
+    measured_fractions = np.asarray(measured_weight, dtype=float)[order]
+    measured_fractions = measured_fractions / np.sum(measured_fractions)
+
+    diameters = np.asarray(generated_diameters, dtype=float)
+    single_realization = diameters.ndim == 1
+    diameters = np.atleast_2d(diameters)
+    number_of_realizations, number_of_sieves = diameters.shape[0], len(sieve_levels)
+
+    # the index of the retaining sieve, -1 for shots passing all the sieves
+    sieves = np.searchsorted(sieve_levels, diameters, side='right') - 1
+    retained = np.isfinite(diameters) & (sieves >= 0)
+    bins = (np.arange(number_of_realizations)[:, None] * number_of_sieves + sieves)[retained]
+    retained_mass = np.bincount(bins, weights=diameters[retained] ** 3, minlength=number_of_realizations * number_of_sieves)
+    retained_mass = retained_mass.reshape(number_of_realizations, number_of_sieves)
+
+    total_mass = np.sum(retained_mass, axis=1, keepdims=True)
+    generated_fractions = np.divide(retained_mass, total_mass, out=np.zeros_like(retained_mass), where=total_mass > 0)
+
+    generated_cumulative = np.cumsum(generated_fractions, axis=1)
+    measured_cumulative = np.cumsum(measured_fractions)
+    differences = np.abs(generated_cumulative - measured_cumulative)
+
+    evaluation = {'sieve_levels': sieve_levels,
+                  'generated_fractions': generated_fractions,
+                  'measured_fractions': measured_fractions,
+                  'generated_cumulative': generated_cumulative,
+                  'measured_cumulative': measured_cumulative,
+                  'KS': np.max(differences, axis=1),
+                  'L1': np.sum(differences, axis=1)}
+
+    if single_realization:
+        for key in ('generated_fractions', 'generated_cumulative'):
+            evaluation[key] = evaluation[key][0]
+        evaluation['KS'] = float(evaluation['KS'][0])
+        evaluation['L1'] = float(evaluation['L1'][0])
+
+    return evaluation
@@ -1,10 +1,6 @@
-from reliability.Fitters import Fit_Weibull_Mixture, Fit_Everything, Fit_Normal_2P
-from reliability.Other_functions import histogram
 import numpy as np
-import matplotlib.pyplot as plt
 import math
-
-#import distributions as dist
+import sieve_analysis_tools.distributions as dist
 
 def sort_data(bin_values, frequency):
     """
@@ -69,6 +65,25 @@ def calculate_number_of_shots(bin_centers,mass,density_of_shots):
     average_mass_per_shot = (4/3)*math.pi*((bin_centers/2)**3)*density_of_shots
     return np.around(mass[:-1]/average_mass_per_shot,decimals=0)
 
+def empirical_sieve_distribution(sieve_analysis_data, density_of_shots, interpolate=True):
+    """
+    Creates the empirical distribution of the shots' diameters from sieve analysis data, without fitting
+    a parametric distribution. The retained weight per sieve is converted to number of shots per sieve.
+
+    Args:
+    sieve_analysis_data (list): The sieve levels and the retained weight per sieve.
+    density_of_shots (float): The density of shots.
+    interpolate (bool): If True, the diameters are uniformly distributed inside each sieve. Otherwise,
+        they are equal to the center of the sieve.
+
+    Returns:
+    distributions.EmpiricalSieveDistribution: The empirical distribution of the diameters.
+    """
+    bin_edges, weight_per_sieve = sort_data(sieve_analysis_data[0], sieve_analysis_data[1])
+    bin_centers = calculate_bin_centers(bin_edges)
+    number_of_shots = calculate_number_of_shots(bin_centers, weight_per_sieve, density_of_shots)
+    return dist.EmpiricalSieveDistribution(bin_edges, number_of_shots, interpolate)
+
 def normalize_frequency(frequency):
     """
     Normalizes the frequency by dividing each frequency value by the total sum of frequencies and multiplying by 100.
@@ -91,6 +106,7 @@ def fit_weibull_mixture(failures):
     Returns:
     Fit_Weibull_Mixture: The results of the Weibull mixture fit.
     """
+    from reliability.Fitters import Fit_Weibull_Mixture
     results = Fit_Weibull_Mixture(failures=failures,show_probability_plot=False,print_results=False)
     return results
 
@@ -104,6 +120,7 @@ def fit_Gaussian(failures):
     Returns:
     Fit_Normal_2P: The results of the Weibull mixture fit.
     """
+    from reliability.Fitters import Fit_Normal_2P
     results = Fit_Normal_2P(failures=failures,show_probability_plot=False,print_results=False)
     return results  
 
@@ -120,6 +137,8 @@ def visualize_histogram(generated_data,bin_edges,data, results):
     Returns:
         None
     """
+    import matplotlib.pyplot as plt
+    from reliability.Other_functions import histogram
     plt.figure(figsize=(9, 5))
     plt.subplot(121)
     histogram(data,bins = bin_edges)
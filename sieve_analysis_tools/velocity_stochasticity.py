@@ -1,6 +1,5 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.stats import truncnorm
+from scipy.special import ndtr, ndtri
 import sieve_analysis_tools.distributions as dist
 import random
 
@@ -34,6 +33,76 @@ def normally_distributed_velocity(nominal_velocity, standard_deviation, lower_cu
 
     return velocity
 
+def truncated_normal_samples(mean, std, lower_cutoff = -np.inf, upper_cutoff = np.inf, size = 1, rng = None):
+    """
+    Draws samples from a truncated normal distribution using inverse-CDF sampling. A uniform number is drawn
+    between the CDF values of the cutoffs and mapped back through the inverse normal CDF, so no sample is rejected.
+
+    Parameters:
+    -----------
+    mean: float
+        The mean of the (untruncated) normal distribution.
+    std: float
+        The standard deviation of the (untruncated) normal distribution.
+    lower_cutoff: float (optional)
+        The lower limit of the samples. Default value = -inf
+    upper_cutoff: float (optional)
+        The upper limit of the samples. Default value = inf
+    size: int or tuple (optional)
+        The number (or shape) of samples to draw. Default value = 1
+    rng: numpy.random.Generator, int or None (optional)
+        The random generator (or the seed of a new one) used for sampling.
+
+    Returns:
+    --------
+    numpy.ndarray
+        The truncated normal samples.
+    """
+    rng = np.random.default_rng(rng)
+
+    a = (lower_cutoff - mean) / std
+    b = (upper_cutoff - mean) / std
+
+    # Sample the tail that lies above the mean through the mirrored distribution,
+    # so that the CDF values do not saturate to 1 and lose their precision
+    mirrored = a > 0
+    if mirrored:
+        a, b = -b, -a
+
+    u = rng.uniform(ndtr(a), ndtr(b), size)
+    z = np.clip(ndtri(u), a, b)
+    if mirrored:
+        z = -z
+
+    return mean + std * z
+
+def normally_distributed_velocities(nominal_velocity, standard_deviation, lower_cutoff = 0, upper_cutoff = np.inf, size = 1, rng = None):
+    """
+    Vectorized version of `normally_distributed_velocity`. Generates an array of normally distributed velocities,
+    subject to the specified lower and upper limits, without a rejection loop.
+
+    Parameters:
+    -----------
+    nominal_velocity: float
+        The nominal velocity of the shot or shot stream. This is the mean value of the generated velocities.
+    standard_deviation: float
+        The standard deviation of the generated velocities.
+    lower_cutoff: float (optional)
+        The lower limit for the generated velocities. Default value = 0
+    upper_cutoff: float (optional)
+        The upper limit for the generated velocities. Default value = inf.
+    size: int (optional)
+        The number of velocities to generate, e.g. one per shot. Default value = 1
+    rng: numpy.random.Generator, int or None (optional)
+        The random generator (or the seed of a new one) used for sampling.
+
+    Returns:
+    --------
+    numpy.ndarray
+        An array of velocities following the truncated normal distribution.
+    """
+    return truncated_normal_samples(nominal_velocity, standard_deviation, lower_cutoff, upper_cutoff, size, rng)
+
 def mixed_random_velocities_generator(mean, std, lower_cutoff, upper_cutoff, lower_range, upper_range, gaussian_weight = 0.5):
     '''
     Generates a random number from a mixture of a truncated Gaussian distribution and a uniform distribution with the given mean, standard deviation, range, and cutoff limits. The `gaussian_weight` parameter determines the weight of the Gaussian distribution in the mixture.
@@ -50,6 +119,7 @@ def mixed_random_velocities_generator(mean, std, lower_cutoff, upper_cutoff, low
     Returns:
         A random number from the mixed distribution.
     '''
+    from scipy.stats import truncnorm
 
     # Generate a random number from the truncated Gaussian distribution
     a = (lower_cutoff - mean) / std
@@ -64,6 +134,37 @@ def mixed_random_velocities_generator(mean, std, lower_cutoff, upper_cutoff, low
     #mixed_num = gaussian_weight*gaussian_num + (1-gaussian_weight)*uniform_num
     return random_num
 
+def mixed_random_velocities_array_generator(mean, std, lower_cutoff, upper_cutoff, lower_range, upper_range, gaussian_weight = 0.5, size = 1, rng = None):
+    '''
+    Vectorized version of `mixed_random_velocities_generator`. Generates an array of random numbers from the mixture
+    of a truncated Gaussian distribution and a uniform distribution. The mixture component of every number is selected
+    with a single vectorized draw, and only the numbers of each component are sampled from it.
+
+    Parameters:
+        - mean: Mean of the truncated Gaussian distribution
+        - std: Standard deviation of the truncated Gaussian distribution
+        - lower_cutoff: Lower cutoff limit for the truncated Gaussian distribution
+        - upper_cutoff: Upper cutoff limit for the truncated Gaussian distribution
+        - lower_range: Lower limit for the uniform distribution
+        - upper_range: Upper limit for the uniform distribution
+        - gaussian_weight: Weight of the Gaussian distribution in the mixture (default: 0.5)
+        - size: Number of random numbers to generate (default: 1)
+        - rng: numpy.random.Generator, seed or None, used for sampling (default: None)
+
+    Returns:
+        A numpy array of random numbers from the mixed distribution.
+    '''
+    rng = np.random.default_rng(rng)
+
+    is_gaussian = rng.random(size) < gaussian_weight
+    number_of_gaussian = int(np.count_nonzero(is_gaussian))
+
+    random_nums = np.empty(np.shape(is_gaussian))
+    random_nums[is_gaussian] = truncated_normal_samples(mean, std, lower_cutoff, upper_cutoff, number_of_gaussian, rng)
+    random_nums[~is_gaussian] = rng.uniform(lower_range, upper_range, random_nums.size - number_of_gaussian)
+
+    return random_nums
+
 
 def mixed_random_velocities(nominal_velocity, retained_initial_velocity, 
                             reduced_velocity, std_reduced, reduced_value_range, percentage_of_retained_velocity):
@@ -101,15 +202,49 @@ def mixed_random_velocities(nominal_velocity, retained_initial_velocity,
     
     return velocity*nominal_velocity
 
+def mixed_random_velocities_array(nominal_velocity, retained_initial_velocity, 
+                                  reduced_velocity, std_reduced, reduced_value_range, percentage_of_retained_velocity,
+                                  size = 1, rng = None):
+    '''
+    Vectorized version of `mixed_random_velocities`. Generates an array of random velocity values, e.g. one per shot,
+    using `mixed_random_velocities_array_generator`.
+
+    Parameters:
+        - nominal_velocity: Nominal velocity for the impact event
+        - retained_initial_velocity: Percentage range of the nominal velocity for the shots that retain their velocity
+        - reduced_velocity: Mean of the reduced velocity
+        - std_reduced: Standard deviation of the reduced velocity
+        - reduced_value_range: Range of values for the reduced velocity
+        - percentage_of_retained_velocity: Percentage of the shots that follow the reduced velocity distribution
+        - size: Number of velocities to generate (default: 1)
+        - rng: numpy.random.Generator, seed or None, used for sampling (default: None)
+
+    Returns:
+        A numpy array of random velocity values for the impact event.
+    '''
+
+    lower_bound_percentage_of_retainement = (100 - retained_initial_velocity)/100
+    upper_bound_percentage_of_retainement = 1
+
+    mean_reduced_normalized = reduced_velocity/nominal_velocity
+    std_reduced_normalized = std_reduced/nominal_velocity
+
+    lower_value_cutoff = reduced_value_range[0]/nominal_velocity
+    upper_value_cutoff = reduced_value_range[1]/nominal_velocity
+
+    velocities = mixed_random_velocities_array_generator(mean_reduced_normalized, std_reduced_normalized, 
+                            lower_value_cutoff, upper_value_cutoff, 
+                            lower_bound_percentage_of_retainement, upper_bound_percentage_of_retainement, 
+                            percentage_of_retained_velocity/100, size, rng)
+    
+    return velocities*nominal_velocity
 
 
 def test():
     velocity_params = (70, 10, 70*0.65, 70*0.2, [0.2,1], 0.5)
     number = 20000
     
-    vels = []
-    for i in range(number):
-        vels.append(mixed_random_velocities(*velocity_params))
+    vels = mixed_random_velocities_array(*velocity_params, size = number)
 
     visualize_velocity_distribution(vels)
 
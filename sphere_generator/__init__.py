@@ -2,4 +2,5 @@ from .shape import *
 from .box import *
 from .sphere import *
 from .shot_stream_generator import *
-from .utilities import *
\ No newline at end of file
+from .utilities import *
+from .rendering import *
\ No newline at end of file
@@ -0,0 +1,119 @@
+import numpy as np
+
+# the golden ratio, for the vertices of the icosahedron
+_PHI = (1 + 5 ** 0.5) / 2
+
+_unit_sphere_cache = {}
+
+def unit_sphere_mesh(level : int = 1):
+    """Creates a low-poly sphere with unit radius (an icosphere), by subdividing
+       the faces of an icosahedron and projecting the new vertices on the sphere.
+
+    Args:
+        level (int): The number of subdivisions. Level 0 has 20 triangles, and every level multiplies them by 4.
+
+    Returns:
+        numpy.ndarray: The vertices of the sphere (they are also the vertex normals)
+        numpy.ndarray: The triangles, as indices of the vertices
+    """
+    if level in _unit_sphere_cache:
+        return _unit_sphere_cache[level]
+
+    vertices = [(-1, _PHI, 0), (1, _PHI, 0), (-1, -_PHI, 0), (1, -_PHI, 0),
+                (0, -1, _PHI), (0, 1, _PHI), (0, -1, -_PHI), (0, 1, -_PHI),
+                (_PHI, 0, -1), (_PHI, 0, 1), (-_PHI, 0, -1), (-_PHI, 0, 1)]
+    vertices = [np.array(vertex) / np.linalg.norm(vertex) for vertex in vertices]
+    triangles = [(0, 11, 5), (0, 5, 1), (0, 1, 7), (0, 7, 10), (0, 10, 11),
+                 (1, 5, 9), (5, 11, 4), (11, 10, 2), (10, 7, 6), (7, 1, 8),
+                 (3, 9, 4), (3, 4, 2), (3, 2, 6), (3, 6, 8), (3, 8, 9),
+                 (4, 9, 5), (2, 4, 11), (6, 2, 10), (8, 6, 7), (9, 8, 1)]
+
+    for _ in range(level):
+        midpoints = {}
+        def midpoint(i, j):
+            key = (min(i, j), max(i, j))
+            if key not in midpoints:
+                vertex = vertices[i] + vertices[j]
+                vertices.append(vertex / np.linalg.norm(vertex))
+                midpoints[key] = len(vertices) - 1
+            return midpoints[key]
+
+        subdivided = []
+        for a, b, c in triangles:
+            ab, bc, ca = midpoint(a, b), midpoint(b, c), midpoint(c, a)
+            subdivided.extend([(a, ab, ca), (b, bc, ab), (c, ca, bc), (ab, bc, ca)])
+        triangles = subdivided
+
+    _unit_sphere_cache[level] = (np.array(vertices, dtype=np.float32), np.array(triangles, dtype=np.int32))
+    return _unit_sphere_cache[level]
+
+def detail_levels(radii, max_level : int = 2):
+    """Chooses the level of detail of every sphere by its radius: the largest spheres get the maximum level,
+       and every halving of the radius removes one subdivision (down to the icosahedron).
+
+    Args:
+        radii (numpy.ndarray): The radii of the spheres
+        max_level (int): The level of detail of the largest spheres
+
+    Returns:
+        numpy.ndarray: The level of detail of every sphere
+    """
+    radii = np.asarray(radii, dtype=float)
+    if radii.size == 0:
+        return np.zeros(0, dtype=int)
+    relative_radii = np.maximum(radii / np.max(radii), 1e-12)
+    return np.clip(max_level + np.floor(np.log2(relative_radii)).astype(int), 0, max_level)
+
+def merged_sphere_mesh(centers, radii, max_level : int = 2, max_triangles : int = None):
+    """Instances low-poly unit spheres into a single merged mesh, with a level of detail by radius.
+       The vertices of all the spheres are created at once by broadcasting, without a mesh object per sphere.
+
+    Args:
+        centers (numpy.ndarray): The centers of the spheres (N x 3)
+        radii (numpy.ndarray): The radii of the spheres
+        max_level (int): The level of detail of the largest spheres (see detail_levels)
+        max_triangles (int, optional): The triangle budget of the mesh. The maximum level is reduced until the mesh fits in it.
+
+    Returns:
+        numpy.ndarray: The vertices of the merged mesh
+        numpy.ndarray: The vertex normals of the merged mesh
+        numpy.ndarray: The triangles of the merged mesh
+    """
+    centers = np.asarray(centers, dtype=np.float32).reshape(-1, 3)
+    radii = np.asarray(radii, dtype=np.float32)
+
+    levels = detail_levels(radii, max_level)
+    while max_triangles is not None and max_level > 0 and np.sum(20 * 4 ** levels) > max_triangles:
+        max_level -= 1
+        levels = detail_levels(radii, max_level)
+
+    vertices = []
+    normals = []
+    triangles = []
+    vertex_offset = 0
+    for level in np.unique(levels):
+        indices = np.flatnonzero(levels == level)
+        unit_vertices, unit_triangles = unit_sphere_mesh(int(level))
+        vertices.append((centers[indices, None, :] + radii[indices, None, None] * unit_vertices[None]).reshape(-1, 3))
+        normals.append(np.broadcast_to(unit_vertices, (len(indices),) + unit_vertices.shape).reshape(-1, 3))
+        offsets = vertex_offset + len(unit_vertices) * np.arange(len(indices), dtype=np.int32)
+        triangles.append((unit_triangles[None] + offsets[:, None, None]).reshape(-1, 3))
+        vertex_offset += len(indices) * len(unit_vertices)
+
+    if not vertices:
+        return np.zeros((0, 3), dtype=np.float32), np.zeros((0, 3), dtype=np.float32), np.zeros((0, 3), dtype=np.int32)
+    return np.vstack(vertices), np.vstack(normals), np.vstack(triangles)
+
+def spheres_arrays(spheres):
+    """Collects the centers and the radii of a list of spheres in arrays.
+
+    Args:
+        spheres (list): The sphere_3D (or sphere_2D) objects
+
+    Returns:
+        numpy.ndarray: The centers of the spheres (N x 3)
+        numpy.ndarray: The radii of the spheres
+    """
+    centers = np.array([(s.x, s.y, getattr(s, "z", 0.0)) for s in spheres], dtype=float).reshape(-1, 3)
+    radii = np.array([s.r for s in spheres], dtype=float)
+    return centers, radii
@@ -2,28 +2,19 @@ from genericpath import exists
 from logging import raiseExceptions
 from numpy import cumsum
 from .sphere import sphere_2D,sphere_3D
-import random
 import math
-from matplotlib import pyplot as plt
 import numpy as np
-from sieve_analysis_tools import statistical_tools as st
-import sieve_analysis_tools.distributions as dist
-import sieve_analysis_tools.statistical_tools as st
-from .utilities import impigment_diameter_calculation,covered_area
-import open3d as o3d
+from .utilities import impigment_diameter_calculation,covered_area,plot_coverage_map
+from .rendering import merged_sphere_mesh, spheres_arrays
+import sphere_generator.instrumentation as instrumentation
 
 class Spheres3dDrawer:
-    _SingletonInstance = None
-        
+    """Draws large shot streams interactively with open3d. The spheres are instanced from
+       low-poly unit spheres into a single merged mesh (with a level of detail by radius),
+       or, for very large streams, drawn as a point cloud of their centers.
+    """
     def __init__(self, spheres):
-        self._spheres = spheres
-    
-    #make this class a Singleton class, only one instance can exist at anytime
-    def __new__(cls, spheres):
-        if cls._SingletonInstance is None:
-            cls._SingletonInstance = super(Spheres3dDrawer, cls).__new__(cls, spheres)
-            cls._SingletonInstance._spheres = spheres
-        return cls._SingletonInstance
+        self.spheres = spheres
     
     @property
     def spheres(self):
@@ -38,28 +29,48 @@ class Spheres3dDrawer:
         self._spheres = spheres
 
     # draw spheres, default color is blue
-    def draw(self, color=(0, 0, 255)):
+    def draw(self, color=(0, 0, 255), mode="auto", max_level=2, max_triangles=4000000):
+        """Draws the spheres in an interactive open3d window.
+
+        Args:
+            color (tuple): The RGB color of the spheres (0 - 255)
+            mode (str): "mesh" (merged low-poly spheres), "points" (point cloud of the centers)
+                or "auto" (mesh, unless the spheres do not fit in the triangle budget even as icosahedrons)
+            max_level (int): The level of detail (subdivisions of an icosahedron) of the largest spheres
+            max_triangles (int): The triangle budget of the merged mesh
+        """
+        import open3d as o3d
         if not isinstance(color, tuple) or len(color) != 3:
             print("Color must be a tuple or list of three values (R, G, B), color is set to blue by default.")
             color = (0, 0, 255) # default blue color
+        if mode not in ("auto", "mesh", "points"):
+            print('Please choose a valid draw mode: "auto", "mesh" or "points", mode is set to "auto".')
+            mode = "auto"
+
+        centers, radii = spheres_arrays(self.spheres)
+        if mode == "auto":
+            mode = "mesh" if 20*len(radii) <= max_triangles else "points"
+
+        if mode == "mesh":
+            vertices, normals, triangles = merged_sphere_mesh(centers, radii, max_level, max_triangles)
+            geometry = o3d.geometry.TriangleMesh(o3d.utility.Vector3dVector(vertices.astype(np.float64)),
+                                                 o3d.utility.Vector3iVector(triangles))
+            geometry.vertex_normals = o3d.utility.Vector3dVector(normals.astype(np.float64))
+        else:
+            geometry = o3d.geometry.PointCloud(o3d.utility.Vector3dVector(centers))
 
-        # Create an array of Open3D geometries for each sphere
-        geometries = np.zeros((len(self.spheres),), dtype=o3d.geometry.TriangleMesh)
-        for i, sphere in enumerate(self.spheres):
-            mesh_sphere = o3d.geometry.TriangleMesh.create_sphere(radius=sphere.r)
-            
-            mesh_sphere.translate((sphere.x, sphere.y, sphere.z)) # translate the sphere to its position
-
-            mesh_sphere.compute_vertex_normals()
-            
-            mesh_sphere.paint_uniform_color(color) # Red color
-            
-            mesh_sphere.paint_uniform_color((color[0]/255, color[1]/255, color[2]/255)) # Normalize color values to [0, 1]
-
-            geometries[i] = mesh_sphere
+        geometry.paint_uniform_color((color[0]/255, color[1]/255, color[2]/255)) # Normalize color values to [0, 1]
 
         #draw spheres
-        o3d.visualization.draw_geometries(geometries, window_name="3D spheres distribution", width=800, height=600, left=50, top=50, mesh_show_back_face=True)
+        visualizer = o3d.visualization.Visualizer()
+        visualizer.create_window(window_name="3D spheres distribution", width=800, height=600, left=50, top=50)
+        visualizer.add_geometry(geometry)
+        render_option = visualizer.get_render_option()
+        render_option.mesh_show_back_face = True
+        if mode == "points":
+            render_option.point_size = 2.0
+        visualizer.run()
+        visualizer.destroy_window()
 
 class shot_stream:
     """A class that describes the shot stream
@@ -72,6 +83,16 @@ class shot_stream:
        box_offset_dists (tupple) : The distances for the stream to be offseted in space
        mean_radius (float) : The average radius of the shots
        radius_standard_deviation (float) : The standard deviation of the diameter
+       diameter_distribution (Distribution) : The distribution of the shots' diameters (e.g. fitted from sieve analysis data).
+                                              If it is given, it replaces mean_radius and radius_standard_deviation.
+       diameter_bounds (tuple) : The truncation bounds of the diameters sampled from diameter_distribution. An upper bound
+                                 of None is replaced by the smallest dimension of the box
+       random_generator (numpy.random.Generator) : The random generator used to sample the positions and the sizes of the shots
+       diameter_sampling (str) : "random" to sample the diameters independently, "stratified" to allocate a fixed number of shots
+                                 per size class in proportion to the class probabilities, or "stratified-mass" to match the mass
+                                 fraction of each class (see Distribution.stratified_sample)
+       diameter_classes (list) : The edges of the size classes (e.g. the sieve levels) of the stratified sampling. If it is None,
+                                 the bins of an empirical diameter distribution are used
     """   
     def __init__(self, 
                 number_of_spheres_setter = 1, 
@@ -81,6 +102,11 @@ class shot_stream:
                 box_offset_dists_setter = (0,0,0),     
                 mean_radius_setter= 0.0,
                 radius_standard_deviation_setter = 0.0, 
+                diameter_distribution_setter = None,
+                diameter_bounds_setter = (0.0, None),
+                random_generator_setter = None,
+                diameter_sampling_setter = "random",
+                diameter_classes_setter = None,
                 ):
 
 
@@ -90,7 +116,17 @@ class shot_stream:
         self.domain_dimensions = domain_dimensions_setter
         self.impact_angle = impact_angle_setter
         self.box_offset_dists = box_offset_dists_setter
-        
+        self.diameter_distribution = diameter_distribution_setter
+        self.diameter_bounds = diameter_bounds_setter
+        self.random_generator = np.random.default_rng(random_generator_setter)
+        self.diameter_sampling = diameter_sampling_setter
+        self.diameter_classes = diameter_classes_setter
+        self.coverage_grid = None # the dent count grid and its extent, of the last coverage calculation
+
+        #the average radius is needed for the coverage calculation
+        if self.diameter_distribution is not None:
+            mean_radius_setter = self.diameter_distribution.expected_value()/2
+
         if isinstance(mean_radius_setter, list):
             self.mean_radius = mean_radius_setter
         else:
@@ -125,18 +161,18 @@ class shot_stream:
         offset_z = self.box_offset_dists[2]
         box = self.domain_dimensions
 
-        y = random.uniform(r, box.dim_y-r)  + offset_y    
+        y = self.random_generator.uniform(r, box.dim_y-r)  + offset_y    
            
         #check if the box is vertical (impact angle other than 90 degrees)
         if abs(self.impact_angle - 90) <= 0.00001:         
-            x = random.uniform(-box.dim_x/2 + r , box.dim_x/2 - r) + offset_x     
+            x = self.random_generator.uniform(-box.dim_x/2 + r , box.dim_x/2 - r) + offset_x     
         else:   
-            x = random.uniform(-box.dim_x/2 + r , box.dim_x/2 - r)  + y/math.tan(self.impact_angle*math.pi/180) + offset_x
+            x = self.random_generator.uniform(-box.dim_x/2 + r , box.dim_x/2 - r)  + y/math.tan(self.impact_angle*math.pi/180) + offset_x
 
         if box.dim_z == 0:    
             return sphere_2D(x,y,r)    
         else:
-            z = random.uniform(-box.dim_z/2 + r , box.dim_z/2 - r) + offset_z
+            z = self.random_generator.uniform(-box.dim_z/2 + r , box.dim_z/2 - r) + offset_z
             return sphere_3D(x,y,z,r)
 
     def single_sphere(position, radius):
@@ -179,9 +215,90 @@ class shot_stream:
 
         return spheres
 
-    def generate(self):
+    def sample_radii(self):
+        """Samples the radii of all the shots at once, from the diameter distribution of the stream.
+           The radii are sorted from the largest to the smallest one, since the large shots are 
+           easier to place while the box is still empty.
+
+        Returns:
+            numpy.ndarray: The sampled radii, in descending order
+        """
+        box = self.domain_dimensions
+        lower_bound, upper_bound = self.diameter_bounds
+        if upper_bound is None:
+            upper_bound = min(box.dim_x, box.dim_y, box.dim_z) if box.dim_z != 0 else min(box.dim_x, box.dim_y)
+
+        number_of_shots = sum(self.number_of_spheres)
+        if self.diameter_sampling == "random":
+            diameters = self.diameter_distribution.sample_truncated(number_of_shots, lower_bound, upper_bound, self.random_generator)
+        elif self.diameter_sampling in ("stratified", "stratified-mass"):
+            classes = self.diameter_classes
+            if classes is None:
+                classes = self.diameter_distribution.bin_edges
+            classes = np.unique(np.clip(classes, lower_bound, upper_bound)) # the classes are truncated between the bounds
+            target = "mass" if self.diameter_sampling == "stratified-mass" else "count"
+            diameters = self.diameter_distribution.stratified_sample(number_of_shots, classes, self.random_generator, target)
+        else:
+            raise ValueError('Please choose a valid diameter sampling: "random", "stratified" or "stratified-mass".')
+        
+        return np.sort(diameters)[::-1]/2
+
+    def generate_from_distribution(self, progress = None):
+        """Generates a shot stream, with the radii sampled from the diameter distribution of the stream.
+           All the radii are sampled at once and the shots are placed from the largest to the smallest one.
+           The spheres are not allowed to intersect. If a shot cannot be placed, it is skipped and the
+           placement continues with the smaller shots.
+
+            Args:
+                progress (ProgressReporter, optional): Reports the accepted shots and the acceptance rate. If the run
+                                                       is cancelled, the spheres placed so far are returned
+
+            Returns:
+                list: A list of spheres
+        """
+        spheres = []
+        rejections = 0
+        requested_shots = sum(self.number_of_spheres)
+        for r in self.sample_radii():
+            no_sphere_loops = 0 #total number of loops for each shot. If they exceed a limit, the shot is skipped
+            while no_sphere_loops <= 2e3:
+                s = self.random_sphere_inside_box(r)
+
+                #check if size criteria are satisfied
+                if not self.intersects_existing(s,spheres):
+                    spheres.append(s) #add the created sphere to the list
+                    break
+                no_sphere_loops += 1
+            rejections += no_sphere_loops
+
+            if progress is not None and progress.update("generate", accepted_shots=len(spheres), requested_shots=requested_shots,
+                                                        acceptance_rate=len(spheres)/(len(spheres) + rejections)):
+                break
+
+        if progress is not None:
+            progress.update("generate", force=True, accepted_shots=len(spheres), requested_shots=requested_shots,
+                            acceptance_rate=len(spheres)/max(len(spheres) + rejections, 1))
+
+        instrumentation.count("candidate attempts", len(spheres) + rejections)
+        instrumentation.count("rejections", rejections)
+        instrumentation.count("accepted shots", len(spheres))
+
+        if progress is not None and progress.cancelled:
+            print("Generation cancelled, a total of " + str(len(spheres)) + " spheres were created.")
+        elif sum(self.number_of_spheres) > len(spheres):
+                print("Requested number of spheres could not be achieved due to intersections, a total of " + str(len(spheres)) + " were created instead.")
+
+        return spheres
+
+    @instrumentation.staged("generate")
+    def generate(self, progress = None):
         """Generates a shot stream according to the given attributes. The spheres are not allowed to intersect.
 
+            Args:
+                progress (ProgressReporter, optional): Reports the accepted shots and the acceptance rate at a throttled
+                                                       interval. If the run is cancelled, the generation stops and the
+                                                       spheres created so far are returned
+
             Returns:
                 list: A list of spheres
 
@@ -202,9 +319,16 @@ class shot_stream:
                 If the requested number of spheres cannot be achieved due to intersections, a warning message is printed,
                 and the actual number of created spheres is returned.
 
+                If a diameter distribution is given, the radii are sampled from it instead (see generate_from_distribution).
+
         """
+        if self.diameter_distribution is not None:
+            return self.generate_from_distribution(progress)
+
         no_sphere_loops = 0 #total number of loops for each distribution. If they exceed a limit, the loop stops
         spheres = []        
+        rejections = 0
+        requested_shots = sum(self.number_of_spheres)
         #Loop for each shot
         #####################################################
         for m,std,no in zip(self.mean_radius,self.radius_standard_deviation,self.number_of_spheres):
@@ -214,7 +338,7 @@ class shot_stream:
                 #create and allocate the sphere in space
                 #####################################################
                 
-                r = random.gauss(m,std)
+                r = self.random_generator.normal(m,std)
                 s = self.random_sphere_inside_box(r)
                 
                 ######################################################
@@ -228,8 +352,26 @@ class shot_stream:
                     no_sphere_loops = 0 #zero-out the sphere loops iterator
                 else:
                     no_sphere_loops += 1
+                    rejections += 1
+
+                if progress is not None and progress.update("generate", accepted_shots=len(spheres), requested_shots=requested_shots,
+                                                            acceptance_rate=len(spheres)/(len(spheres) + rejections)):
+                    break
+
+            if progress is not None and progress.cancelled:
+                break
 
-        if sum(self.number_of_spheres) > len(spheres):
+        if progress is not None:
+            progress.update("generate", force=True, accepted_shots=len(spheres), requested_shots=requested_shots,
+                            acceptance_rate=len(spheres)/max(len(spheres) + rejections, 1))
+
+        instrumentation.count("candidate attempts", len(spheres) + rejections)
+        instrumentation.count("rejections", rejections)
+        instrumentation.count("accepted shots", len(spheres))
+
+        if progress is not None and progress.cancelled:
+            print("Generation cancelled, a total of " + str(len(spheres)) + " spheres were created.")
+        elif sum(self.number_of_spheres) > len(spheres):
                 print("Requested number of spheres could not be achieved due to intersections, a total of " + str(len(spheres)) + " were created instead.")
         
         return spheres
@@ -257,10 +399,12 @@ class shot_stream:
         """Plots the spot marks of the shot impact, in the area of interest. Only works for vertical shot stream.
            The radius of each spot mark is calculated as the 34% of the sphere diameter. For example a sphere with
            a diameter of 1.2 mm, will leave a spot mark with radius 0.41 mm.
+           For dense shot streams, use plot_coverage_map instead.
 
         Args:
             spheres (list): The spheres list of the shot stream
         """
+        from matplotlib import pyplot as plt
         box = self.domain_dimensions
 
         plt.figure()
@@ -294,39 +438,34 @@ class shot_stream:
         #draw the spheres
         sphereDrawer.draw(color) # default blue color
 
-    def plot_spheres(self,spheres):
-        """Plots the generated spheres, in space or in plane.
+    def plot_spheres(self, spheres, max_level = 1, max_triangles = 200000):
+        """Plots the generated spheres, in space or in plane. In space, the spheres are drawn as
+        a single collection of merged low-poly spheres, or as a scatter plot of their centers
+        (sized by their radii) when they do not fit in the triangle budget.
 
         Args:
             spheres (list): The spheres list of the shot stream
+            max_level (int): The level of detail (subdivisions of an icosahedron) of the largest spheres
+            max_triangles (int): The triangle budget of the plot
         """
+        from matplotlib import pyplot as plt
         
         box = self.domain_dimensions
-        
-        x_centers = np.empty((0,), dtype=float)
-        y_centers = np.empty((0,), dtype=float)
-        z_centers = np.empty((0,), dtype=float)
-        radii = np.empty((0,), dtype=float)
-        
-        for sph in spheres:
-            
-            x_centers = np.append(x_centers, sph.x)
-            y_centers = np.append(y_centers, sph.y)
-            z_centers = np.append(z_centers, sph.z)
-            radii = np.append(radii, sph.r)
+
+        centers, radii = spheres_arrays(spheres)
 
         if box.dim_z != 0:
+            from mpl_toolkits.mplot3d.art3d import Poly3DCollection
 
             fig = plt.figure()
             ax = fig.add_subplot(111, projection='3d')
 
-            # Plot each sphere
-            for x_center, y_center, z_center, radius in zip(x_centers, y_centers, z_centers, radii):
-                u, v = np.mgrid[0:2*np.pi:20j, 0:np.pi:10j]
-                x = x_center + radius*np.cos(u)*np.sin(v)
-                y = y_center + radius*np.sin(u)*np.sin(v)
-                z = z_center + radius*np.cos(v)
-                ax.plot_wireframe(x, y, z, color='b')
+            if 20*len(radii) <= max_triangles:
+                # plot all the spheres as one collection
+                vertices, _, triangles = merged_sphere_mesh(centers, radii, max_level, max_triangles)
+                ax.add_collection3d(Poly3DCollection(vertices[triangles], facecolor='b', edgecolor='k', linewidths=0.1, alpha=0.6))
+            else:
+                ax.scatter(centers[:, 0], centers[:, 1], centers[:, 2], s=(radii/np.max(radii))**2*4, color='b', depthshade=False)
 
             # Set the limits of each axis to be equal and set the aspect ratio
             ax.set_xlim(-box.dim_x/2, box.dim_x/2)
@@ -341,17 +480,17 @@ class shot_stream:
             
 
         elif box.dim_z == 0:
-            for x_center, y_center, radius in zip(x_centers, y_centers,radii):
-                circle = plt.Circle((x_center, y_center), radius , edgecolor = 'black', facecolor = 'red', alpha = 0.3)
-            
-                plt.gca().set_xlim((-box.dim_x/2, box.dim_x/2))
-                plt.gca().set_ylim((0, box.dim_y))
-
-                plt.gca().add_patch(circle)
-                
-                plt.gca().set_aspect('equal')
+            from matplotlib.collections import EllipseCollection
 
-                plt.gca().grid()
+            # plot all the circles as one collection
+            circles = EllipseCollection(2*radii, 2*radii, np.zeros(len(radii)), units='xy', offsets=centers[:, :2],
+                                        offset_transform=plt.gca().transData, edgecolor='black', facecolor='red', alpha=0.3)
+            plt.gca().add_collection(circles)
+            
+            plt.gca().set_xlim((-box.dim_x/2, box.dim_x/2))
+            plt.gca().set_ylim((0, box.dim_y))
+            plt.gca().set_aspect('equal')
+            plt.gca().grid()
             
 
     def calculate_density_of_spheres(self,list_of_spheres):
@@ -393,7 +532,34 @@ class shot_stream:
         
         box = self.domain_dimensions
 
-        return covered_area(circle_centers,shots_dents, box.dim_x - 2*self.mean_radius[0], box.dim_z - 2*self.mean_radius[0],resolution)
+        percentage_values, grid_array, extent = covered_area(circle_centers,shots_dents, box.dim_x - 2*self.mean_radius[0], box.dim_z - 2*self.mean_radius[0],resolution, return_grid=True)
+        self.coverage_grid = (grid_array, extent)
+
+        return percentage_values
+
+    def plot_coverage_map(self, spheres = None, nominal_velocity = None, resolution = 0.01, max_coverage = None, filename = None):
+        """Plots the coverage map (the number of dents covering each point of the area of interest), with a colour scale for 0x ... Nx coverage.
+           The dent count grid of the last calculate_coverage call is reused, so after the coverage calculation the map costs only the image.
+
+        Args:
+            spheres (list, optional): The spheres list of the shot stream. If it is given, the coverage is calculated again for these spheres.
+            nominal_velocity (float, optional): The nominal velocity, for the dent radii of the given spheres
+            resolution (float): The grid resolution, for the given spheres
+            max_coverage (int, optional): The highest coverage of the colour scale
+            filename (str, optional): The .png (image) or .npy (count grid) file of the map
+
+        Returns:
+            matplotlib.image.AxesImage: The image of the map (None if it is only saved as .npy)
+        """
+        if spheres is not None:
+            shot_dents = [impigment_diameter_calculation(sph.r, nominal_velocity)/2 for sph in spheres]
+            self.calculate_coverage([(sph.x, sph.z) for sph in spheres], shot_dents, resolution)
+        if self.coverage_grid is None:
+            print("Please calculate the coverage first, or give the spheres of the coverage map.")
+            return None
+
+        grid_array, extent = self.coverage_grid
+        return plot_coverage_map(grid_array, extent, max_coverage, filename)
 
 
 
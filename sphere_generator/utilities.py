@@ -1,7 +1,7 @@
 from .shape import Shape
 from .box import Box_2D, Box_3D
 import numpy as np
-from matplotlib import pyplot as plt
+import sphere_generator.instrumentation as instrumentation
 
 from enum import Enum
 
@@ -85,55 +85,124 @@ def impigment_diameter_calculation(radius,velocity=None):
         return ImpigmentDiameterConstants.steelApproximation.value * radius
 
     
-def covered_area(circle_centers,dents_radii,surface_width, surface_height,resolution):
+COVERAGE_THRESHOLDS = [1, 2, 3, 4, 5, 6]
 
+def coverage_count_grid(circle_centers, dents_radii, surface_width, surface_height, resolution):
     """
-    Calculate the percentage of the points in the covered area of a surface.
+    Rasterises the dents on a grid of the surface, counting the dents that cover every grid point.
 
     Parameters:
         circle_centers (list): List of (x, y) coordinates representing the centers of the circles.
         dents_radii (list): List of dent (impigment) radii corresponding to each circle.
-        surface_dimensions (float): Dimensions of the surface.
+        surface_width (float): Width of the surface (centered at 0).
+        surface_height (float): Height of the surface (centered at 0).
         resolution (float): Grid resolution for dividing the surface.
 
     Returns:
-        list: List of percentages representing the coverage of the surface for each threshold value.
+        numpy.ndarray: The number of dents covering each grid point (rows along the height).
+        tuple: The extent (left, right, bottom, top) of the grid, as used by imshow.
     """
     grid_size_width = int(surface_width / resolution)
     grid_size_height = int(surface_height / resolution)
     grid_points_width = np.linspace(-surface_width/2, surface_width/2, grid_size_width)
     grid_points_height = np.linspace(-surface_height/2, surface_height/2, grid_size_height)
 
-    # Create the grid and the 2D array
-    X, Y = np.meshgrid(grid_points_width, grid_points_height)
-    grid_array = np.zeros_like(X, dtype=int)
+    grid_array = np.zeros((grid_size_height, grid_size_width), dtype=int)
+
+    '''Only the grid points inside the bounding box of each dent
+    are checked, instead of the whole grid'''
+    for center, radius in zip(circle_centers, dents_radii):
+        # one more grid point on each side, for the round-off of the distances
+        i_start = max(np.searchsorted(grid_points_height, center[1] - radius, side="left") - 1, 0)
+        i_end = np.searchsorted(grid_points_height, center[1] + radius, side="right") + 1
+        j_start = max(np.searchsorted(grid_points_width, center[0] - radius, side="left") - 1, 0)
+        j_end = np.searchsorted(grid_points_width, center[0] + radius, side="right") + 1
+        if i_start >= i_end or j_start >= j_end:
+            continue
+        distance_squared = ((grid_points_width[None, j_start:j_end] - center[0]) ** 2 + (grid_points_height[i_start:i_end, None] - center[1]) ** 2)
+        grid_array[i_start:i_end, j_start:j_end] += (distance_squared <= radius ** 2)
+
+    return grid_array, (-surface_width/2, surface_width/2, -surface_height/2, surface_height/2)
+
+def coverage_percentages(grid_array, thresholds = COVERAGE_THRESHOLDS):
+    """
+    Calculates the percentage of the grid points covered by at least 1, 2, ... dents.
+
+    Parameters:
+        grid_array (numpy.ndarray): The dent count grid (see coverage_count_grid).
+        thresholds (list): The coverage thresholds.
+
+    Returns:
+        list: List of percentages representing the coverage of the surface for each threshold value.
+    """
+    if grid_array.size == 0:
+        return [0.0 for _ in thresholds]
+    return [np.count_nonzero(grid_array >= threshold) / grid_array.size * 100 for threshold in thresholds]
 
-    '''Vectorized version
-    Iterates over every grid point and checks if the points lies
-    withing any of the given circles'''
-    for k, center in enumerate(circle_centers):
-        radius = dents_radii[k]
-        distance_squared = ((X - center[0]) ** 2 + (Y - center[1]) ** 2)
-        grid_array += (distance_squared <= radius ** 2).astype(int)
+@instrumentation.staged("coverage")
+def covered_area(circle_centers,dents_radii,surface_width, surface_height,resolution, return_grid = False):
 
-    thresholds = [ 1, 2, 3, 4, 5, 6]  # Threshold values
+    """
+    Calculate the percentage of the points in the covered area of a surface.
+
+    Parameters:
+        circle_centers (list): List of (x, y) coordinates representing the centers of the circles.
+        dents_radii (list): List of dent (impigment) radii corresponding to each circle.
+        surface_dimensions (float): Dimensions of the surface.
+        resolution (float): Grid resolution for dividing the surface.
+        return_grid (bool): If True, the dent count grid and its extent are also returned (see coverage_count_grid).
 
-    percentage_values = []  # List to store the percentages
+    Returns:
+        list: List of percentages representing the coverage of the surface for each threshold value.
+    """
+    grid_array, extent = coverage_count_grid(circle_centers, dents_radii, surface_width, surface_height, resolution)
 
-    # Iterate over each threshold
-    for threshold in thresholds:
-        count = np.count_nonzero(grid_array >= threshold)  # Count the points above the threshold
-        percentage = count / grid_array.size * 100  # Calculate the percentage
-        percentage_values.append(percentage)  # Add the percentage to the list
+    thresholds = COVERAGE_THRESHOLDS  # Threshold values
+    percentage_values = coverage_percentages(grid_array, thresholds)
 
-    # Print the percentages
-    for i, threshold in enumerate(thresholds):
-        print(f"Percentage of points over {threshold}: {percentage_values[i]:.2f}%")
+    # Store the percentages in the run report
+    instrumentation.record("coverage", {f"over {threshold}": percentage for threshold, percentage in zip(thresholds, percentage_values)})
     
+    if return_grid:
+        return percentage_values, grid_array, extent
     return percentage_values
-    #plt.imshow(grid_array, cmap='hot', origin='lower')
-    # Add colorbar
-    #plt.colorbar()
+
+def plot_coverage_map(grid_array, extent, max_coverage = None, filename = None):
+    """
+    Plots the dent count grid as a coverage map, with a discrete colour scale for 0x, 1x ... Nx coverage.
+    The map can also be saved as an image (.png) or as the count grid itself (.npy).
+
+    Parameters:
+        grid_array (numpy.ndarray): The dent count grid (see coverage_count_grid).
+        extent (tuple): The extent (left, right, bottom, top) of the grid.
+        max_coverage (int, optional): The highest coverage of the colour scale, higher coverage is shown with its colour. Defaults to the maximum count.
+        filename (str, optional): The .png or .npy file of the map.
+
+    Returns:
+        matplotlib.image.AxesImage: The image of the map (None if it is only saved as .npy).
+    """
+    if filename is not None and filename.endswith(".npy"):
+        np.save(filename, grid_array)
+        return None
+
+    from matplotlib import pyplot as plt
+    from matplotlib.colors import BoundaryNorm
+
+    max_coverage = int(max_coverage or max(int(np.max(grid_array, initial=0)), 1))
+    cmap = plt.get_cmap("viridis", max_coverage + 1)
+    norm = BoundaryNorm(np.arange(-0.5, max_coverage + 1.5), cmap.N)
+
+    plt.figure()
+    image = plt.imshow(np.minimum(grid_array, max_coverage), cmap=cmap, norm=norm, origin="lower", extent=extent, interpolation="nearest")
+    colorbar = plt.colorbar(image, ticks=np.arange(max_coverage + 1))
+    colorbar.ax.set_yticklabels(["%dx" %coverage for coverage in range(max_coverage)] + ["%s%dx" %("\u2265" if np.max(grid_array, initial=0) > max_coverage else "", max_coverage)])
+    colorbar.set_label("Coverage")
+    plt.gca().set_aspect('equal', 'box')
+    plt.title("Coverage %.1f%%" %coverage_percentages(grid_array, [1])[0])
+
+    if filename is not None:
+        plt.savefig(filename, dpi=200)
+    return image
 
 def visualize_velocity_distribution(velocities):
     '''
@@ -146,6 +215,7 @@ def visualize_velocity_distribution(velocities):
     Returns:
         None.
     '''
+    from matplotlib import pyplot as plt
     plt.figure()
 
     # Calculate histogram as percentage
@@ -0,0 +1,101 @@
+import os
+
+import numpy as np
+import pytest
+
+from sphere_generator.shot_stream_generator import shot_stream
+from FE_mesh.configure_shots_mesh import create_mesh_geometry, export_mesh_geometry
+from FE_mesh.configure_sphere_entity import mesh_configuration, sphere_entity, sphere_matrices, clear_template_cache
+from FE_mesh.LSDYNA_keyword_manager import velocity_bins, apply_initial_velocity_include
+from FE_mesh.mesh_planning import element_lengths, mesh_plan
+from FE_mesh.space_filling_curves import space_filling_order
+
+
+def test_velocity_bins():
+    shot_pids, part_velocities = velocity_bins([60, 61, 89, 90], 3, first_pid = 100)
+
+    # the empty middle bin is dropped and the parts are numbered consecutively
+    assert list(shot_pids) == [100, 100, 101, 101]
+    assert part_velocities == pytest.approx({100: 60.5, 101: 89.5})
+
+
+def test_velocity_bins_keyword_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    spheres = shot_stream.structured_spheres([(0, 0, 0), (3, 0, 0), (0, 3, 0)], [0.5, 0.5, 0.5])
+    shot_pids, part_velocities = velocity_bins([60, 90, 61], 2, first_pid = 1000000)
+
+    (nodes, elements) = create_mesh_geometry("spherified_cube", "nonlinear", spheres, 0.25, str(tmp_path), pid=list(shot_pids), renumbering_point=1000000)
+    export_mesh_geometry(nodes, elements, "bins", "LSDYNA-velocity-bins", pid=1000000, part_velocities=part_velocities, angle=90)
+
+    assert sorted(os.listdir(tmp_path)) == ["bins.k"] # the temporary txt files are removed
+    text = (tmp_path / "bins.k").read_text()
+    assert text.count("*PART") == 2
+    assert text.count("*INITIAL_VELOCITY_GENERATION") == 2
+    assert text.rstrip().endswith("*END")
+    assert set(elements[:, 1]) == {1000000, 1000001}
+
+
+def test_master_deck_includes_geometry(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "geometry").mkdir()
+    (tmp_path / "geometry" / "shots_geometry.k").write_text("*KEYWORD\n*END")
+    (tmp_path / "decks").mkdir()
+
+    velocity = apply_initial_velocity_include("decks/shots_1", "geometry/shots_geometry", "Constant", 70, angle=90, dyna_id=1000000)
+    text = (tmp_path / "decks" / "shots_1.k").read_text()
+    assert velocity == 70
+    assert "*INCLUDE\n../geometry/shots_geometry.k\n" in text # relative to the master deck's directory
+
+    # an unknown velocity option writes no master deck
+    assert apply_initial_velocity_include("decks/shots_2", "geometry/shots_geometry", "Unknown", 70, angle=90) is None
+    assert not (tmp_path / "decks" / "shots_2.k").exists()
+
+
+@pytest.mark.parametrize("mesh_method", ["spherified_cube", "normalized_cube"])
+@pytest.mark.parametrize("spacing_method", ["linear", "nonlinear"])
+def test_template_cache_matches_sphere_matrices(mesh_method, spacing_method):
+    clear_template_cache()
+    half_length, inner_elements, scale_factor, layer_elements, _, spacing_factor = mesh_configuration(mesh_method, spacing_method, 0.7, 0.1)[:6]
+    nodes, elements = sphere_matrices(mesh_method, half_length, inner_elements, scale_factor, layer_elements, spacing_method, spacing_factor, 1, 2, 3, 7)
+
+    for _ in range(2): # the second sphere is created from the cached template
+        template_nodes, template_elements = sphere_entity(mesh_method, spacing_method, 0.7, 0.1, 1, 2, 3, 7)
+        np.testing.assert_allclose(template_nodes, nodes, rtol=0, atol=1e-12)
+        np.testing.assert_array_equal(template_elements, elements)
+
+
+@pytest.mark.parametrize("mesh_method", ["spherified_cube", "normalized_cube", "spherified_cube_alt"])
+@pytest.mark.parametrize("spacing_method", ["linear", "nonlinear"])
+def test_mesh_plan_matches_mesh(tmp_path, monkeypatch, mesh_method, spacing_method):
+    monkeypatch.chdir(tmp_path)
+    spheres = shot_stream.structured_spheres([(0, 0, 0), (3, 0, 0)], [0.4, 0.7])
+
+    plan = mesh_plan(mesh_method, spacing_method, spheres, 0.1)
+    (nodes, elements) = create_mesh_geometry(mesh_method, spacing_method, spheres, 0.1, str(tmp_path))
+
+    assert plan["nodes"] == np.shape(nodes)[0]
+    assert plan["elements"] == np.shape(elements)[0]
+
+
+def test_element_lengths_budget(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    spheres = shot_stream.structured_spheres([(0, 0, 0), (3, 0, 0), (0, 3, 0)], [0.3, 0.5, 0.7])
+
+    lengths = element_lengths("spherified_cube", "nonlinear", [s.r for s in spheres], total_elements = 20000)
+    plan = mesh_plan("spherified_cube", "nonlinear", spheres, lengths)
+    (nodes, elements) = create_mesh_geometry("spherified_cube", "nonlinear", spheres, lengths, str(tmp_path))
+
+    assert np.shape(elements)[0] == plan["elements"] <= 20000
+    assert len({shot["elements_through_radius"] for shot in plan["shots"]}) == 1
+
+
+@pytest.mark.parametrize("curve", ["morton", "hilbert"])
+def test_space_filling_order(curve):
+    cells = np.array([(x, y) for x in range(8) for y in range(8)], dtype=float)
+    order = space_filling_order(cells, curve, bits = 3)
+
+    assert sorted(order) == list(range(64))
+    steps = np.abs(np.diff(cells[order], axis=0)).sum(axis=1)
+    if curve == "hilbert":
+        assert np.all(steps == 1) # consecutive cells of the Hilbert curve are neighbours
+    assert len(space_filling_order(np.zeros((0, 3)), curve)) == 0
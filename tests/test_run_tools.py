@@ -0,0 +1,111 @@
+import copy
+import filecmp
+import os
+
+import pytest
+
+from run_tools.job_runner import DEFAULT_JOB_SPEC, job_spec, run_job, plan_job
+from run_tools.output_cache import OutputCache
+from run_tools.sweep import run_sweep, open_index
+
+
+def small_job(output_directory, batches = 3):
+    spec = job_spec(copy.deepcopy(DEFAULT_JOB_SPEC))
+    spec.update(output_directory=str(output_directory), batches=batches, seed=7)
+    spec["mesh"]["element_length"] = 0.2
+    spec["coverage"]["resolution"] = 0.05
+    return spec
+
+
+def batch_files(checkpoint):
+    # the reports contain timings, so only the keyword and shots files are compared
+    return sorted(f for result in checkpoint["batches"].values() for f in result["files"] + [result["shots_file"]])
+
+
+def test_resumed_job_is_identical(tmp_path):
+    complete = run_job(small_job(tmp_path / "complete"))
+
+    # the interrupted job completed only its first batch
+    run_job(small_job(tmp_path / "resumed", batches=1))
+    resumed = run_job(small_job(tmp_path / "resumed"))
+
+    assert sorted(resumed["batches"]) == ["1", "2", "3"]
+    assert batch_files(resumed) == batch_files(complete)
+    _, mismatch, errors = filecmp.cmpfiles(tmp_path / "complete", tmp_path / "resumed", batch_files(complete), shallow=False)
+    assert not mismatch and not errors
+
+
+def test_completed_job_is_not_run_again(tmp_path):
+    spec = small_job(tmp_path, batches=1)
+    run_job(spec)
+    keyword_file = tmp_path / "shots_1.k"
+    modified = os.path.getmtime(keyword_file)
+
+    run_job(spec)
+    assert os.path.getmtime(keyword_file) == modified
+
+
+def test_output_cache_restores_batches(tmp_path):
+    cache = OutputCache(str(tmp_path / "cache"))
+    created = run_job(small_job(tmp_path / "created", batches=2), cache=cache)
+    restored = run_job(small_job(tmp_path / "restored", batches=2), cache=cache)
+
+    assert len(cache.entries()) == 2
+    assert restored["batches"]["2"]["elements"] == created["batches"]["2"]["elements"]
+    _, mismatch, errors = filecmp.cmpfiles(tmp_path / "created", tmp_path / "restored", batch_files(created), shallow=False)
+    assert not mismatch and not errors
+
+
+def test_plan_job_matches_run(tmp_path, capsys):
+    spec = small_job(tmp_path, batches=2)
+    spec["mesh"]["element_budget"] = {"total_elements": 5000}
+
+    plans = plan_job(spec)
+    capsys.readouterr()
+    checkpoint = run_job(spec)
+
+    assert "Batch 1" in capsys.readouterr().out # the plan of a budget is printed before meshing
+    for batch_number, plan in plans.items():
+        assert plan["elements"] == checkpoint["batches"][str(batch_number)]["elements"] <= 5000
+
+
+def test_sweep_records_failed_jobs(tmp_path):
+    sweep_spec = {"name": "sweep", "output_directory": str(tmp_path), "job": small_job(tmp_path, batches=1),
+                  # an invalid mesh method fails its job only
+                  "parameters": {"mesh.method": ["spherified_cube", "unknown_cube"]}}
+
+    run_sweep(sweep_spec, max_workers=1)
+    connection = open_index(str(tmp_path / "sweeps.sqlite"))
+    statuses = {row["status"] for row in connection.execute("SELECT status FROM jobs")}
+    connection.close()
+    assert statuses == {"completed", "failed"}
+
+    with pytest.raises(ValueError):
+        run_sweep({"name": "sweep", "output_directory": str(tmp_path)})
+
+
+def test_job_spec_rejects_velocity_bins_output():
+    with pytest.raises(ValueError, match="velocity-bins"):
+        job_spec({"mesh": {"output": "LSDYNA-velocity-bins"}})
+
+
+def test_service_returns_json_errors(tmp_path):
+    import threading
+    from http.server import ThreadingHTTPServer
+    from run_tools.service import GenerationService, _handler, request
+
+    service = GenerationService()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(service))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    address = server.server_address[:2]
+    try:
+        (tmp_path / "file").write_text("")
+        job = {"output_directory": str(tmp_path / "file" / "outputs")}
+        # the OSError of the export is returned as a JSON error, instead of a dropped connection
+        with pytest.raises(ValueError, match="Error"):
+            request("/batch", {"job": job}, address, timeout=30)
+        assert request("/status", address=address, timeout=30)["requests"] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.close()
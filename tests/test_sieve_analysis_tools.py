@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+
+from sieve_analysis_tools import distributions as dist
+from sieve_analysis_tools import fitters
+from sieve_analysis_tools import fit_cache
+from sieve_analysis_tools.bootstrap import bootstrap_sieve_distribution
+
+BIN_EDGES = np.linspace(0.2, 2.0, 19)
+SIEVE_ANALYSIS_DATA = [[2., 1.6, 1.4, 1.25, 1.12, 1., 0.9, 0.8, 0.71, 0.6, 0.5, 0.4, 0.3, 0.2, 0.1, 0.],
+                       [0.0, 0.1, 2.4, 46.3, 42.4, 24.8, 5.6, 5.3, 5.3, 8.8, 9.7, 7.1, 1.7, 0.2, 0.1, 0.0]]
+
+
+def expected_counts(distribution, bin_edges, total = 100000):
+    # noise free binned data of a known distribution
+    return total * np.diff(distribution.cdf(bin_edges))
+
+
+def test_mixture_weights_are_normalized():
+    mixture = dist.GaussianMixture([0.6, 1.2], [0.1, 0.1], [2, 6])
+
+    np.testing.assert_allclose(mixture.weights, [0.25, 0.75])
+    assert mixture.cdf(10) == pytest.approx(1)
+    assert mixture.expected_value() == pytest.approx(0.25*0.6 + 0.75*1.2)
+
+
+def test_incomplete_distribution_is_not_instantiated():
+    class OnlySample(dist.Distribution):
+        def sample(self, size, rng=None):
+            return np.zeros(size)
+
+    with pytest.raises(TypeError):
+        OnlySample()
+
+
+def test_binned_log_likelihood_is_maximal_at_the_true_distribution():
+    true_distribution = dist.GaussianDistribution(1.1, 0.2)
+    counts = expected_counts(true_distribution, BIN_EDGES)
+
+    log_likelihood = fitters.binned_log_likelihood(true_distribution, BIN_EDGES, counts)
+    for mean, stdev in ((1.05, 0.2), (1.15, 0.2), (1.1, 0.18), (1.1, 0.22)):
+        assert fitters.binned_log_likelihood(dist.GaussianDistribution(mean, stdev), BIN_EDGES, counts) < log_likelihood
+
+
+def test_binned_Gaussian_fit_recovers_parameters():
+    counts = expected_counts(dist.GaussianDistribution(1.1, 0.2), BIN_EDGES)
+
+    for fitted in (fitters.fit_binned_Gaussian(BIN_EDGES, counts), fitters.fit_binned_mixed_Gaussian_EM(BIN_EDGES, counts, 1)):
+        assert fitted.mean == pytest.approx(1.1, abs=1e-4)
+        assert fitted.stdev == pytest.approx(0.2, abs=1e-4)
+
+
+def test_EM_recovers_mixture_parameters():
+    true_mixture = dist.GaussianMixture([0.6, 1.2], [0.1, 0.15], [0.3, 0.7])
+    counts = expected_counts(true_mixture, BIN_EDGES)
+
+    fitted = fitters.fit_binned_mixed_Gaussian_EM(BIN_EDGES, counts, 2)
+    np.testing.assert_allclose(fitted.means, true_mixture.means, atol=1e-3)
+    np.testing.assert_allclose(fitted.stdevs, true_mixture.stdevs, atol=1e-3)
+    np.testing.assert_allclose(fitted.weights, true_mixture.weights, atol=1e-3)
+
+    # a warm start from the fit converges to the same fit
+    refitted = fitters.fit_binned_mixed_Gaussian_EM(BIN_EDGES, counts, 2, initial_distribution=fitted)
+    np.testing.assert_allclose(refitted.means, fitted.means, atol=1e-6)
+
+
+def test_binned_weibull_mixture_fit_recovers_parameters():
+    true_mixture = dist.WeibullMixture([0.7, 1.3], [6, 8], [0.4, 0.6])
+    counts = expected_counts(true_mixture, BIN_EDGES)
+
+    fitted = fitters.fit_binned_weibull_mixture(BIN_EDGES, counts, 2)
+    np.testing.assert_allclose(fitted.alphas, true_mixture.alphas, rtol=1e-2)
+    np.testing.assert_allclose(fitted.weights, true_mixture.weights, atol=1e-2)
+
+
+def test_warm_started_weibull_mixture_fit_matches_the_cold_fit():
+    counts = expected_counts(dist.WeibullMixture([0.7, 1.3], [6, 8], [0.4, 0.6]), BIN_EDGES)
+    cold = fitters.fit_binned_weibull_mixture(BIN_EDGES, counts, 2)
+    start = dist.WeibullMixture(np.array(cold.alphas) * 1.05, np.array(cold.betas) * 0.9, [0.5, 0.5])
+
+    # the warm start is refitted with the analytic gradient of the binned likelihood
+    warm = fitters.fit_binned_weibull_mixture(BIN_EDGES, counts, 2, start)
+    np.testing.assert_allclose(warm.alphas, cold.alphas, rtol=1e-4)
+    np.testing.assert_allclose(warm.betas, cold.betas, rtol=1e-3)
+    np.testing.assert_allclose(warm.weights, cold.weights, atol=1e-4)
+
+
+def test_stratified_sample_counts_per_bin():
+    distribution = dist.GaussianDistribution(1.1, 0.2)
+    samples = distribution.stratified_sample(1000, BIN_EDGES, rng=1)
+
+    counts, _ = np.histogram(samples, BIN_EDGES)
+    quotas = 1000 * np.diff(distribution.cdf(BIN_EDGES)) / np.sum(np.diff(distribution.cdf(BIN_EDGES)))
+    assert np.sum(counts) == 1000
+    assert np.all(np.abs(counts - quotas) < 1)
+
+
+def test_empirical_sieve_distribution_samples_inside_bins():
+    distribution = dist.EmpiricalSieveDistribution([0.5, 1.0, 1.5], [30, 70])
+    samples = distribution.sample(10000, rng=2)
+
+    assert np.all((samples >= 0.5) & (samples <= 1.5))
+    assert np.mean(samples < 1.0) == pytest.approx(0.3, abs=0.02)
+    assert distribution.ppf(distribution.cdf(1.2)) == pytest.approx(1.2)
+
+
+def test_fit_cache(tmp_path):
+    fitted = fit_cache.cached_fit_sieve_distribution(SIEVE_ANALYSIS_DATA, 0.00785, "Gaussian", "binned", cache_directory=str(tmp_path))
+    assert len(list(tmp_path.iterdir())) == 1
+
+    cached = fit_cache.cached_fit_sieve_distribution(SIEVE_ANALYSIS_DATA, 0.00785, "Gaussian", "binned", cache_directory=str(tmp_path))
+    assert cached.parameters() == fitted.parameters()
+
+    assert fit_cache.invalidate_fit(SIEVE_ANALYSIS_DATA, 0.00785, "Gaussian", "binned", cache_directory=str(tmp_path))
+    assert not list(tmp_path.iterdir())
+
+
+def test_bootstrap_is_reproducible():
+    first = bootstrap_sieve_distribution(SIEVE_ANALYSIS_DATA, 0.00785, "Gaussian", replicates=50, max_workers=1, seed=3)
+    second = bootstrap_sieve_distribution(SIEVE_ANALYSIS_DATA, 0.00785, "Gaussian", replicates=50, max_workers=1, seed=3)
+
+    np.testing.assert_array_equal(first["replicates"], second["replicates"])
+    for name, value in zip(first["names"], np.array(list(first["distribution"].parameters().values()))):
+        lower, upper = first["intervals"][name]
+        assert lower <= value <= upper
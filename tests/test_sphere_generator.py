@@ -0,0 +1,32 @@
+import random
+
+import numpy as np
+
+from sphere_generator.shot_stream_generator import shot_stream
+from sphere_generator.utilities import problem_dimensions_setter, box_getter
+from sieve_analysis_tools.distributions import GaussianDistribution
+
+
+def seeded_stream(seed, **setters):
+    problem_dimensions = problem_dimensions_setter("3D")
+    box = box_getter(problem_dimensions, 3, 20, 3)
+    return shot_stream(5, problem_dimensions, box, 60, random_generator_setter=seed, **setters)
+
+
+def shots(spheres):
+    return [(s.x, s.y, s.z, s.r) for s in spheres]
+
+
+def test_seeded_stream_is_reproducible():
+    for setters in ({"mean_radius_setter": 0.5, "radius_standard_deviation_setter": 0.05},
+                    {"diameter_distribution_setter": GaussianDistribution(1.0, 0.1)}):
+        random.seed(1)
+        np.random.seed(1)
+        first = shots(seeded_stream(11, **setters).generate())
+        random.seed(2)
+        np.random.seed(2)
+        second = shots(seeded_stream(11, **setters).generate())
+
+        # the global random states do not affect a seeded stream
+        assert first == second
+        assert first != shots(seeded_stream(12, **setters).generate())